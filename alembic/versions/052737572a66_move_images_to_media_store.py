@@ -0,0 +1,49 @@
+"""Move images to media store
+
+Revision ID: 052737572a66
+Revises: d899cf419c5f
+Create Date: 2026-10-18 11:04:17.220931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from media_store import media_store, decode_image
+
+
+# revision identifiers, used by Alembic.
+revision: str = '052737572a66'
+down_revision: Union[str, None] = 'd899cf419c5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('tests', 'questions', 'answers')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    for table in TABLES:
+        op.add_column(table, sa.Column('image_hash', sa.String(length=64), nullable=True))
+
+        # Картинки переносим по одной, чтобы не держать все блобы в памяти
+        ids = [row[0] for row in bind.execute(sa.text(f"SELECT id FROM {table} WHERE image IS NOT NULL"))]
+        for row_id in ids:
+            image = bind.execute(sa.text(f"SELECT image FROM {table} WHERE id = :id"), {"id": row_id}).scalar()
+            blob_hash = media_store.put(decode_image(bytes(image)))
+            bind.execute(
+                sa.text(f"UPDATE {table} SET image_hash = :hash WHERE id = :id"),
+                {"hash": blob_hash, "id": row_id}
+            )
+
+        # Колонка image остаётся как резервная копия до миграции e3a9c5d71f20,
+        # которая удаляет её только при постоянном хранилище медиа
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_column(table, 'image_hash')
@@ -0,0 +1,42 @@
+"""Add photo_thumbnail and photo_hash in Employee
+
+Revision ID: 369c832b18a9
+Revises: 052737572a66
+Create Date: 2026-10-18 11:48:02.914416
+
+"""
+from typing import Sequence, Union
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+from media_store import make_thumbnail
+
+
+# revision identifiers, used by Alembic.
+revision: str = '369c832b18a9'
+down_revision: Union[str, None] = '052737572a66'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('employees', sa.Column('photo_thumbnail', sa.LargeBinary(), nullable=True))
+    op.add_column('employees', sa.Column('photo_hash', sa.String(length=64), nullable=True))
+
+    bind = op.get_bind()
+    ids = [row[0] for row in bind.execute(sa.text("SELECT id FROM employees WHERE photo IS NOT NULL"))]
+    for employee_id in ids:
+        photo = bytes(bind.execute(sa.text("SELECT photo FROM employees WHERE id = :id"), {"id": employee_id}).scalar())
+        bind.execute(
+            sa.text("UPDATE employees SET photo_thumbnail = :thumbnail, photo_hash = :hash WHERE id = :id"),
+            {"thumbnail": make_thumbnail(photo), "hash": hashlib.sha256(photo).hexdigest(), "id": employee_id}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('employees', 'photo_hash')
+    op.drop_column('employees', 'photo_thumbnail')
@@ -0,0 +1,62 @@
+"""Add content_hash to questions and belbin_questions
+
+Revision ID: 8c1f2d7a4b90
+Revises: 369c832b18a9
+Create Date: 2026-10-18 13:20:41.508113
+
+"""
+from typing import Sequence, Union
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from content_hash import question_content_hash, belbin_question_content_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f2d7a4b90'
+down_revision: Union[str, None] = '369c832b18a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def backfill(bind, question_sql: str, answer_sql: str, table: str, hash_function):
+    answers = defaultdict(list)
+    for row in bind.execute(sa.text(answer_sql)).mappings():
+        answers[row["question_id"]].append(dict(row))
+
+    hashes = [
+        {"id": row["id"], "hash": hash_function(dict(row), answers[row["id"]])}
+        for row in bind.execute(sa.text(question_sql)).mappings()
+    ]
+    if hashes:
+        bind.execute(sa.text(f"UPDATE {table} SET content_hash = :hash WHERE id = :id"), hashes)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('questions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('belbin_questions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    bind = op.get_bind()
+    backfill(
+        bind,
+        'SELECT id, text, question_type, "order", points, image_hash FROM questions',
+        'SELECT question_id, text, is_correct, image_hash FROM answers',
+        'questions',
+        question_content_hash,
+    )
+    backfill(
+        bind,
+        'SELECT id, text, block_number, "order" FROM belbin_questions',
+        'SELECT question_id, text, role_id FROM belbin_answers',
+        'belbin_questions',
+        belbin_question_content_hash,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('belbin_questions', 'content_hash')
+    op.drop_column('questions', 'content_hash')
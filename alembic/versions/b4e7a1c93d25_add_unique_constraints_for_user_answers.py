@@ -0,0 +1,62 @@
+"""Add unique constraints for user answers
+
+Revision ID: b4e7a1c93d25
+Revises: 8c1f2d7a4b90
+Create Date: 2026-10-18 16:05:12.734019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7a1c93d25'
+down_revision: Union[str, None] = '8c1f2d7a4b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубликаты от параллельных сохранений: оставляем первую запись, а выбранные
+    # варианты дубликатов переносим на неё — старый подсчёт объединял их
+    op.execute("""
+        UPDATE user_answer_items SET user_answer_id = (
+            SELECT MIN(keep.id) FROM user_answers keep
+            JOIN user_answers dup ON dup.employee_id = keep.employee_id
+                AND dup.test_id = keep.test_id
+                AND dup.question_id = keep.question_id
+            WHERE dup.id = user_answer_items.user_answer_id
+        )
+        WHERE user_answer_id NOT IN (
+            SELECT MIN(id) FROM user_answers GROUP BY employee_id, test_id, question_id
+        )
+    """)
+    op.execute("""
+        DELETE FROM user_answer_items WHERE id NOT IN (
+            SELECT MIN(id) FROM user_answer_items GROUP BY user_answer_id, answer_id
+        )
+    """)
+    op.execute("""
+        DELETE FROM user_answers WHERE id NOT IN (
+            SELECT MIN(id) FROM user_answers GROUP BY employee_id, test_id, question_id
+        )
+    """)
+    op.execute("""
+        DELETE FROM user_belbin_answers WHERE id NOT IN (
+            SELECT MIN(id) FROM user_belbin_answers GROUP BY employee_id, test_id, question_id, answer_id
+        )
+    """)
+
+    op.create_unique_constraint('uq_user_answers_employee_test_question', 'user_answers', ['employee_id', 'test_id', 'question_id'])
+    op.create_unique_constraint('uq_user_answer_items_user_answer_answer', 'user_answer_items', ['user_answer_id', 'answer_id'])
+    op.create_unique_constraint('uq_user_belbin_answers_employee_test_question_answer', 'user_belbin_answers', ['employee_id', 'test_id', 'question_id', 'answer_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_belbin_answers_employee_test_question_answer', 'user_belbin_answers', type_='unique')
+    op.drop_constraint('uq_user_answer_items_user_answer_answer', 'user_answer_items', type_='unique')
+    op.drop_constraint('uq_user_answers_employee_test_question', 'user_answers', type_='unique')
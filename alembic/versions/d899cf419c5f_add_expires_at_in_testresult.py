@@ -0,0 +1,63 @@
+"""Add expires_at in TestResult
+
+Revision ID: d899cf419c5f
+Revises: 6f0b954fa7e3
+Create Date: 2026-10-18 10:12:41.503127
+
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd899cf419c5f'
+down_revision: Union[str, None] = '6f0b954fa7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test_results', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_test_results_expires_at'), 'test_results', ['expires_at'], unique=False)
+
+    backfill_expires_at(op.get_bind())
+
+
+def backfill_expires_at(bind) -> None:
+    # Дедлайн для уже начатых попыток считается той же функцией, что и во время работы,
+    # поэтому миграция не зависит от диалекта (PostgreSQL, SQLite)
+    from crud.test import compute_expires_at
+
+    rows = bind.execute(sa.text("""
+        SELECT tr.id, tr.started_at, t.time_limit_minutes, t.end_date
+        FROM test_results AS tr
+        JOIN tests AS t ON t.id = tr.test_id
+        WHERE tr.is_completed = :is_completed AND tr.started_at IS NOT NULL
+    """), {"is_completed": False}).all()
+
+    updates = []
+    for result_id, started_at, time_limit_minutes, end_date in rows:
+        test = SimpleNamespace(time_limit_minutes=time_limit_minutes, end_date=parse_datetime(end_date))
+        expires_at = compute_expires_at(test, parse_datetime(started_at))
+        if expires_at is not None:
+            updates.append({"id": result_id, "expires_at": expires_at})
+    if updates:
+        bind.execute(sa.text("UPDATE test_results SET expires_at = :expires_at WHERE id = :id"), updates)
+
+
+def parse_datetime(value):
+    # SQLite без типов возвращает даты строками
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_test_results_expires_at'), table_name='test_results')
+    op.drop_column('test_results', 'expires_at')
@@ -0,0 +1,64 @@
+"""Drop legacy image columns
+
+Revision ID: e3a9c5d71f20
+Revises: b4e7a1c93d25
+Create Date: 2026-10-18 19:42:03.518274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from media_store import media_store, decode_image, is_durable_media_storage, MEDIA_STORAGE, MEDIA_ROOT
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5d71f20'
+down_revision: Union[str, None] = 'b4e7a1c93d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('tests', 'questions', 'answers')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # После удаления колонок хранилище медиа — единственная копия картинок
+    if not is_durable_media_storage():
+        raise RuntimeError(
+            f"MEDIA_STORAGE={MEDIA_STORAGE} с MEDIA_ROOT={MEDIA_ROOT!r} не переживёт пересоздание контейнера: "
+            "укажите абсолютный путь к смонтированному тому или MEDIA_STORAGE=s3"
+        )
+
+    bind = op.get_bind()
+    for table in TABLES:
+        # Блоб мог пропасть после переноса (например, каталог внутри контейнера) — записываем заново
+        ids = [row[0] for row in bind.execute(sa.text(f"SELECT id FROM {table} WHERE image IS NOT NULL"))]
+        for row_id in ids:
+            image, blob_hash = bind.execute(
+                sa.text(f"SELECT image, image_hash FROM {table} WHERE id = :id"), {"id": row_id}
+            ).one()
+            if blob_hash and media_store.size(blob_hash) is not None:
+                continue
+            bind.execute(
+                sa.text(f"UPDATE {table} SET image_hash = :hash WHERE id = :id"),
+                {"hash": media_store.put(decode_image(bytes(image))), "id": row_id}
+            )
+
+        op.drop_column(table, 'image')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    for table in TABLES:
+        op.add_column(table, sa.Column('image', sa.LargeBinary(), nullable=True))
+
+        rows = bind.execute(sa.text(f"SELECT id, image_hash FROM {table} WHERE image_hash IS NOT NULL")).all()
+        for row_id, blob_hash in rows:
+            bind.execute(
+                sa.text(f"UPDATE {table} SET image = :image WHERE id = :id"),
+                {"image": media_store.read(blob_hash), "id": row_id}
+            )
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from db.database import SessionLocal
+from crud.test import flush_attempts
+from attempt_store import attempt_store, ATTEMPT_FLUSH_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+flush_task: asyncio.Task | None = None
+
+
+def run_flush() -> int:
+    """Записать в БД все накопленные ответы."""
+    db = SessionLocal()
+    try:
+        return flush_attempts(db)
+    finally:
+        db.close()
+
+
+async def flush_loop(interval: float = ATTEMPT_FLUSH_INTERVAL_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        if not len(attempt_store):
+            continue
+        try:
+            await asyncio.to_thread(run_flush)
+        except Exception:
+            logger.exception("Pending answers flush failed")
+
+
+def start_attempt_flusher():
+    global flush_task
+    if attempt_store.enabled and flush_task is None:
+        flush_task = asyncio.create_task(flush_loop())
+
+
+async def stop_attempt_flusher():
+    """Остановить периодический сброс и записать то, что ещё осталось."""
+    global flush_task
+    if flush_task is not None:
+        flush_task.cancel()
+        try:
+            await flush_task
+        except asyncio.CancelledError:
+            pass
+        flush_task = None
+    if len(attempt_store):
+        await asyncio.to_thread(run_flush)
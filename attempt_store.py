@@ -0,0 +1,153 @@
+import os
+import threading
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+# Как часто сбрасывать накопленные ответы в БД; 0 — писать каждый ответ сразу
+ATTEMPT_FLUSH_INTERVAL_SECONDS = float(os.getenv("ATTEMPT_FLUSH_INTERVAL_SECONDS", "5"))
+# Сколько незаписываемых попыток держать в карантине; их повторяют при завершении попытки и вручную
+ATTEMPT_QUARANTINE_SIZE = 1000
+
+REGULAR = "regular"
+BELBIN = "belbin"
+
+AttemptKey = Tuple[int, int]  # (test_id, employee_id)
+QuestionKey = Tuple[str, int]  # (REGULAR | BELBIN, question_id)
+
+
+class PendingAnswer(NamedTuple):
+    text_response: str | None = None
+    answer_ids: Tuple[int, ...] = ()
+    belbin_scores: Tuple[Tuple[int, int | None], ...] = ()  # пары (answer_id, score)
+
+
+class AttemptStore:
+    """Ответы незавершённых попыток, ещё не записанные в БД (write-behind).
+
+    По каждому вопросу хранится только последнее состояние, поэтому частые
+    изменения ответа между сбросами превращаются в одну запись в БД.
+
+    Забранные на запись ответы остаются видимыми (in-flight), пока сброс не
+    закоммичен: чтение их учитывает, а завершение попытки ждёт окончания записи.
+    """
+
+    def __init__(self, enabled: bool = ATTEMPT_FLUSH_INTERVAL_SECONDS > 0):
+        self.enabled = enabled
+        self._attempts: Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]] = {}
+        self._in_flight: Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]] = {}
+        self._quarantine: Dict[AttemptKey, Tuple[Dict[QuestionKey, PendingAnswer], str]] = {}
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self.updates = 0
+        self.flushed = 0
+
+    def put(self, test_id: int, employee_id: int, question_key: QuestionKey, answer: PendingAnswer):
+        with self._lock:
+            self._attempts.setdefault((test_id, employee_id), {})[question_key] = answer
+            self.updates += 1
+
+    def pending(self, test_ids: Iterable[int], employee_ids: Iterable[int]) -> Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]]:
+        """Копия накопленного для указанных тестов и сотрудников."""
+        test_ids, employee_ids = set(test_ids), set(employee_ids)
+        result = {}
+        with self._lock:
+            # От старых к новым: карантин, то, что сейчас пишется, накопленное после
+            quarantined = {key: answers for key, (answers, _) in self._quarantine.items()}
+            for source in (quarantined, self._in_flight, self._attempts):
+                for key, answers in source.items():
+                    if key[0] in test_ids and key[1] in employee_ids:
+                        result.setdefault(key, {}).update(answers)
+        return result
+
+    def keys_for_test(self, test_id: int) -> list[AttemptKey]:
+        """Попытки теста, ответы которых ещё не в БД, включая карантин."""
+        with self._lock:
+            return [key for key in {**self._quarantine, **self._in_flight, **self._attempts} if key[0] == test_id]
+
+    def take(self, keys: Iterable[AttemptKey] | None = None) -> Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]]:
+        """Забрать накопленное для записи в БД: всё или только указанные попытки.
+
+        Забранное остаётся in-flight до done/restore/quarantine. Указанные попытки,
+        которые уже пишет другой сброс, сначала дожидаются его окончания.
+        """
+        with self._lock:
+            if keys is None:
+                keys = [key for key in self._attempts if key not in self._in_flight]
+            else:
+                keys = set(keys)
+                self._flushed.wait_for(lambda: keys.isdisjoint(self._in_flight))
+            taken = {key: self._attempts.pop(key) for key in keys if key in self._attempts}
+            self._in_flight.update(taken)
+            return taken
+
+    def _release(self, keys: Iterable[AttemptKey]):
+        for key in keys:
+            self._in_flight.pop(key, None)
+        self._flushed.notify_all()
+
+    def done(self, taken: Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]]):
+        """Забранное записано и закоммичено."""
+        with self._lock:
+            self._release(taken)
+
+    def restore(self, taken: Dict[AttemptKey, Dict[QuestionKey, PendingAnswer]]):
+        """Вернуть незаписанное после ошибки; более новые ответы не перетираются."""
+        with self._lock:
+            for key, answers in taken.items():
+                pending = self._attempts.setdefault(key, {})
+                for question_key, answer in answers.items():
+                    pending.setdefault(question_key, answer)
+            self._release(taken)
+
+    def quarantine(self, key: AttemptKey, answers: Dict[QuestionKey, PendingAnswer], error: str):
+        """Отложить попытку, которую БД не принимает, чтобы она не блокировала остальные."""
+        with self._lock:
+            self._release([key])
+            self._quarantine[key] = (answers, error)
+            while len(self._quarantine) > ATTEMPT_QUARANTINE_SIZE:
+                del self._quarantine[next(iter(self._quarantine))]
+
+    def quarantined(self, keys: Iterable[AttemptKey] | None = None) -> Dict[AttemptKey, Tuple[Dict[QuestionKey, PendingAnswer], str]]:
+        with self._lock:
+            if keys is None:
+                return dict(self._quarantine)
+            return {key: self._quarantine[key] for key in keys if key in self._quarantine}
+
+    def requeue(self, keys: Iterable[AttemptKey] | None = None) -> list[AttemptKey]:
+        """Вернуть попытки из карантина в очередь на запись; более новые ответы не перетираются."""
+        with self._lock:
+            keys = [key for key in (self._quarantine if keys is None else keys) if key in self._quarantine]
+            for key in keys:
+                answers, _ = self._quarantine.pop(key)
+                pending = self._attempts.setdefault(key, {})
+                for question_key, answer in answers.items():
+                    pending.setdefault(question_key, answer)
+            return keys
+
+    def record_flush(self, answers_count: int):
+        with self._lock:
+            self.flushed += answers_count
+
+    def discard(self, test_id: int, employee_id: int | None = None):
+        with self._lock:
+            for attempts in (self._attempts, self._quarantine):
+                for key in [k for k in attempts if k[0] == test_id and employee_id in (None, k[1])]:
+                    del attempts[key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "attempts": len(self._attempts),
+                "in_flight": len(self._in_flight),
+                "pending_answers": sum(len(answers) for answers in self._attempts.values()),
+                "quarantined": len(self._quarantine),
+                "updates": self.updates,
+                "flushed": self.flushed,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._attempts)
+
+
+attempt_store = AttemptStore()
@@ -1,22 +1,85 @@
 import os
 import requests
+import httpx
 import enum
 from requests.exceptions import HTTPError
 from schemas import EmployeeCreate, ClerkUserCreate, ClerkPublicMetadata, ClerkMetadata, ClerkRole
+from jwks_manager import JWKSManager, TokenCache
 
 CLERK_ISSUER = "https://probable-egret-34.clerk.accounts.dev"
 JWKS_URL = f"{CLERK_ISSUER}/.well-known/jwks.json"
 CLERK_API_KEY = os.getenv("CLERK_API_KEY")  # безопасно
-CLERK_API_URL = "https://api.clerk.dev/v1"
-jwks_cache = {}
-def create_clerk_user(
+CLERK_API_URL = os.getenv("CLERK_API_URL", "https://api.clerk.dev/v1")  # можно указать локальный mock-сервер
+CLERK_MAX_CONCURRENCY = int(os.getenv("CLERK_MAX_CONCURRENCY", "10"))
+CLERK_TIMEOUT_SECONDS = float(os.getenv("CLERK_TIMEOUT_SECONDS", "10"))
+jwks_store = JWKSManager(JWKS_URL)
+token_cache = TokenCache()
+
+# Общие клиенты, чтобы не открывать TLS-соединение на каждый запрос
+clerk_session = requests.Session()
+clerk_client: httpx.AsyncClient | None = None
+
+
+def clerk_headers():
+    return {
+        "Authorization": f"Bearer {CLERK_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+def get_clerk_client() -> httpx.AsyncClient:
+    global clerk_client
+    if clerk_client is None:
+        clerk_client = httpx.AsyncClient(
+            base_url=CLERK_API_URL,
+            headers=clerk_headers(),
+            timeout=CLERK_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=CLERK_MAX_CONCURRENCY,
+                max_keepalive_connections=CLERK_MAX_CONCURRENCY,
+            ),
+        )
+    return clerk_client
+
+
+async def close_clerk_client():
+    global clerk_client
+    if clerk_client is not None:
+        await clerk_client.aclose()
+        clerk_client = None
+
+
+def clerk_error_message(response) -> str:
+    """Человекочитаемое сообщение из ответа Clerk с ошибкой."""
+    try:
+        response_data = response.json()
+    except Exception:
+        response_data = {}
+
+    errors_list = response_data.get("errors", [])
+    error_msg = "Неизвестная ошибка от Clerk"
+
+    if errors_list:
+        for err_detail in errors_list:
+            if err_detail.get("code") == "form_identifier_exists":
+                error_msg = "Пользователь с таким email уже зарегистрирован"
+            elif err_detail.get("code") == "duplicate_record":
+                error_msg = "Приглашение уже отправлено"
+            else:
+                error_msg = err_detail.get("long_message") or err_detail.get("message") or error_msg
+    else:
+        error_msg = response_data.get("message") or error_msg
+
+    return error_msg
+
+
+def build_clerk_user_data(
     first_name: str,
     last_name: str,
     is_admin: bool = False,
     password: str | None = None,
     username: str | None = None,
     email: str | None = None,
-
 ):
     role = ClerkRole.ADMIN if is_admin else ClerkRole.EMPLOYEE
 
@@ -40,30 +103,49 @@ def create_clerk_user(
     if username:
         user_data["username"] = username
 
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    return user_data
+
+
+def create_clerk_user(
+    first_name: str,
+    last_name: str,
+    is_admin: bool = False,
+    password: str | None = None,
+    username: str | None = None,
+    email: str | None = None,
+
+):
+    user_data = build_clerk_user_data(first_name, last_name, is_admin, password, username, email)
 
-    response = requests.post(
+    response = clerk_session.post(
         f"{CLERK_API_URL}/users",
-        headers=headers,
+        headers=clerk_headers(),
         json=user_data
     )
     response.raise_for_status()
     return response.json()
 
 
+async def create_clerk_user_async(
+    first_name: str,
+    last_name: str,
+    is_admin: bool = False,
+    password: str | None = None,
+    username: str | None = None,
+    email: str | None = None,
+):
+    user_data = build_clerk_user_data(first_name, last_name, is_admin, password, username, email)
+
+    response = await get_clerk_client().post("/users", json=user_data)
+    response.raise_for_status()
+    return response.json()
 
 
 def delete_clerk_user(clerk_id: str):
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    headers = clerk_headers()
     if clerk_id.startswith("user_"):
         print(f"Deleting registered user: {clerk_id}")
-        user_response = requests.delete(f"{CLERK_API_URL}/users/{clerk_id}", headers=headers)
+        user_response = clerk_session.delete(f"{CLERK_API_URL}/users/{clerk_id}", headers=headers)
         if user_response.status_code == 200:
             return user_response.json()
         else:
@@ -71,7 +153,7 @@ def delete_clerk_user(clerk_id: str):
 
     elif clerk_id.startswith("inv_"):
         print(f"Deleting invitation: {clerk_id}")
-        inv_response = requests.post(f"{CLERK_API_URL}/invitations/{clerk_id}/revoke", headers=headers)
+        inv_response = clerk_session.post(f"{CLERK_API_URL}/invitations/{clerk_id}/revoke", headers=headers)
         if inv_response.status_code in (200, 204):
             return inv_response.json()
         elif inv_response.status_code == 404:
@@ -84,12 +166,22 @@ def delete_clerk_user(clerk_id: str):
         raise Exception("Invalid clerk_id format")
 
 
-def update_clerk_user(employee_data: EmployeeCreate, clerk_id: str):
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json",
-    }
+async def delete_clerk_user_async(clerk_id: str):
+    client = get_clerk_client()
+    if clerk_id.startswith("user_"):
+        response = await client.delete(f"/users/{clerk_id}")
+    elif clerk_id.startswith("inv_"):
+        response = await client.post(f"/invitations/{clerk_id}/revoke")
+        if response.status_code == 404:
+            return None
+    else:
+        raise Exception("Invalid clerk_id format")
+
+    response.raise_for_status()
+    return response.json() if response.content else None
+
 
+def update_clerk_user(employee_data: EmployeeCreate, clerk_id: str):
     data = {}
 
     if employee_data.first_name:
@@ -101,9 +193,9 @@ def update_clerk_user(employee_data: EmployeeCreate, clerk_id: str):
     # if employee_data.role:
         # data["public_metadata"] = {"role": employee_data.}
 
-    response = requests.patch(f"{CLERK_API_URL}/users/{clerk_id}", headers=headers, json=data)
+    response = clerk_session.patch(f"{CLERK_API_URL}/users/{clerk_id}", headers=clerk_headers(), json=data)
 
     if response.status_code == 200:
-        return response.json()  
+        return response.json()
     else:
-        response.raise_for_status()  
+        response.raise_for_status()
@@ -0,0 +1,70 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from db.database import SessionLocal
+from crud.test import complete_open_attempts
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних задач держать в памяти для опроса статуса
+JOB_HISTORY_SIZE = 200
+
+
+class JobRegistry:
+    """Фоновые задачи процесса и их прогресс."""
+
+    def __init__(self, history_size: int = JOB_HISTORY_SIZE):
+        self.history_size = history_size
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, **params) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "status": "pending",
+            "done": 0,
+            "total": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+            return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+
+job_registry = JobRegistry()
+
+
+def run_complete_open_attempts(job_id: str, test_id: int):
+    """Фоновая задача: завершить открытые попытки теста с отчётом о прогрессе."""
+    job_registry.update(job_id, status="running")
+    db = SessionLocal()
+    try:
+        completed = complete_open_attempts(
+            db, test_id,
+            progress=lambda done, total: job_registry.update(job_id, done=done, total=total),
+        )
+        job_registry.update(job_id, status="done", result={"completed": completed}, finished_at=datetime.now(timezone.utc))
+    except Exception as e:
+        logger.exception("Completing open attempts of test %s failed", test_id)
+        job_registry.update(job_id, status="failed", error=str(e), finished_at=datetime.now(timezone.utc))
+    finally:
+        db.close()
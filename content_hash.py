@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+# Поля, которые входят в отпечаток вопроса. Кроме текста, типа, баллов и набора ответов
+# сюда входят порядок и картинка — всё, что записывается при сохранении теста
+QUESTION_HASH_FIELDS = ("text", "question_type", "order", "points", "image_hash")
+ANSWER_HASH_FIELDS = ("text", "is_correct", "image_hash")
+BELBIN_QUESTION_HASH_FIELDS = ("text", "block_number", "order")
+BELBIN_ANSWER_HASH_FIELDS = ("text", "role_id")
+
+
+def _digest(payload) -> str:
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _normalized_answers(answers: list[dict], fields: tuple[str, ...]) -> list:
+    # Порядок ответов не важен — сравниваем как множество
+    return sorted(([answer.get(f) for f in fields] for answer in answers), key=lambda item: json.dumps(item, default=str))
+
+
+def question_content_hash(question: dict, answers: list[dict]) -> str:
+    return _digest({
+        "question": [question.get(f) for f in QUESTION_HASH_FIELDS],
+        "answers": _normalized_answers(answers, ANSWER_HASH_FIELDS),
+    })
+
+
+def belbin_question_content_hash(question: dict, answers: list[dict]) -> str:
+    return _digest({
+        "question": [question.get(f) for f in BELBIN_QUESTION_HASH_FIELDS],
+        "answers": _normalized_answers(answers, BELBIN_ANSWER_HASH_FIELDS),
+    })
+
+
+def get_test_fingerprint(test_values: dict, question_hashes: list[str], belbin_question_hashes: list[str]) -> str:
+    """Отпечаток всего теста — для ETag и инвалидации кэшей."""
+    return _digest({
+        "test": test_values,
+        "questions": sorted(h or "" for h in question_hashes),
+        "belbin_questions": sorted(h or "" for h in belbin_question_hashes),
+    })
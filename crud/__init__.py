@@ -1,4 +1,7 @@
 from .belbin import  get_test_results, get_belbin_roles, create_belbin_role, update_belbin_role, delete_belbin_role, create_belbin_position, delete_belbin_position, update_belbin_position, get_belbin_position, delete_belbin_requiriment
-from .employee import get_employee, get_employees, create_employee, update_employee, delete_employee, update_employee, update_profile, delete_current_user, create_account
+from .employee import get_employee, get_employees, create_employee, update_employee, delete_employee, update_employee, update_profile, delete_current_user, create_account, get_employee_photo_hash, get_employee_photo
 from .positions import get_positions, get_position, create_position, delete_position, update_position
-from .test import create_test, get_test, get_tests_by_position, get_tests, delete_test, update_test, change_test_status, get_assigned_tests_for_employee, complete_test, start_test, create_user_answer, get_current_user, assign_test_to_employees, remove_test_assignments, calculate_test_result, get_test_results_with_employee, reset_test_for_employee, get_assigned_test_for_employee
\ No newline at end of file
+from .test import create_test, get_test, get_test_etag, get_tests_by_position, get_tests, delete_test, update_test, change_test_status, get_assigned_tests_for_employee, complete_test, start_test, create_user_answer, create_user_answers, get_current_user, assign_test_to_employees, assign_test_by_filter, remove_test_assignments, calculate_test_result, get_test_results_with_employee, reset_test_for_employee, get_assigned_test_for_employee, retry_quarantined_attempts
+from .async_test import start_test_async, create_user_answer_async, create_user_answers_async, get_assigned_tests_for_employee_async, complete_test_async
+from .belbin_fit import evaluate_test, get_fit_report
+from .team_builder import build_teams
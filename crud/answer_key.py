@@ -0,0 +1,163 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+from sqlalchemy.orm import Session
+from models import Question, Answer, BelbinQuestion, BelbinAnswer, Test
+
+ANSWER_KEY_CACHE_SIZE = int(os.getenv("ANSWER_KEY_CACHE_SIZE", "256"))
+
+
+def compile_answer_keys(db: Session, test_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Собрать ключи ответов для набора тестов двумя запросами.
+
+    Ключ теста:
+    {"questions": {question_id: {"question_type", "points", "correct_ids", "correct_texts", "answer_ids"}},
+     "belbin_questions": {question_id: {answer_id: {"role_id", "score"}}}}
+    """
+    test_ids = list(test_ids)
+    if not test_ids:
+        return {}
+
+    rows = (
+        db.query(
+            Question.test_id,
+            Question.id,
+            Question.question_type,
+            Question.points,
+            Answer.id,
+            Answer.text,
+            Answer.is_correct,
+        )
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .filter(Question.test_id.in_(test_ids))
+        .all()
+    )
+    belbin_rows = (
+        db.query(BelbinQuestion.test_id, BelbinQuestion.id, BelbinAnswer.id, BelbinAnswer.role_id, BelbinAnswer.score)
+        .outerjoin(BelbinAnswer, BelbinAnswer.question_id == BelbinQuestion.id)
+        .filter(BelbinQuestion.test_id.in_(test_ids))
+        .all()
+    )
+
+    keys = {test_id: {"questions": {}, "belbin_questions": {}} for test_id in test_ids}
+    for test_id, question_id, question_type, points, answer_id, answer_text, is_correct in rows:
+        entry = keys[test_id]["questions"].setdefault(question_id, {
+            "question_type": question_type,
+            "points": points or 0,
+            "correct_ids": set(),
+            "correct_texts": set(),
+            "answer_ids": set(),
+        })
+        if answer_id is None:
+            continue
+        entry["answer_ids"].add(answer_id)
+        if is_correct:
+            entry["correct_ids"].add(answer_id)
+            if answer_text is not None:
+                entry["correct_texts"].add(answer_text.strip().lower())
+
+    for test_id, question_id, answer_id, role_id, score in belbin_rows:
+        answers = keys[test_id]["belbin_questions"].setdefault(question_id, {})
+        if answer_id is not None:
+            answers[answer_id] = {"role_id": role_id, "score": score}
+
+    # Ключ разделяется между запросами — замораживаем множества
+    for key in keys.values():
+        for entry in key["questions"].values():
+            for field in ("correct_ids", "correct_texts", "answer_ids"):
+                entry[field] = frozenset(entry[field])
+    return keys
+
+
+class AnswerKeyCache:
+    """LRU скомпилированных ключей ответов по test_id.
+
+    Сбрасывается при изменении и удалении теста. Ключ, собранный до сброса,
+    в кэш не попадает — для этого у каждого теста есть номер версии.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: OrderedDict[int, Dict] = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, test_id: int) -> Dict | None:
+        with self._lock:
+            key = self._items.get(test_id)
+            if key is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(test_id)
+            self.hits += 1
+            return key
+
+    def version(self, test_id: int) -> int:
+        with self._lock:
+            return self._versions.get(test_id, 0)
+
+    def put(self, test_id: int, key: Dict, version: int):
+        with self._lock:
+            if self._versions.get(test_id, 0) != version:
+                return
+            self._items[test_id] = key
+            self._items.move_to_end(test_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, test_id: int):
+        with self._lock:
+            self._items.pop(test_id, None)
+            self._versions[test_id] = self._versions.get(test_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+answer_key_cache = AnswerKeyCache()
+
+
+def get_answer_key(db: Session, test_id: int) -> Dict:
+    """Ключ ответов теста из кэша, при промахе — два запроса."""
+    key = answer_key_cache.get(test_id)
+    if key is not None:
+        return key
+    version = answer_key_cache.version(test_id)
+    key = compile_answer_keys(db, [test_id])[test_id]
+    answer_key_cache.put(test_id, key, version)
+    return key
+
+
+def invalidate_answer_key(test_id: int):
+    answer_key_cache.invalidate(test_id)
+
+
+def preload_answer_keys(db: Session) -> int:
+    """Загрузить в кэш ключи активных тестов."""
+    test_ids = [
+        test_id for (test_id,) in db.query(Test.id)
+        .filter(Test.status == "active", Test.is_active == True)
+        .order_by(Test.id.desc())
+        .limit(answer_key_cache.maxsize)
+    ]
+    versions = {test_id: answer_key_cache.version(test_id) for test_id in test_ids}
+    for test_id, key in compile_answer_keys(db, test_ids).items():
+        answer_key_cache.put(test_id, key, versions[test_id])
+    return len(test_ids)
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from models import Employee, Test, TestResult
+from schemas.test import UserAnswerCreate, SafeTest
+from db.database import ThreadpoolSession
+from crud.answer_key import get_answer_key
+from crud.test import (
+    start_test, create_user_answer, create_user_answers, get_assigned_tests_for_employee, complete_test,
+    check_test_availability, check_answers_batch, validate_answers, save_pending_answers, saved_answer_response,
+)
+
+# Точки входа прохождения теста для AsyncSession.
+# Нативно (select + await db.execute) реализовано только автосохранение ответов — самый частый запрос.
+# Старт, завершение и список назначенных тестов — адаптеры: синхронная логика из crud.test
+# выполняется через run_sync (greenlet поверх асинхронного драйвера), запросы те же, что и без USE_ASYNC_DB.
+# Без USE_ASYNC_DB сессия — ThreadpoolSession, и всё идёт через синхронные функции в пуле потоков.
+
+
+async def start_test_async(db: AsyncSession, user_id: str, test_id: int):
+    """Адаптер start_test через run_sync."""
+    return await db.run_sync(start_test, user_id, test_id)
+
+
+async def load_available_test(db: AsyncSession, user_id: str, test_id: int):
+    """Сотрудник и тест, который он сейчас может проходить."""
+    employee = (await db.execute(select(Employee).where(Employee.clerk_id == user_id))).scalars().first()
+    if employee is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    test = (await db.execute(select(Test).where(Test.id == test_id, Test.is_active == True))).scalars().first()
+    if not test:
+        raise HTTPException(status_code=400, detail="Test not available")
+
+    test_result = None
+    if test.time_limit_minutes:
+        test_result = (await db.execute(
+            select(TestResult).where(TestResult.test_id == test.id, TestResult.employee_id == employee.id)
+        )).scalars().first()
+    check_test_availability(test, test_result, datetime.now(timezone.utc))
+    return employee, test
+
+
+async def save_answers_async(db: AsyncSession, user_answers: List[UserAnswerCreate], user_id: str):
+    test_id = check_answers_batch(user_answers)
+    employee, test = await load_available_test(db, user_id, test_id)
+    # Ключ ответов почти всегда берётся из кэша, запросы на промахе идут тем же драйвером
+    answer_key = await db.run_sync(get_answer_key, test.id)
+    regular, belbin = validate_answers(user_answers, answer_key)
+    # С включённым attempt_store это только запись в память, без обращения к БД
+    user_answer_ids = await db.run_sync(save_pending_answers, test.id, employee.id, regular, belbin)
+    return employee, regular, belbin, user_answer_ids
+
+
+async def create_user_answer_async(db: AsyncSession, user_answer: UserAnswerCreate, user_id: str):
+    if isinstance(db, ThreadpoolSession):
+        return await db.run_sync(create_user_answer, user_answer, user_id)
+    employee, _, _, user_answer_ids = await save_answers_async(db, [user_answer], user_id)
+    return saved_answer_response(user_answer, employee.id, user_answer_ids)
+
+
+async def create_user_answers_async(db: AsyncSession, user_answers: List[UserAnswerCreate], user_id: str):
+    if isinstance(db, ThreadpoolSession) or not user_answers:
+        return await db.run_sync(create_user_answers, user_answers, user_id)
+    _, regular, belbin, _ = await save_answers_async(db, user_answers, user_id)
+    return {"status": "Answers saved", "saved": len(regular) + len(belbin)}
+
+
+async def get_assigned_tests_for_employee_async(db: AsyncSession, user_id: str) -> List[SafeTest]:
+    """Адаптер get_assigned_tests_for_employee через run_sync."""
+    return await db.run_sync(get_assigned_tests_for_employee, user_id)
+
+
+async def complete_test_async(db: AsyncSession, user_id: str, test_id: int):
+    """Адаптер complete_test через run_sync: завершение ждёт сброса ответов из attempt_store и считает баллы синхронным кодом."""
+    return await db.run_sync(complete_test, user_id, test_id)
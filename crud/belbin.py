@@ -222,76 +222,6 @@ def delete_belbin_requiriment(db: Session, requiriment_id: int, user_id: str):
     db.commit()
     return requiriment
 
-# def evaluate_test(db: Session, test_id: int):
-    # Получаем тест и ответы
-    # test = db.query(models.Test).filter(models.Test.id == test_id).first()
-    # if not test:
-    #     return None
-
-    # # Получаем требования для должности сотрудника
-    # employee = db.query(models.Employee).filter(models.Employee.id == test.employee_id).first()
-    # requirements = db.query(models.BelbinPositionRequirement).filter(
-    #     models.BelbinPositionRequirement.position_id == employee.position_id
-    # ).all()
-
-    # # Вычисляем баллы по ролям
-    # role_scores = {}
-    # for answer in test.answers:
-    #     question = db.query(models.BelbinQuestion).filter(
-    #         models.BelbinQuestion.id == answer.question_id
-    #     ).first()
-    #     role_id = question.role_id
-    #     role_scores[role_id] = role_scores.get(role_id, 0) + answer.score
-
-    # # Нормализуем баллы (сумма по блокам = 10, всего 7 блоков -> max 70)
-    # total_possible = 70
-    # results = []
-    # key_roles_met = 0
-    # total_key_roles = 0
-
-    # for req in requirements:
-    #     role_score = role_scores.get(req.role_id, 0)
-    #     normalized_score = (role_score / total_possible) * 100
-    #     meets_requirement = normalized_score >= req.min_score
-
-    #     if req.is_key:
-    #         total_key_roles += 1
-    #         if meets_requirement:
-    #             key_roles_met += 1
-
-    #     db_result = models.BelbinTestResult(
-    #         test_id=test_id,
-    #         role_id=req.role_id,
-    #         total_score=normalized_score,
-    #         is_required=req.is_key,
-    #         meets_requirement=meets_requirement
-    #     )
-    #     db.add(db_result)
-    #     results.append(db_result)
-
-    # # Определяем общий результат
-    # if total_key_roles == 0:
-    #     overall_result = "high"
-    # else:
-    #     ratio = key_roles_met / total_key_roles
-    #     if ratio >= 0.8:
-    #         overall_result = "high"
-    #     elif ratio >= 0.5:
-    #         overall_result = "medium"
-    #     else:
-    #         overall_result = "low"
-
-    # test.completed_at = datetime.utcnow()
-    # db.commit()
-
-    # return {
-    #     "test_id": test_id,
-    #     "employee_id": test.employee_id,
-    #     "overall_result": overall_result,
-    #     "results": results
-    # }
-
-
 def get_test_results(db: Session, test_id: int):
     test = db.query(models.Test).filter(models.Test.id == test_id).first()
     if not test:
@@ -0,0 +1,211 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from typing import Dict, List, Tuple
+from models import Employee, Position, BelbinRole, TestResult, BelbinTestResult, BelbinPositionRequirement
+from crud.test import check_user_permissions
+
+# Доля выполненных ключевых ролей для оценок high / medium
+HIGH_KEY_COVERAGE = 0.8
+MEDIUM_KEY_COVERAGE = 0.5
+# Сотрудники обрабатываются блоками, чтобы матрица сотрудники × должности × роли не разрасталась
+FIT_CHUNK_SIZE = 1000
+
+
+def compute_fit(scores: np.ndarray, min_scores: np.ndarray, required: np.ndarray, key: np.ndarray) -> Dict[str, np.ndarray]:
+    """Соответствие всех сотрудников всем должностям за один проход.
+
+    scores — сотрудники × роли; min_scores, required, key — должности × роли.
+    Баллы и пороги сравниваются как есть, в сырых баллах роли (BelbinTestResult.total_score).
+    fit — средняя доля выполнения требований по ролям (0–100), key_coverage — доля
+    выполненных ключевых ролей, verdict — high / medium / low по key_coverage
+    (для должностей без ключевых ролей — по fit).
+    """
+    s = scores[:, None, :]
+    m = min_scores[None, :, :]
+    meets = (s >= m) & required[None]
+
+    # Выполнение требования по роли не больше 1; роль без порога считается выполненной
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(m > 0, np.minimum(s / m, 1.0), 1.0)
+    required_count = required.sum(axis=1)
+    fit = np.where(
+        required_count > 0,
+        (ratio * required[None]).sum(axis=2) / np.maximum(required_count, 1) * 100,
+        100.0,
+    )
+
+    key_count = key.sum(axis=1)
+    key_met = (meets & key[None]).sum(axis=2)
+    key_coverage = np.where(key_count > 0, key_met / np.maximum(key_count, 1), 1.0)
+    # Без ключевых ролей оценка строится по общему соответствию с теми же порогами
+    rating = np.where(key_count > 0, key_coverage, fit / 100)
+    verdict = np.select(
+        [rating >= HIGH_KEY_COVERAGE, rating >= MEDIUM_KEY_COVERAGE],
+        ["high", "medium"],
+        "low",
+    )
+    return {"fit": fit, "key_coverage": key_coverage, "verdict": verdict, "meets": meets}
+
+
+def load_role_scores(db: Session, admin_id: int, test_id: int | None = None) -> Dict[int, Tuple[int, Dict[int, float]]]:
+    """Баллы по ролям сотрудников администратора: {employee_id: (test_result_id, {role_id: score})}.
+
+    Берётся последняя завершённая попытка с профилем Белбина (или попытка указанного теста).
+    """
+    query = (
+        db.query(TestResult.employee_id, TestResult.id, BelbinTestResult.role_id, BelbinTestResult.total_score)
+        .join(BelbinTestResult, BelbinTestResult.test_id == TestResult.id)
+        .join(Employee, Employee.id == TestResult.employee_id)
+        .filter(Employee.created_by_id == admin_id, TestResult.is_completed == True)
+    )
+    if test_id is not None:
+        query = query.filter(TestResult.test_id == test_id)
+    rows = query.order_by(TestResult.completed_at.asc().nullsfirst(), TestResult.id).all()
+
+    latest = {}
+    for employee_id, result_id, role_id, total_score in rows:
+        if employee_id not in latest or latest[employee_id][0] != result_id:
+            latest[employee_id] = (result_id, {})
+        latest[employee_id][1][role_id] = total_score or 0
+    return latest
+
+
+def load_requirements(db: Session, admin_id: int) -> Dict[int, Dict[int, Tuple[int, bool]]]:
+    """Требования должностей администратора: {position_id: {role_id: (min_score, is_key)}}."""
+    rows = (
+        db.query(BelbinPositionRequirement.position_id, BelbinPositionRequirement.role_id,
+                 BelbinPositionRequirement.min_score, BelbinPositionRequirement.is_key)
+        .join(Position, Position.id == BelbinPositionRequirement.position_id)
+        .filter(Position.created_by_id == admin_id)
+        .all()
+    )
+    requirements = {}
+    for position_id, role_id, min_score, is_key in rows:
+        requirements.setdefault(position_id, {})[role_id] = (min_score or 0, bool(is_key))
+    return requirements
+
+
+def build_matrices(role_scores: Dict, requirements: Dict):
+    """Матрицы сотрудники × роли и должности × роли с общей осью ролей."""
+    employee_ids = list(role_scores)
+    position_ids = list(requirements)
+    role_ids = sorted(
+        {role_id for _, scores in role_scores.values() for role_id in scores}
+        | {role_id for roles in requirements.values() for role_id in roles}
+    )
+    role_index = {role_id: i for i, role_id in enumerate(role_ids)}
+
+    scores = np.zeros((len(employee_ids), len(role_ids)))
+    for row, employee_id in enumerate(employee_ids):
+        for role_id, score in role_scores[employee_id][1].items():
+            scores[row, role_index[role_id]] = score
+
+    min_scores = np.zeros((len(position_ids), len(role_ids)))
+    required = np.zeros((len(position_ids), len(role_ids)), dtype=bool)
+    key = np.zeros((len(position_ids), len(role_ids)), dtype=bool)
+    for row, position_id in enumerate(position_ids):
+        for role_id, (min_score, is_key) in requirements[position_id].items():
+            min_scores[row, role_index[role_id]] = min_score
+            required[row, role_index[role_id]] = True
+            key[row, role_index[role_id]] = is_key
+    return employee_ids, position_ids, role_ids, scores, min_scores, required, key
+
+
+def load_names(db: Session, employee_ids: List[int], position_ids: List[int], role_ids: List[int]):
+    employees = {
+        employee_id: (f"{last_name or ''} {first_name or ''}".strip(), position_id)
+        for employee_id, last_name, first_name, position_id in db.query(
+            Employee.id, Employee.last_name, Employee.first_name, Employee.position_id
+        ).filter(Employee.id.in_(employee_ids))
+    }
+    positions = dict(db.query(Position.id, Position.title).filter(Position.id.in_(position_ids)).all())
+    roles = dict(db.query(BelbinRole.id, BelbinRole.name).filter(BelbinRole.id.in_(role_ids)).all())
+    return employees, positions, roles
+
+
+def get_fit_report(db: Session, user_id: str, test_id: int | None = None, position_id: int | None = None, top: int | None = None):
+    """Соответствие всех сотрудников администратора всем должностям с требованиями Белбина."""
+    admin = check_user_permissions(db, user_id, True)
+    role_scores = load_role_scores(db, admin.id, test_id)
+    requirements = load_requirements(db, admin.id)
+    if position_id is not None:
+        requirements = {pid: roles for pid, roles in requirements.items() if pid == position_id}
+
+    employee_ids, position_ids, role_ids, scores, min_scores, required, key = build_matrices(role_scores, requirements)
+    employees, positions, roles = load_names(db, employee_ids, position_ids, role_ids)
+
+    report = []
+    for start in range(0, len(employee_ids), FIT_CHUNK_SIZE):
+        fit = compute_fit(scores[start:start + FIT_CHUNK_SIZE], min_scores, required, key)
+        # Должности каждого сотрудника по убыванию соответствия
+        order = np.argsort(-fit["fit"], axis=1, kind="stable")
+        if top is not None:
+            order = order[:, :top]
+        for row, employee_id in enumerate(employee_ids[start:start + FIT_CHUNK_SIZE]):
+            name, current_position_id = employees.get(employee_id, ("", None))
+            report.append({
+                "employee_id": employee_id,
+                "employee_name": name,
+                "current_position_id": current_position_id,
+                "test_result_id": role_scores[employee_id][0],
+                "positions": [
+                    {
+                        "position_id": position_ids[col],
+                        "position_name": positions.get(position_ids[col], ""),
+                        "fit": round(float(fit["fit"][row, col]), 2),
+                        "key_coverage": round(float(fit["key_coverage"][row, col]), 4),
+                        "overall_result": str(fit["verdict"][row, col]),
+                    }
+                    for col in order[row]
+                ],
+            })
+
+    return {
+        "roles": [{"id": role_id, "name": roles.get(role_id, "")} for role_id in role_ids],
+        "employees": report,
+    }
+
+
+def evaluate_test(db: Session, test_id: int, user_id: str):
+    """Соответствие прошедших тест сотрудников их текущим должностям, с разбивкой по ролям."""
+    admin = check_user_permissions(db, user_id, True)
+    role_scores = load_role_scores(db, admin.id, test_id)
+    requirements = load_requirements(db, admin.id)
+
+    employee_ids, position_ids, role_ids, scores, min_scores, required, key = build_matrices(role_scores, requirements)
+    employees, positions, roles = load_names(db, employee_ids, position_ids, role_ids)
+    if not employee_ids or not position_ids:
+        return []
+
+    fit = compute_fit(scores, min_scores, required, key)
+    position_index = {position_id: i for i, position_id in enumerate(position_ids)}
+
+    evaluations = []
+    for row, employee_id in enumerate(employee_ids):
+        name, current_position_id = employees.get(employee_id, ("", None))
+        col = position_index.get(current_position_id)
+        if col is None:
+            continue
+        evaluations.append({
+            "employee_id": employee_id,
+            "employee_name": name,
+            "position_id": current_position_id,
+            "position_name": positions.get(current_position_id, ""),
+            "test_result_id": role_scores[employee_id][0],
+            "fit": round(float(fit["fit"][row, col]), 2),
+            "key_coverage": round(float(fit["key_coverage"][row, col]), 4),
+            "overall_result": str(fit["verdict"][row, col]),
+            "roles": [
+                {
+                    "role_id": role_id,
+                    "role_name": roles.get(role_id, ""),
+                    "score": float(scores[row, i]),
+                    "min_score": int(min_scores[col, i]),
+                    "is_key": bool(key[col, i]),
+                    "meets_requirement": bool(fit["meets"][row, col, i]),
+                }
+                for i, role_id in enumerate(role_ids)
+                if required[col, i]
+            ],
+        })
+    return evaluations
@@ -4,10 +4,13 @@ from schemas import employee as schema
 from datetime import date
 from fastapi import HTTPException, status
 from crud.test import get_current_user, check_user_permissions
+from crud.principal import invalidate_principal
 from typing import Union
 from models.test import test_assignments
 from sqlalchemy.exc import IntegrityError
 from psycopg2.errors import UniqueViolation
+from media_store import make_thumbnail
+import hashlib
 
 def create_account(db:Session, employee: schema.EmployeeMinimal):
     try:
@@ -22,6 +25,7 @@ def create_account(db:Session, employee: schema.EmployeeMinimal):
         )
         db.add(new_user)
         db.commit()
+        invalidate_principal(db, new_user.clerk_id)
         db.refresh(new_user)
         return new_user
     except IntegrityError as e:
@@ -38,6 +42,40 @@ def create_account(db:Session, employee: schema.EmployeeMinimal):
         raise HTTPException(status_code=500, detail=f"Ошибка создания сотрудника: {str(e)}")
 
 
+def set_employee_photo(db_employee: model.Employee, photo: bytes):
+    """Сохранить фото сотрудника вместе с миниатюрой и хэшем для ETag."""
+    db_employee.photo = photo
+    db_employee.photo_thumbnail = make_thumbnail(photo)
+    db_employee.photo_hash = hashlib.sha256(photo).hexdigest()
+
+
+def get_employee_photo_hash(db: Session, employee_id: int, user_id: str):
+    """Хэш фото сотрудника с проверкой доступа (без загрузки самого фото)."""
+    user = get_current_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    row = db.query(model.Employee.photo_hash, model.Employee.created_by_id).filter(model.Employee.id == employee_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Employee not found.")
+    photo_hash, created_by_id = row
+    if employee_id != user.id and created_by_id != user.id:
+        raise HTTPException(status_code=403, detail="You do not have permission to get this photo.")
+    if not photo_hash:
+        raise HTTPException(status_code=404, detail="Photo not found.")
+    return photo_hash
+
+
+def get_employee_photo(db: Session, employee_id: int, size: str = "full"):
+    """Загрузить только нужную колонку с фото."""
+    column = model.Employee.photo_thumbnail if size == "thumbnail" else model.Employee.photo
+    data = db.query(column).filter(model.Employee.id == employee_id).scalar()
+    if data is None and size == "thumbnail":
+        # Для картинок, которые не удалось уменьшить, отдаём оригинал
+        data = db.query(model.Employee.photo).filter(model.Employee.id == employee_id).scalar()
+    return data
+
+
 def get_employee(db: Session, employee_id: int, user_id: str):
     user = get_current_user(db, user_id)
     try:
@@ -55,6 +93,7 @@ def delete_current_user(db: Session, user_id: str):
         user = get_current_user(db, user_id)
         db.delete(user)
         db.commit()
+        invalidate_principal(db, user_id)
         return user
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting current user: {str(e)}")
@@ -78,7 +117,7 @@ def create_employee(db: Session, employee: Union[schema.EmployeeCreate, schema.E
             created_by_id=user.id,
         )
         if photo:
-            db_employee.photo = photo
+            set_employee_photo(db_employee, photo)
         db.add(db_employee)
         db.commit()
         db.refresh(db_employee)
@@ -111,6 +150,7 @@ def delete_employee(db: Session, employee_id: str, user_id: str):
 
         db.delete(db_employee)
         db.commit()
+        invalidate_principal(db, db_employee.clerk_id)
         return {"detail": "Employee deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting employee: {str(e)}")
@@ -123,12 +163,14 @@ def update_employee(db: Session, employee_id: int, employee_update: schema.Emplo
         if not db_employee:
             raise HTTPException(status_code=404, detail="Employee not found.")
         
+        old_clerk_id = db_employee.clerk_id
         for field, value in employee_update.dict(exclude_unset=True, exclude_none=True, exclude=["is_admin"]).items():
             setattr(db_employee, field, value)
         if photo is not None:
-            setattr(db_employee, "photo", photo)
+            set_employee_photo(db_employee, photo)
             
         db.commit()
+        invalidate_principal(db, old_clerk_id, db_employee.clerk_id)
         db.refresh(db_employee)
         return schema.Employee.model_validate(db_employee)
     except Exception as e:
@@ -140,8 +182,9 @@ def update_profile(db: Session, user_update: schema.EmployeeCreate, photo: Union
         for field, value in user_update.dict(exclude_unset=True, exclude_none=True, exclude=["is_admin"]).items():
             setattr(user, field, value)
         if photo is not None:
-            setattr(user, "photo", photo)
+            set_employee_photo(user, photo)
         db.commit()
+        invalidate_principal(None, user_id)
         db.refresh(user)
         return schema.Employee.model_validate(user, from_attributes=True)
     except Exception as e:
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models.employee import Employee
+
+# 0 — кэш между запросами выключен, сотрудник ищется один раз за запрос
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "0"))
+
+_principal_cache: dict[str, tuple[float, dict]] = {}
+_principal_cache_lock = threading.Lock()
+
+
+def _employee_values(employee: Employee) -> dict:
+    """Загруженные колонки сотрудника (отложенные фото не трогаем)."""
+    state = inspect(employee)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _cached_employee(db: Session, user_id: str) -> Employee | None:
+    if PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return None
+    with _principal_cache_lock:
+        item = _principal_cache.get(user_id)
+        if item is None or item[0] <= time.monotonic():
+            _principal_cache.pop(user_id, None)
+            return None
+        values = item[1]
+    # Прикрепляем копию к сессии без запроса к БД
+    employee = Employee(**values)
+    make_transient_to_detached(employee)
+    return db.merge(employee, load=False)
+
+
+def _remember_employee(user_id: str, employee: Employee):
+    if PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return
+    with _principal_cache_lock:
+        _principal_cache[user_id] = (time.monotonic() + PRINCIPAL_CACHE_TTL_SECONDS, _employee_values(employee))
+
+
+def resolve_employee(db: Session, user_id: str) -> Employee | None:
+    """Сотрудник по clerk_id — один запрос к БД на весь HTTP-запрос."""
+    principals = db.info.setdefault("principals", {})
+    if user_id in principals:
+        employee = principals[user_id]
+        if employee is None or not inspect(employee).deleted and not inspect(employee).detached:
+            return employee
+
+    employee = _cached_employee(db, user_id)
+    if employee is None:
+        employee = db.query(Employee).filter(Employee.clerk_id == user_id).first()
+        if employee is not None:
+            _remember_employee(user_id, employee)
+
+    principals[user_id] = employee
+    return employee
+
+
+def invalidate_principal(db: Session | None, *user_ids: str | None):
+    """Сбросить закэшированного сотрудника после изменения профиля или прав."""
+    with _principal_cache_lock:
+        for user_id in user_ids:
+            _principal_cache.pop(user_id, None)
+    if db is not None:
+        principals = db.info.get("principals", {})
+        for user_id in user_ids:
+            principals.pop(user_id, None)
+
+
+def clear_principal_cache():
+    with _principal_cache_lock:
+        _principal_cache.clear()
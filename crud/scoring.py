@@ -0,0 +1,102 @@
+from sqlalchemy.orm import Session
+from models import UserAnswer, UserAnswerItem
+from crud.answer_key import get_answer_key
+from typing import Dict, Iterable, Tuple
+from collections import defaultdict
+
+
+def load_user_answers(db: Session, test_id: int, employee_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Загрузить ответы сотрудников на обычные вопросы теста двумя запросами."""
+    employee_ids = list(employee_ids)
+    answers_by_employee = {
+        employee_id: {
+            "text_by_question": {},
+            "first_answer_by_question": {},
+            "selected_by_question": defaultdict(set),
+        }
+        for employee_id in employee_ids
+    }
+    if not employee_ids:
+        return answers_by_employee
+
+    user_answers = (
+        db.query(UserAnswer.id, UserAnswer.employee_id, UserAnswer.question_id, UserAnswer.text_response)
+        .filter(
+            UserAnswer.test_id == test_id,
+            UserAnswer.employee_id.in_(employee_ids),
+        )
+        .order_by(UserAnswer.id)
+        .all()
+    )
+
+    # Для single_choice и text_answer учитывается первая запись UserAnswer по вопросу
+    first_user_answer_ids = set()
+    for ua_id, employee_id, question_id, text_response in user_answers:
+        data = answers_by_employee[employee_id]
+        if question_id not in data["text_by_question"]:
+            data["text_by_question"][question_id] = text_response
+            first_user_answer_ids.add(ua_id)
+
+    items = (
+        db.query(UserAnswerItem.user_answer_id, UserAnswerItem.answer_id, UserAnswer.employee_id, UserAnswer.question_id)
+        .join(UserAnswer, UserAnswer.id == UserAnswerItem.user_answer_id)
+        .filter(
+            UserAnswer.test_id == test_id,
+            UserAnswer.employee_id.in_(employee_ids),
+        )
+        .order_by(UserAnswerItem.id)
+        .all()
+    )
+
+    for user_answer_id, answer_id, employee_id, question_id in items:
+        data = answers_by_employee[employee_id]
+        data["selected_by_question"][question_id].add(answer_id)
+        if user_answer_id in first_user_answer_ids:
+            data["first_answer_by_question"].setdefault(question_id, answer_id)
+
+    return answers_by_employee
+
+
+def score_answers(answer_key: Dict[int, Dict], user_answers: Dict) -> Tuple[int, int]:
+    """Посчитать (score, max_score) для ответов одного сотрудника в памяти."""
+    score = 0
+    max_score = 0
+
+    for question_id, entry in answer_key.items():
+        question_type = entry["question_type"]
+        points = entry["points"]
+
+        if question_type == "single_choice":
+            max_score += points
+            answer_id = user_answers["first_answer_by_question"].get(question_id)
+            if answer_id is not None and answer_id in entry["correct_ids"]:
+                score += points
+
+        elif question_type == "multiple_choice":
+            max_score += points
+            if not entry["correct_ids"]:
+                continue
+            if user_answers["selected_by_question"].get(question_id, set()) == entry["correct_ids"]:
+                score += points
+
+        elif question_type == "text_answer":
+            max_score += points
+            text_response = user_answers["text_by_question"].get(question_id)
+            if text_response and text_response.strip().lower() in entry["correct_texts"]:
+                score += points
+
+        # Вопросы Белбина считаются отдельно
+
+    return score, max_score
+
+
+def score_attempts(db: Session, test_id: int, employee_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+    """Посчитать баллы по тесту для нескольких сотрудников за фиксированное число запросов."""
+    employee_ids = list(employee_ids)
+    answer_key = get_answer_key(db, test_id)["questions"]
+    answers_by_employee = load_user_answers(db, test_id, employee_ids)
+
+    return {
+        employee_id: score_answers(answer_key, answers_by_employee[employee_id])
+        for employee_id in employee_ids
+    }
@@ -0,0 +1,162 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from typing import List, Tuple
+from fastapi import HTTPException
+from schemas import belbin as schema
+from crud.test import check_user_permissions
+from crud.belbin_fit import load_role_scores, load_requirements, load_names
+
+# Сколько лучших кандидатов по каждой роли и по сумме баллов остаётся в пуле поиска
+TEAM_CANDIDATES_PER_ROLE = 40
+# Сколько стартовых составов перебирается (жадная сборка + локальный поиск от каждого)
+TEAM_SEARCH_SEEDS = 30
+TEAM_LOCAL_SEARCH_ROUNDS = 20
+# Покрытие ролей важнее суммы баллов: одна покрытая роль перевешивает любой прирост силы
+COVERAGE_WEIGHT = 1e6
+
+
+class TeamProblem:
+    """Матрицы задачи: баллы кандидатов по целевым ролям и требования состава."""
+
+    def __init__(self, scores: np.ndarray, min_scores: np.ndarray, counts: np.ndarray):
+        self.scores = scores  # кандидаты × роли
+        self.covers = scores >= min_scores  # кандидат подходит на роль
+        self.counts = counts  # сколько участников нужно на роль
+
+    def evaluate(self, base: List[int], candidates: np.ndarray) -> np.ndarray:
+        """Оценка составов base + один кандидат для всех candidates сразу.
+
+        Сначала число закрытых мест по ролям (не больше нужного count), затем
+        сила — сумма лучших баллов состава по каждой целевой роли.
+        """
+        covered = self.covers[base].sum(axis=0) if base else np.zeros(self.scores.shape[1])
+        best = self.scores[base].max(axis=0) if base else np.zeros(self.scores.shape[1])
+        coverage = np.minimum(covered[None] + self.covers[candidates], self.counts[None]).sum(axis=1)
+        strength = np.maximum(best[None], self.scores[candidates]).sum(axis=1)
+        return coverage * COVERAGE_WEIGHT + strength
+
+    def score(self, team: List[int]) -> float:
+        return float(self.evaluate(team[:-1], np.array(team[-1:]))[0])
+
+    def best_addition(self, base: List[int]) -> Tuple[int | None, float]:
+        candidates = np.setdiff1d(np.arange(len(self.scores)), base)
+        if not len(candidates):
+            return None, float("-inf")
+        values = self.evaluate(base, candidates)
+        i = int(np.argmax(values))
+        return int(candidates[i]), float(values[i])
+
+    def build(self, seed: int, team_size: int) -> List[int]:
+        """Жадная сборка: на каждом шаге кандидат с наибольшим приростом оценки."""
+        team = [seed]
+        while len(team) < team_size:
+            candidate, _ = self.best_addition(team)
+            if candidate is None:
+                break
+            team.append(candidate)
+        return team
+
+    def improve(self, team: List[int]) -> List[int]:
+        """Локальный поиск: заменяем участника, пока замена улучшает оценку."""
+        current = self.score(team)
+        for _ in range(TEAM_LOCAL_SEARCH_ROUNDS):
+            best_move, best_value = None, current
+            for i in range(len(team)):
+                base = team[:i] + team[i + 1:]
+                candidate, value = self.best_addition(base)
+                if candidate is not None and candidate not in team and value > best_value + 1e-9:
+                    best_move, best_value = (i, candidate), value
+            if best_move is None:
+                break
+            team[best_move[0]] = best_move[1]
+            current = best_value
+        return team
+
+
+def select_candidates(scores: np.ndarray, per_role: int = TEAM_CANDIDATES_PER_ROLE) -> np.ndarray:
+    """Сократить пул: лучшие по каждой роли и лучшие по сумме баллов."""
+    if len(scores) <= per_role:
+        return np.arange(len(scores))
+    top = np.argpartition(-scores, per_role - 1, axis=0)[:per_role].ravel()
+    generalists = np.argpartition(-scores.sum(axis=1), per_role - 1)[:per_role]
+    return np.unique(np.concatenate([top, generalists]))
+
+
+def suggest_teams(scores: np.ndarray, min_scores: np.ndarray, counts: np.ndarray, team_size: int, top_k: int) -> List[Tuple[List[int], float]]:
+    """Лучшие составы команды (индексы строк scores) по убыванию оценки."""
+    if not len(scores):
+        return []
+    pool = select_candidates(scores, max(TEAM_CANDIDATES_PER_ROLE, team_size))
+    problem = TeamProblem(scores[pool], min_scores, counts)
+    team_size = min(team_size, len(pool))
+
+    # Старты — сильнейшие кандидаты на роли, начиная с самых редких: разные старты дают разные составы
+    per_role = max(TEAM_SEARCH_SEEDS // len(counts), 1)
+    seeds = []
+    for role in np.argsort(problem.covers.sum(axis=0), kind="stable"):
+        for candidate in np.argsort(-problem.scores[:, role], kind="stable")[:per_role]:
+            if int(candidate) not in seeds:
+                seeds.append(int(candidate))
+    seeds = seeds[:TEAM_SEARCH_SEEDS]
+
+    teams = {}
+    for seed in seeds:
+        team = problem.improve(problem.build(seed, team_size))
+        teams[frozenset(team)] = problem.score(team)
+
+    ranked = sorted(teams.items(), key=lambda item: -item[1])[:top_k]
+    return [([int(pool[i]) for i in sorted(team)], value) for team, value in ranked]
+
+
+def build_teams(db: Session, request: schema.TeamBuildRequest, user_id: str):
+    """Подобрать составы команды, покрывающие нужные роли Белбина."""
+    admin = check_user_permissions(db, user_id, True)
+    targets = [(target.role_id, target.min_score, target.count) for target in request.roles]
+    if not targets and request.position_id is not None:
+        requirements = load_requirements(db, admin.id).get(request.position_id, {})
+        targets = [(role_id, min_score, 1) for role_id, (min_score, _) in sorted(requirements.items())]
+    if not targets:
+        raise HTTPException(status_code=400, detail="Не заданы роли для команды")
+    role_scores = load_role_scores(db, admin.id, request.test_id)
+
+    role_ids = [role_id for role_id, _, _ in targets]
+    employee_ids = list(role_scores)
+    employees, _, roles = load_names(db, employee_ids, [], role_ids)
+    if request.employee_ids:
+        allowed = set(request.employee_ids)
+        employee_ids = [e for e in employee_ids if e in allowed]
+    if request.position_ids:
+        allowed = set(request.position_ids)
+        employee_ids = [e for e in employee_ids if employees.get(e, ("", None))[1] in allowed]
+    if len(employee_ids) < request.team_size:
+        raise HTTPException(status_code=400, detail="Недостаточно сотрудников с профилем Белбина для команды такого размера")
+
+    scores = np.array([[role_scores[e][1].get(role_id, 0) for role_id in role_ids] for e in employee_ids], dtype=float)
+    min_scores = np.array([min_score for _, min_score, _ in targets], dtype=float)
+    counts = np.array([count for _, _, count in targets])
+
+    teams = []
+    for team, _ in suggest_teams(scores, min_scores, counts, request.team_size, request.top_k):
+        covers = scores[team] >= min_scores
+        covered = np.minimum(covers.sum(axis=0), counts)
+        teams.append({
+            "members": [
+                {
+                    "employee_id": employee_ids[row],
+                    "employee_name": employees.get(employee_ids[row], ("", None))[0],
+                    "position_id": employees.get(employee_ids[row], ("", None))[1],
+                    "role_ids": [role_ids[i] for i in np.flatnonzero(covers[n])],
+                }
+                for n, row in enumerate(team)
+            ],
+            "covered_role_ids": [role_ids[i] for i in np.flatnonzero(covered >= counts)],
+            "missing_role_ids": [role_ids[i] for i in np.flatnonzero(covered < counts)],
+            "coverage": round(float(covered.sum() / counts.sum()), 4),
+            "strength": round(float(scores[team].max(axis=0).sum()), 2),
+        })
+
+    return {
+        "pool_size": len(employee_ids),
+        "roles": [{"id": role_id, "name": roles.get(role_id, "")} for role_id in role_ids],
+        "teams": teams,
+    }
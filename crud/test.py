@@ -3,49 +3,245 @@ from models import test as model
 from schemas import test as schema
 from models import Employee, Test, Question, BelbinQuestion, BelbinAnswer, TestSettings, UserAnswer, TestResult, UserAnswerItem, UserBelbinAnswer, BelbinTestResult, BelbinPositionRequirement, Position
 from fastapi import HTTPException, status
-from schemas.test import Test as TestSchema, TestWithAnswersSchema, UserAnswer as UserAnswerSchema, UserAnswerCreate, TestAssignmentCreate, SafeTest, SafeAnswer, SafeBelbinAnswer, SafeBelbinQuestion, SafeQuestion, TestResultSchema
+from schemas.test import Test as TestSchema, TestWithAnswersSchema, UserAnswer as UserAnswerSchema, UserAnswerCreate, TestAssignmentCreate, SafeTest, SafeAnswer, SafeBelbinAnswer, SafeBelbinQuestion, SafeQuestion, TestResultSchema, SavedUserAnswer
 from datetime import datetime, timezone, timedelta
-from typing import List, Set, Tuple, Dict, Iterable
-from sqlalchemy import insert, delete, and_
-from sqlalchemy.exc import IntegrityError
+from typing import List, Set, Tuple, Dict, Iterable, Callable
+from sqlalchemy import insert, update, delete, and_, or_, literal, func
+from sqlalchemy.exc import OperationalError, InterfaceError
 import json
+import logging
 from sqlalchemy import select
 
 from collections import defaultdict
+from crud.scoring import score_attempts
+from crud.answer_key import get_answer_key, invalidate_answer_key
+from crud.principal import resolve_employee
+from deadline_queue import deadline_queue, as_utc
+from attempt_store import attempt_store, PendingAnswer, REGULAR, BELBIN
+from media_store import resolve_image_hash
+from content_hash import (
+    QUESTION_HASH_FIELDS, ANSWER_HASH_FIELDS, BELBIN_QUESTION_HASH_FIELDS, BELBIN_ANSWER_HASH_FIELDS,
+    question_content_hash, belbin_question_content_hash, get_test_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ошибки связи с БД: буфер не трогаем, ответы запишутся при следующем сбросе
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+# Максимальный балл, который сотрудник может поставить варианту ответа Белбина
+BELBIN_MAX_SCORE = 10
+
+def compute_expires_at(test: model.Test, started_at: datetime | None) -> datetime | None:
+    """Дедлайн попытки: конец лимита времени или end_date теста, что наступит раньше."""
+    deadlines = []
+    if test.end_date:
+        deadlines.append(as_utc(test.end_date))
+    if test.time_limit_minutes is not None and started_at:
+        deadlines.append(as_utc(started_at) + timedelta(minutes=test.time_limit_minutes))
+    return min(deadlines) if deadlines else None
+
+
+def refresh_test_deadlines(db: Session, test: model.Test) -> Dict[int, datetime | None]:
+    """Пересчитать expires_at для незавершённых попыток теста."""
+    open_results = db.query(TestResult).filter(
+        TestResult.test_id == test.id,
+        TestResult.is_completed == False
+    ).all()
+
+    deadlines = {}
+    for result in open_results:
+        result.expires_at = compute_expires_at(test, result.started_at)
+        deadlines[result.id] = result.expires_at
+    return deadlines
+
 
-# Need celery + redis 
-def auto_complete_expired_tests(results: Iterable[TestResult], db: Session, now: datetime | None = None) -> None:
-    """Завершает тесты, если истекло отведенное время прохождения."""
+def complete_test_results(db: Session, test_results: Iterable[TestResult], now: datetime | None = None) -> int:
+    """Завершить набор результатов и посчитать баллы пакетно.
+
+    Попытки, чьи ответы не удалось записать, остаются незавершёнными до следующего прохода.
+    """
     now = now or datetime.now(timezone.utc)
+    test_results = list(test_results)
+    unwritten = flush_for_completion(db, [(result.test_id, result.employee_id) for result in test_results if not result.is_completed])
 
-    for result in results:
-        test = result.test
-        started_at = result.started_at
-        if started_at.tzinfo is None:
-            started_at = started_at.replace(tzinfo=timezone.utc)
-
-        if not result.is_completed and test.time_limit_minutes is not None:
-            elapsed = now - started_at
-            if elapsed > timedelta(minutes=test.time_limit_minutes):
-                # Нужно найти clerk_id пользователя, которому принадлежит результат
-                clerk_id = result.employee.clerk_id
-                complete_test(db, user_id=clerk_id, test_id=test.id)
-
-        if test.end_date and test.end_date < now:
-            clerk_id = result.employee.clerk_id
-            complete_test(db, user_id=clerk_id, test_id=test.id)
+    results_by_test = defaultdict(list)
+    for result in test_results:
+        if result.is_completed:
+            continue
+        if (result.test_id, result.employee_id) in unwritten:
+            logger.warning("Attempt %s is not completed: its answers are quarantined", result.id)
+            continue
+        result.is_completed = True
+        result.completed_at = now
+        results_by_test[result.test_id].append(result)
+        deadline_queue.discard(result.id)
+
+    # Баллы и профили Белбина считаются одним проходом на тест
+    for test_id, results in results_by_test.items():
+        employee_ids = [result.employee_id for result in results]
+        scores = score_attempts(db, test_id, employee_ids)
+        for result in results:
+            score, max_score = scores[result.employee_id]
+            result.score = score
+            result.max_score = max_score
+            result.percent = (score / max_score * 100) if max_score > 0 else None
+        calculate_belbin_results(db, test_id, employee_ids)
+
+    db.commit()
+
+    return sum(len(results) for results in results_by_test.values())
+
+
+def complete_expired_tests(db: Session, now: datetime | None = None, batch_size: int = 100, result_ids: Iterable[int] | None = None) -> int:
+    """Найти просроченные незавершённые тесты по индексу expires_at и завершить их пачками."""
+    now = now or datetime.now(timezone.utc)
+
+    query = db.query(TestResult.id).filter(
+        TestResult.is_completed == False,
+        TestResult.expires_at <= now
+    )
+    if result_ids is not None:
+        query = query.filter(TestResult.id.in_(list(result_ids)))
+    expired_ids = [result_id for result_id, in query.order_by(TestResult.expires_at).all()]
+
+    completed = 0
+    for i in range(0, len(expired_ids), batch_size):
+        batch = db.query(TestResult).filter(TestResult.id.in_(expired_ids[i:i + batch_size])).all()
+        completed += complete_test_results(db, batch, now)
+    return completed
+
+
+def get_test_end_time(test: model.Test) -> datetime | None:
+    """Когда тест перестаёт быть доступным: end_date или created_at + лимит времени."""
+    if test.end_date:
+        return as_utc(test.end_date)
+    if test.time_limit_minutes and test.created_at:
+        return as_utc(test.created_at) + timedelta(minutes=test.time_limit_minutes)
+    return None
+
+
+def is_test_expired(test: model.Test, now: datetime) -> bool:
+    end_time = get_test_end_time(test)
+    return test.status != "expired" and end_time is not None and now > end_time
+
+
+def mark_expired_tests(db: Session, now: datetime | None = None) -> int:
+    """Записать статус expired тестам, срок которых прошёл."""
+    now = now or datetime.now(timezone.utc)
+    candidates = db.query(Test).filter(
+        Test.status != "expired",
+        or_(Test.end_date <= now, and_(Test.end_date == None, Test.time_limit_minutes != None)),
+    ).all()
+    expired_ids = [test.id for test in candidates if is_test_expired(test, now)]
+    if expired_ids:
+        db.execute(update(Test).where(Test.id.in_(expired_ids)).values(status="expired"))
+        db.commit()
+    return len(expired_ids)
+
+
+def complete_open_attempts(
+    db: Session,
+    test_id: int,
+    now: datetime | None = None,
+    batch_size: int = 500,
+    progress: Callable[[int, int], None] | None = None,
+) -> int:
+    """Завершить все незавершённые попытки теста пачками: завершение и баллы пачки — одна транзакция."""
+    now = now or datetime.now(timezone.utc)
+    unwritten = flush_for_completion(db, attempt_store.keys_for_test(test_id))
+    if unwritten:
+        logger.warning("Attempts %s are left open: their answers are quarantined", sorted(unwritten))
+
+    open_ids = [
+        result_id for result_id, in db.query(TestResult.id)
+        .filter(
+            TestResult.test_id == test_id,
+            TestResult.is_completed == False,
+            TestResult.employee_id.not_in([employee_id for _, employee_id in unwritten]),
+        )
+        .order_by(TestResult.id)
+    ]
+    total = len(open_ids)
+    if progress:
+        progress(0, total)
+
+    completed = 0
+    for i in range(0, total, batch_size):
+        # UPDATE ... RETURNING забирает только ещё открытые попытки — параллельное завершение не задвоится.
+        # Если подсчёт упадёт, откат вернёт пачку в незавершённые, и её подхватит следующий запуск
+        try:
+            batch = db.execute(
+                update(TestResult)
+                .where(TestResult.id.in_(open_ids[i:i + batch_size]), TestResult.is_completed == False)
+                .values(is_completed=True, completed_at=now)
+                .returning(TestResult.id, TestResult.employee_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if batch:
+                scores = score_attempts(db, test_id, [employee_id for _, employee_id in batch])
+                db.execute(update(TestResult), [
+                    {
+                        "id": result_id,
+                        "score": scores[employee_id][0],
+                        "max_score": scores[employee_id][1],
+                        "percent": (scores[employee_id][0] / scores[employee_id][1] * 100) if scores[employee_id][1] > 0 else None,
+                    }
+                    for result_id, employee_id in batch
+                ])
+                calculate_belbin_results(db, test_id, [employee_id for _, employee_id in batch])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for result_id, _ in batch:
+            deadline_queue.discard(result_id)
+        completed += len(batch)
+        if progress:
+            progress(i + len(open_ids[i:i + batch_size]), total)
+    return completed
+
+
+def get_upcoming_deadlines(db: Session, until: datetime) -> List[Tuple[int, datetime]]:
+    """Дедлайны незавершённых попыток, наступающие до until."""
+    return db.query(TestResult.id, TestResult.expires_at).filter(
+        TestResult.is_completed == False,
+        TestResult.expires_at.isnot(None),
+        TestResult.expires_at <= until
+    ).all()
 
   
 def get_belbin_answers_data(db: Session, test_id: int, employee_id: int) -> Dict:
     """Получить данные о ответах пользователя на вопросы Белбина."""
+    return load_belbin_answers_data(db, [test_id], [employee_id]).get((test_id, employee_id), {})
+
+
+def load_belbin_answers_data(db: Session, test_ids: Iterable[int], employee_ids: Iterable[int]) -> Dict[Tuple[int, int], Dict]:
+    """Получить ответы на вопросы Белбина для набора тестов и сотрудников одним запросом."""
+    test_ids, employee_ids = list(test_ids), list(employee_ids)
+    if not test_ids or not employee_ids:
+        return {}
+
     belbin_user_answers = db.query(UserBelbinAnswer).filter(
-        and_(
-            UserBelbinAnswer.test_id == test_id,
-            UserBelbinAnswer.employee_id == employee_id
-        )
-    ).all()
+        UserBelbinAnswer.test_id.in_(test_ids),
+        UserBelbinAnswer.employee_id.in_(employee_ids)
+    ).order_by(UserBelbinAnswer.id).all()
 
-    return {uba.answer_id: uba.score for uba in belbin_user_answers}
+    # Ответы из attempt_store новее записанных в БД
+    pending = attempt_store.pending(test_ids, employee_ids)
+
+    belbin_scores = defaultdict(dict)
+    for uba in belbin_user_answers:
+        key = (uba.test_id, uba.employee_id)
+        if (BELBIN, uba.question_id) in pending.get(key, {}):
+            continue
+        belbin_scores[key][uba.answer_id] = uba.score
+
+    for key, answers in pending.items():
+        for (kind, _), answer in answers.items():
+            if kind == BELBIN:
+                belbin_scores[key].update(answer.belbin_scores)
+
+    return belbin_scores
 
 
 def build_safe_questions(questions: List[model.Question], user_answers_data: Tuple) -> List[SafeQuestion]:
@@ -62,7 +258,7 @@ def build_safe_questions(questions: List[model.Question], user_answers_data: Tup
             question_type=question.question_type,
             order=question.order,
             test_id=question.test_id,
-            image=question.image,
+            image_url=question.image_url,
             answers=safe_answers
         ))
     
@@ -95,7 +291,7 @@ def build_answers(
             "id":None,
             "question_id":question.id,
             "text":user_answer.text_response,
-            "image":None,
+            "image_url":None,
             "is_user_answer":True,
             "is_correct":is_correct
         })
@@ -106,7 +302,7 @@ def build_answers(
             answers.append({
                 "id": answer.id,
                 "text": answer.text,
-                "image": answer.image,
+                "image_url": answer.image_url,
                 "is_correct": answer.is_correct,  # <- Добавляем флаг правильного ответа из БД
                 "selected": answer.id in selected_ids,
             })
@@ -123,7 +319,7 @@ def build_questions(questions: List[model.Question], user_answers_data: Tuple) -
             "question_type": question.question_type,
             "order": question.order,
             "test_id": question.test_id,
-            "image": question.image,
+            "image_url": question.image_url,
             "answers": safe_answers,
         })
     return safe_questions
@@ -139,7 +335,7 @@ def build_safe_answers(question: model.Question, user_answers_by_qid: Dict, answ
             id=None,
             question_id=question.id,
             text=user_answer.text_response,
-            image=None,
+            image_url=None,
             is_user_answer=True
         ))
     else:
@@ -148,7 +344,7 @@ def build_safe_answers(question: model.Question, user_answers_by_qid: Dict, answ
                 id=answer.id,
                 question_id=answer.question_id,
                 text="" if question.question_type == "text_answer" else answer.text,
-                image=answer.image,
+                image_url=answer.image_url,
                 is_user_answer=(answer.id in selected_answer_ids)
             ))
     
@@ -188,6 +384,14 @@ def determine_test_status(db: Session, test: model.Test, employee_id: int, now:
         model.TestResult.employee_id == employee_id
     ).first()
 
+    return resolve_test_status(test, result, now)
+
+
+def resolve_test_status(test: model.Test, result: model.TestResult | None, now: datetime) -> str:
+    """Определить статус теста по уже загруженному результату."""
+    if test.end_date and test.end_date < now:
+        return "expired"
+
     if result and result.completed_at:
         return "completed"
     elif result and result.started_at:
@@ -196,6 +400,23 @@ def determine_test_status(db: Session, test: model.Test, employee_id: int, now:
         return "not_started"
 
 
+def load_test_results(db: Session, test_ids: Iterable[int], employee_ids: Iterable[int]) -> Dict[Tuple[int, int], model.TestResult]:
+    """Получить результаты тестов для набора тестов и сотрудников одним запросом."""
+    test_ids, employee_ids = list(test_ids), list(employee_ids)
+    if not test_ids or not employee_ids:
+        return {}
+
+    results = db.query(model.TestResult).filter(
+        model.TestResult.test_id.in_(test_ids),
+        model.TestResult.employee_id.in_(employee_ids)
+    ).order_by(model.TestResult.id).all()
+
+    results_by_key = {}
+    for result in results:
+        results_by_key.setdefault((result.test_id, result.employee_id), result)
+    return results_by_key
+
+
 def create_safe_test_schema(test: model.Test, status: str, 
                            questions: List[SafeQuestion], 
                            belbin_questions: List[SafeBelbinQuestion]) -> SafeTest:
@@ -233,70 +454,203 @@ def create_test_schema(test: model.Test, status: str,
     }
 
 
-def answers_changed(old_answers, new_answers, belbin=False):
-    if len(old_answers) != len(new_answers):
+QUESTION_FIELDS = QUESTION_HASH_FIELDS
+ANSWER_FIELDS = ANSWER_HASH_FIELDS
+BELBIN_QUESTION_FIELDS = BELBIN_QUESTION_HASH_FIELDS
+BELBIN_ANSWER_FIELDS = BELBIN_ANSWER_HASH_FIELDS
+# Значения по умолчанию из моделей — для полей, которые не пришли в запросе
+QUESTION_DEFAULTS = {"question_type": "single_choice", "points": 1, "image_hash": None}
+ANSWER_DEFAULTS = {"is_correct": False, "image_hash": None}
+
+
+def diff_rows(existing: Dict[int, object], incoming: List[dict], fields: Tuple[str, ...]) -> dict:
+    """Сравнить строки из БД с пришедшими данными.
+
+    Возвращает changeset: insert — индексы новых строк, update — словари {id, изменённые поля},
+    delete — id удалённых строк, matched — индекс строки -> id существующей записи.
+    Строки без id сопоставляются со свободными записями с теми же значениями полей.
+    """
+    changeset = {"insert": [], "update": [], "delete": [], "matched": {}}
+    unclaimed = dict(existing)
+    without_id = []
+
+    for index, row in enumerate(incoming):
+        row_id = row.get("id")
+        if row_id is not None and row_id in unclaimed:
+            obj = unclaimed.pop(row_id)
+            changeset["matched"][index] = row_id
+            changes = {f: row[f] for f in fields if f in row and getattr(obj, f) != row[f]}
+            if changes:
+                changeset["update"].append({"id": row_id, **changes})
+        else:
+            without_id.append(index)
+
+    by_text = defaultdict(list)
+    for obj in unclaimed.values():
+        by_text[obj.text].append(obj)
+
+    for index in without_id:
+        row = incoming[index]
+        candidates = by_text.get(row.get("text"), [])
+        obj = next((o for o in candidates if all(getattr(o, f) == row[f] for f in fields if f in row)), None)
+        if obj is None:
+            changeset["insert"].append(index)
+        else:
+            candidates.remove(obj)
+            unclaimed.pop(obj.id)
+            changeset["matched"][index] = obj.id
+
+    changeset["delete"] = list(unclaimed)
+    return changeset
+
+
+def pick_fields(data: dict, fields: Tuple[str, ...]) -> dict:
+    return {f: data[f] for f in ("id", *fields) if f in data}
+
+
+def effective_values(obj, row: dict, fields: Tuple[str, ...], defaults: dict) -> dict:
+    """Значения полей после сохранения: пришедшие поверх текущих (или значений по умолчанию)."""
+    values = {f: getattr(obj, f) for f in fields} if obj is not None else {f: defaults.get(f) for f in fields}
+    values.update({f: row[f] for f in fields if f in row})
+    return values
+
+
+def plan_changes(existing: Dict[int, object], rows: List[dict], answer_rows: List[List[dict]], kind: dict) -> dict:
+    """Changeset для вопросов и их ответов, без записи в БД.
+
+    Вопрос, чей новый отпечаток совпадает с сохранённым content_hash, не сравнивается дальше.
+    """
+    questions = diff_rows(existing, rows, kind["question_fields"])
+    updates = {row["id"]: row for row in questions["update"]}
+    answers = {}
+    changed_ids = set(questions["delete"])
+
+    for index, row in enumerate(rows):
+        question_id = questions["matched"].get(index)
+        question = existing.get(question_id)
+        old_answers = {a.id: a for a in question.answers} if question is not None else {}
+
+        values = effective_values(question, row, kind["question_fields"], kind["question_defaults"])
+        answer_values = []
+        for a_row in answer_rows[index]:
+            old_answer = old_answers.get(a_row.get("id"))
+            answer_values.append(effective_values(old_answer, a_row, kind["answer_fields"], kind["answer_defaults"]))
+        content_hash = kind["hash"](values, answer_values)
+
+        if question is None:
+            row["content_hash"] = content_hash
+            answers[index] = diff_rows({}, answer_rows[index], kind["answer_fields"])
+            continue
+        if question.content_hash == content_hash:
+            answers[index] = {"insert": [], "update": [], "delete": [], "matched": {}}
+            updates.pop(question_id, None)
+            continue
+
+        answers[index] = diff_rows(old_answers, answer_rows[index], kind["answer_fields"])
+        updates.setdefault(question_id, {"id": question_id})["content_hash"] = content_hash
+        if kind["is_scoring_change"](question, values, updates[question_id], answers[index]):
+            changed_ids.add(question_id)
+
+    questions["update"] = list(updates.values())
+    return {"rows": rows, "questions": questions, "answer_rows": answer_rows, "answers": answers, "changed_ids": changed_ids}
+
+
+def is_scoring_change(question: model.Question, values: dict, update_row: dict, answers: dict) -> bool:
+    """Можно ли ещё оценить старые ответы пользователей на этот вопрос."""
+    if "question_type" in update_row or "points" in update_row:
         return True
-    # Сравниваем по id, text и order (если есть)
-    old_sorted = sorted(old_answers, key=lambda x: x.get("id") or x.get("text"))
-    new_sorted = sorted(new_answers, key=lambda x: x.get("id") or x.get("text"))
-
-    for old_a, new_a in zip(old_sorted, new_sorted):
-        if (
-            old_a.get("text") != new_a.get("text") 
-        ):
-            return True
-        if (old_a.get("is_correct") != new_a.get("is_correct")):
-            return True
-    return False
-
-def get_changed_question_ids(db_test, update_data) -> tuple[Set[int], Set[int], Set[int], Set[int]]:
-    old_questions = {q.id: q for q in db_test.questions}
-    old_belbin_questions = {q.id: q for q in db_test.belbin_questions}
-
-    new_questions = update_data.get("questions", [])
-    new_belbin_questions = update_data.get("belbin_questions", [])
-    for q in new_questions:
-        print(q )
-        print("\n")
-    changed_question_ids = set()
-    changed_belbin_question_ids = set()
-
-    new_q_ids = set()
-    for q_data in new_questions:
-        q_id = q_data.get("id")
-        if q_id:
-            new_q_ids.add(q_id)
-            old_q = old_questions.get(q_id)
-
-            if old_q:
-                is_answers_changed = answers_changed(
-                    [dict(text=a.text, is_correct=a.is_correct, id=a.id) for a in old_q.answers],
-                    q_data.get("answers", [])
-                )
-                if (q_data["text"] != old_q.text ) or is_answers_changed:
-                    changed_question_ids.add(q_id)
-
-    removed_q_ids = set(old_questions.keys()) - new_q_ids
-    changed_question_ids.update(removed_q_ids)
-
-    new_bq_ids = set()
-    for bq_data in new_belbin_questions:
-        bq_id = bq_data.get("id")
-        if bq_id:
-            new_bq_ids.add(bq_id)
-            old_bq = old_belbin_questions.get(bq_id)
-            if old_bq:
-                is_answers_changed = answers_changed(
-                    [dict(text=a.text, id=a.id) for a in old_bq.answers],
-                    bq_data.get("answers", [])
-                )
-                if (
-                bq_data["text"] != old_bq.text) or is_answers_changed:
-                    changed_belbin_question_ids.add(bq_id)
-    removed_bq_ids = set(old_belbin_questions.keys()) - new_bq_ids
-    changed_belbin_question_ids.update(removed_bq_ids)
+    scoring_fields = {"is_correct", "text"} if values["question_type"] == "text_answer" else {"is_correct"}
+    return bool(
+        answers["insert"] or answers["delete"]
+        or any(scoring_fields & answer_update.keys() for answer_update in answers["update"])
+    )
+
+
+def is_belbin_scoring_change(question: model.BelbinQuestion, values: dict, update_row: dict, answers: dict) -> bool:
+    return bool(
+        answers["insert"] or answers["delete"]
+        or any("role_id" in answer_update for answer_update in answers["update"])
+    )
+
+
+QUESTION_KIND = {
+    "question_fields": QUESTION_FIELDS,
+    "answer_fields": ANSWER_FIELDS,
+    "question_defaults": QUESTION_DEFAULTS,
+    "answer_defaults": ANSWER_DEFAULTS,
+    "hash": question_content_hash,
+    "is_scoring_change": is_scoring_change,
+}
+BELBIN_QUESTION_KIND = {
+    "question_fields": BELBIN_QUESTION_FIELDS,
+    "answer_fields": BELBIN_ANSWER_FIELDS,
+    "question_defaults": {},
+    "answer_defaults": {},
+    "hash": belbin_question_content_hash,
+    "is_scoring_change": is_belbin_scoring_change,
+}
+
+
+def plan_question_changes(db_test: model.Test, questions_data: list[dict]) -> dict:
+    """Changeset для обычных вопросов и их ответов."""
+    rows, answer_rows = [], []
+    for q_data in questions_data:
+        row = pick_fields(q_data, QUESTION_FIELDS)
+        row["image_hash"] = pop_image_hash(q_data)
+        rows.append(row)
+        answers = []
+        for a_data in q_data.get("answers", []):
+            answer = pick_fields(a_data, ANSWER_FIELDS)
+            answer["image_hash"] = pop_image_hash(a_data)
+            answers.append(answer)
+        answer_rows.append(answers)
+    return plan_changes({q.id: q for q in db_test.questions}, rows, answer_rows, QUESTION_KIND)
+
+
+def plan_belbin_question_changes(db_test: model.Test, belbin_questions_data: list[dict]) -> dict:
+    """Changeset для вопросов Белбина и их ответов."""
+    rows = [pick_fields(bq_data, BELBIN_QUESTION_FIELDS) for bq_data in belbin_questions_data]
+    answer_rows = [
+        [pick_fields(ba_data, BELBIN_ANSWER_FIELDS) for ba_data in bq_data.get("answers", [])]
+        for bq_data in belbin_questions_data
+    ]
+    return plan_changes({bq.id: bq for bq in db_test.belbin_questions}, rows, answer_rows, BELBIN_QUESTION_KIND)
+
+
+def without_id(row: dict) -> dict:
+    return {k: v for k, v in row.items() if k != "id"}
+
+
+def apply_changeset(db: Session, test_id: int, plan: dict, question_entity, answer_entity):
+    """Выполнить changeset пакетными INSERT/UPDATE/DELETE."""
+    questions, answers = plan["questions"], plan["answers"]
+
+    deleted_answer_ids = [a_id for changes in answers.values() for a_id in changes["delete"]]
+    if deleted_answer_ids:
+        db.execute(delete(answer_entity).where(answer_entity.id.in_(deleted_answer_ids)))
+    if questions["delete"]:
+        db.execute(delete(answer_entity).where(answer_entity.question_id.in_(questions["delete"])))
+        db.execute(delete(question_entity).where(question_entity.id.in_(questions["delete"])))
+
+    if questions["update"]:
+        db.execute(update(question_entity), questions["update"])
+    answer_updates = [row for changes in answers.values() for row in changes["update"]]
+    if answer_updates:
+        db.execute(update(answer_entity), answer_updates)
+
+    new_ids = insert_returning_ids(db, question_entity, [
+        {**without_id(plan["rows"][index]), "test_id": test_id} for index in questions["insert"]
+    ])
+    question_ids = {**questions["matched"], **dict(zip(questions["insert"], new_ids))}
+
+    answer_inserts = [
+        {**without_id(plan["answer_rows"][index][a_index]), "question_id": question_ids[index]}
+        for index, changes in answers.items()
+        for a_index in changes["insert"]
+    ]
+    if answer_inserts:
+        db.execute(insert(answer_entity), answer_inserts)
 
-    return changed_question_ids, changed_belbin_question_ids, removed_q_ids, removed_bq_ids
 
 def remove_changed_answers(db: Session, test_id: int, changed_q_ids: Set[int], changed_bq_ids: Set[int]):
     if changed_q_ids:
@@ -319,6 +673,11 @@ def remove_changed_answers(db: Session, test_id: int, changed_q_ids: Set[int], c
             UserBelbinAnswer.question_id.in_(changed_bq_ids)
         ).delete(synchronize_session=False)
 
+def pop_image_hash(data: dict) -> str | None:
+    """Забрать image/image_url из входных данных и вернуть хэш картинки в хранилище."""
+    return resolve_image_hash(data.pop("image", None), data.pop("image_url", None))
+
+
 def handle_test_settings(db: Session, db_test, ts_data):
     if ts_data:
         if isinstance(ts_data, dict):
@@ -336,22 +695,28 @@ def handle_test_settings(db: Session, db_test, ts_data):
 
 
 def check_user_permissions(db: Session, user_id: str, is_admin: bool = False):
-        employee = (
-            db.query(Employee)
-            .filter(Employee.clerk_id == user_id, Employee.is_admin == is_admin)
-            .first()
-            )
-        if not employee:
+        employee = resolve_employee(db, user_id)
+        if not employee or employee.is_admin != is_admin:
             raise HTTPException(status_code=404, detail="User has not permissions")
         return employee
 
 def get_current_user(db: Session, user_id: str):
-    employee = (db.query(Employee).filter(Employee.clerk_id == user_id).first())
-    return employee
+    return resolve_employee(db, user_id)
+
+def insert_returning_ids(db: Session, entity, rows: List[dict]) -> List[int]:
+    """Вставить строки одним multi-row INSERT ... RETURNING и вернуть id в порядке rows."""
+    if not rows:
+        return []
+    return list(db.scalars(
+        insert(entity).returning(entity.id, sort_by_parameter_order=True),
+        rows
+    ))
 
 def create_test(db: Session, test: schema.TestCreate, user_id: str):
     db_employee = check_user_permissions(db, user_id, True)
 
+    # Весь тест создаётся в одной транзакции: settings и тест — через flush,
+    # вопросы и ответы — пакетными INSERT-ами
     settings = test.test_settings
     if settings:
         db_settings = TestSettings(
@@ -361,8 +726,7 @@ def create_test(db: Session, test: schema.TestCreate, user_id: str):
             has_time_limit=settings.has_time_limit
         )
         db.add(db_settings)
-        db.commit()
-        db.refresh(db_settings)
+        db.flush()
     else:
         db_settings = None
 
@@ -373,54 +737,65 @@ def create_test(db: Session, test: schema.TestCreate, user_id: str):
         end_date=test.end_date,
         created_by=db_employee.id,
         test_settings_id=db_settings.id if db_settings else None,
-        time_limit_minutes=test.time_limit_minutes
-
+        time_limit_minutes=test.time_limit_minutes,
+        image_hash=resolve_image_hash(test.image, test.image_url)
     )
     db.add(db_test)
-    db.commit()
-    db.refresh(db_test)
+    db.flush()
 
     # Обычные вопросы
+    question_rows, answers_by_question = [], []
     for question in test.questions:
-        db_question = model.Question(
-            text=question.text,
-            question_type=question.question_type,
-            test_id=db_test.id,
-            image=question.image,
-            order=question.order,
-            points=question.points
-        )
-        db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
-
-        for answer in question.answers:
-            db_answer = model.Answer(
-                text=answer.text,
-                is_correct=answer.is_correct,
-                question_id=db_question.id,
-                image=answer.image
-            )
-            db.add(db_answer)
+        answers = [
+            {
+                "text": answer.text,
+                "is_correct": answer.is_correct,
+                "image_hash": resolve_image_hash(answer.image, answer.image_url),
+            }
+            for answer in question.answers
+        ]
+        row = {
+            "text": question.text,
+            "question_type": question.question_type,
+            "test_id": db_test.id,
+            "image_hash": resolve_image_hash(question.image, question.image_url),
+            "order": question.order,
+            "points": question.points,
+        }
+        row["content_hash"] = question_content_hash(row, answers)
+        question_rows.append(row)
+        answers_by_question.append(answers)
+
+    question_ids = insert_returning_ids(db, model.Question, question_rows)
+    answer_rows = [
+        {**answer, "question_id": question_id}
+        for answers, question_id in zip(answers_by_question, question_ids)
+        for answer in answers
+    ]
+    if answer_rows:
+        db.execute(insert(model.Answer), answer_rows)
 
+    belbin_question_rows, belbin_answers_by_question = [], []
     for belbin_q in test.belbin_questions:
-        db_belbin_q = model.BelbinQuestion(
-            text=belbin_q.text,
-            block_number=belbin_q.block_number,
-            order=belbin_q.order,
-            test_id=db_test.id
-        )
-        db.add(db_belbin_q)
-        db.commit()
-        db.refresh(db_belbin_q)
-
-        for answer in belbin_q.answers:
-            db_belbin_answer = BelbinAnswer(
-                text=answer.text,
-                role_id=answer.role_id,
-                question_id=db_belbin_q.id
-            )
-            db.add(db_belbin_answer)
+        answers = [{"text": answer.text, "role_id": answer.role_id} for answer in belbin_q.answers]
+        row = {
+            "text": belbin_q.text,
+            "block_number": belbin_q.block_number,
+            "order": belbin_q.order,
+            "test_id": db_test.id,
+        }
+        row["content_hash"] = belbin_question_content_hash(row, answers)
+        belbin_question_rows.append(row)
+        belbin_answers_by_question.append(answers)
+
+    belbin_question_ids = insert_returning_ids(db, model.BelbinQuestion, belbin_question_rows)
+    belbin_answer_rows = [
+        {**answer, "question_id": question_id}
+        for answers, question_id in zip(belbin_answers_by_question, belbin_question_ids)
+        for answer in answers
+    ]
+    if belbin_answer_rows:
+        db.execute(insert(BelbinAnswer), belbin_answer_rows)
 
     db.commit()
     return db_test
@@ -468,87 +843,10 @@ def reset_test_for_employee(db: Session, test_id: int, employee_id: int):
     db.query(TestResult).filter_by(test_id=test_id, employee_id=employee_id).delete(synchronize_session=False)
 
     db.commit()
+    attempt_store.discard(test_id, employee_id)
 
 def calculate_test_score(db: Session, test_id: int, employee_id: int) -> int:
-    score = 0
-    max_score = 0
-
-    questions = db.query(Question).filter(Question.test_id == test_id).all()
-
-    for question in questions:
-        points = question.points or 0  # если не задано, считаем 0
-        if question.question_type == "single_choice":
-            user_answer = (
-                db.query(UserAnswer)
-                .filter(
-                    UserAnswer.test_id == test_id,
-                    UserAnswer.employee_id == employee_id,
-                    UserAnswer.question_id == question.id,
-                )
-                .first()
-            )
-            max_score += points
-
-            if not user_answer:
-                continue
-            # Получаем выбранный ответ из UserAnswerItem (один для single_choice)
-            user_answer_item = (
-                db.query(UserAnswerItem)
-                .filter(UserAnswerItem.user_answer_id == user_answer.id)
-                .first()
-            )
-            if user_answer_item and user_answer_item.answer.is_correct:
-                score += points
-
-
-        elif question.question_type == "multiple_choice":
-            correct_answer_ids = {a.id for a in question.answers if a.is_correct}
-            max_score += points
-
-            if not correct_answer_ids:
-                continue
-
-            selected_answer_ids = {
-                item.answer_id
-                for item in (
-                    db.query(UserAnswerItem)
-                    .join(UserAnswer)
-                    .filter(
-                        UserAnswer.test_id == test_id,
-                        UserAnswer.employee_id == employee_id,
-                        UserAnswer.question_id == question.id,
-                    )
-                    .all()
-                )
-            }
-
-            if selected_answer_ids == correct_answer_ids:
-                score += points
-
-        elif question.question_type == "text_answer":
-        # Получаем правильные варианты текста ответов
-            correct_texts = {ans.text.strip().lower() for ans in question.answers if ans.is_correct}
-            max_score += points
-            
-            # Получаем ответ пользователя из UserAnswer
-            user_answer = (
-                db.query(UserAnswer)
-                .filter(
-                    UserAnswer.test_id == test_id,
-                    UserAnswer.employee_id == employee_id,
-                    UserAnswer.question_id == question.id
-                )
-                .first()
-            )
-            
-            if user_answer and user_answer.text_response:
-                user_text = user_answer.text_response.strip().lower()
-                if user_text in correct_texts:
-                    score += points
-        
-        elif question.question_type == "belbin":
-            # Белбин считается отдельно
-            pass
+    score, max_score = score_attempts(db, test_id, [employee_id])[employee_id]
 
     test_result = (
         db.query(TestResult)
@@ -570,44 +868,88 @@ def calculate_test_score(db: Session, test_id: int, employee_id: int) -> int:
 
 
 
-def calculate_and_save_belbin_results(db: Session, test_id: int, employee_id: int):
-    # Считаем баллы по ролям
-    answers = db.query(UserBelbinAnswer).filter_by(
-        test_id=test_id, employee_id=employee_id
-    ).all()
+def calculate_belbin_results(db: Session, test_id: int, employee_ids: Iterable[int] | None = None) -> int:
+    """Пересчитать профили Белбина попыток теста (всех или указанных сотрудников) без коммита.
+
+    Суммы по ролям считаются одним GROUP BY, строки BelbinTestResult заменяются пакетно.
+    """
+    results_query = db.query(TestResult.employee_id, TestResult.id).filter(TestResult.test_id == test_id)
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        if not employee_ids:
+            return 0
+        results_query = results_query.filter(TestResult.employee_id.in_(employee_ids))
+    result_ids = dict(results_query.all())
+    if not result_ids:
+        return 0
 
-    role_scores = {}
-    if not answers:
-        return
-
-    for ans in answers:
-        role = ans.answer.role  # BelbinAnswer -> BelbinRole
-        if role:
-            role_scores[role.id] = role_scores.get(role.id, 0) + (ans.score or 0)
-
-    # Удаляем старые результаты, если есть
-    test_result = db.query(TestResult).filter_by(test_id=test_id, employee_id=employee_id).first()
-    if test_result:
-        db.query(BelbinTestResult).filter_by(test_id=test_result.id).delete()
-
-    # Сохраняем новые
-    for role_id, score in role_scores.items():
-        result = BelbinTestResult(
-            test_id=test_result.id,
-            role_id=role_id,
-            total_score=score
+    totals = (
+        db.query(UserBelbinAnswer.employee_id, BelbinAnswer.role_id, func.sum(func.coalesce(UserBelbinAnswer.score, 0)))
+        .join(BelbinAnswer, BelbinAnswer.id == UserBelbinAnswer.answer_id)
+        .filter(
+            UserBelbinAnswer.test_id == test_id,
+            UserBelbinAnswer.employee_id.in_(list(result_ids)),
+            BelbinAnswer.role_id.isnot(None),
         )
-        db.add(result)
+        .group_by(UserBelbinAnswer.employee_id, BelbinAnswer.role_id)
+        .all()
+    )
 
+    db.execute(delete(BelbinTestResult).where(BelbinTestResult.test_id.in_(list(result_ids.values()))))
+    rows = [
+        {"test_id": result_ids[employee_id], "role_id": role_id, "total_score": total}
+        for employee_id, role_id, total in totals
+    ]
+    if rows:
+        db.execute(insert(BelbinTestResult), rows)
+    return len(result_ids)
+
+
+def calculate_and_save_belbin_results(db: Session, test_id: int, employee_id: int):
+    calculate_belbin_results(db, test_id, [employee_id])
     db.commit()
 
 def get_test(db: Session, test_id: int, user_id: str):
+    employee = get_current_user(db, user_id)
+    if not employee:
+        return None
     return db.query(model.Test).filter(
         model.Test.id == test_id,
-        model.Test.created_by == user_id
+        model.Test.created_by == employee.id
+    ).options(
+        selectinload(model.Test.questions).selectinload(model.Question.answers),
+        selectinload(model.Test.belbin_questions)
+            .selectinload(model.BelbinQuestion.answers)
+            .selectinload(BelbinAnswer.role),
+        selectinload(model.Test.assigned_to),
+        selectinload(model.Test.test_settings),
     ).first()
 
 
+def get_test_etag(db_test: model.Test) -> str:
+    """ETag теста: поля теста, назначения и отпечатки вопросов."""
+    settings = db_test.test_settings
+    test_values = {
+        "id": db_test.id,
+        "title": db_test.title,
+        "description": db_test.description,
+        "status": db_test.status,
+        "is_active": db_test.is_active,
+        "end_date": db_test.end_date,
+        "time_limit_minutes": db_test.time_limit_minutes,
+        "image_hash": db_test.image_hash,
+        "updated_at": db_test.updated_at,
+        "settings": [settings.min_questions, settings.belbin_block, settings.belbin_questions_in_block, settings.has_time_limit] if settings else None,
+        "assigned_to": sorted(employee.id for employee in db_test.assigned_to),
+    }
+    fingerprint = get_test_fingerprint(
+        test_values,
+        [q.content_hash for q in db_test.questions],
+        [bq.content_hash for bq in db_test.belbin_questions],
+    )
+    return f'"{fingerprint}"'
+
+
 def get_tests_by_position(db: Session, position_id: int, user_id: str):
     return db.query(model.Test).filter(
         model.Test.position_id == position_id,
@@ -621,6 +963,9 @@ def update_test(db: Session, test_id: int, test_update: schema.TestCreate, user_
     if not db_test:
         return None
 
+    # Отложенные ответы пишем до правок: удалённые вопросы уберут их вместе с записанными
+    flush_attempts(db, attempt_store.keys_for_test(test_id))
+
     # Подготовка данных обновления
     update_data = test_update.model_dump(exclude_unset=True)
     
@@ -631,9 +976,15 @@ def update_test(db: Session, test_id: int, test_update: schema.TestCreate, user_
     update_test_fields(db_test, update_data)
     if test_update.test_settings.has_time_limit == False:
         db_test.time_limit_minutes = None
+    deadlines = refresh_test_deadlines(db, db_test)
     # Фиксация изменений
     db.commit()
     db.refresh(db_test)
+
+    invalidate_answer_key(test_id)
+
+    for result_id, expires_at in deadlines.items():
+        deadline_queue.push(result_id, expires_at)
     return db_test
 
 
@@ -642,44 +993,42 @@ def get_test_for_update(db: Session, test_id: int, employee_id: int) -> model.Te
     return db.query(model.Test).filter(
         model.Test.id == test_id,
         model.Test.created_by == employee_id
+    ).options(
+        selectinload(model.Test.questions).selectinload(model.Question.answers),
+        selectinload(model.Test.belbin_questions).selectinload(model.BelbinQuestion.answers),
     ).first()
 
 
 def process_question_changes(db: Session, test_id: int, db_test: model.Test, update_data: dict):
     """Обработка изменений вопросов и связанных данных."""
-    # Определение измененных вопросов
-    changed_question_ids, changed_belbin_question_ids, removed_q_ids, removed_bq_ids = get_changed_question_ids(
-        db_test, update_data
-    )
-    
-    # Удаление ответов на измененные вопросы
+    question_plan = None
+    belbin_plan = None
+    if "questions" in update_data:
+        question_plan = plan_question_changes(db_test, update_data["questions"])
+    if "belbin_questions" in update_data:
+        belbin_plan = plan_belbin_question_changes(db_test, update_data["belbin_questions"])
+
+    changed_question_ids = question_plan["changed_ids"] if question_plan else set()
+    changed_belbin_question_ids = belbin_plan["changed_ids"] if belbin_plan else set()
+
+    # Удаление ответов на изменённые вопросы
     remove_changed_answers(
         db, test_id,
         changed_question_ids,
         changed_belbin_question_ids
     )
 
-    # Очистка результатов теста при значительных изменениях
+    # Очистка результатов теста, если изменилось то, от чего зависит оценка
     if changed_question_ids or changed_belbin_question_ids:
         db.query(model.TestResult).filter(model.TestResult.test_id == test_id).delete(synchronize_session=False)
 
     # Обновление настроек теста
     handle_test_settings(db, db_test, update_data.pop("test_settings", None))
 
-    # Обновление обычных вопросов
-    if "questions" in update_data:
-        update_regular_questions(db_test, update_data["questions"])
-
-    # Обновление вопросов Белбина
-    if "belbin_questions" in update_data:
-        update_belbin_questions(db_test, update_data["belbin_questions"])
-
-
-def should_clear_test_results(update_data: dict, removed_q_ids: set, removed_bq_ids: set) -> bool:
-    """Определить, нужно ли очищать результаты теста."""
-    has_new_questions = any(q.get("id") is None 
-                    for q in update_data.get("questions", []) + update_data.get("belbin_questions", []))
-    return removed_q_ids or removed_bq_ids or has_new_questions
+    if question_plan:
+        apply_changeset(db, test_id, question_plan, model.Question, model.Answer)
+    if belbin_plan:
+        apply_changeset(db, test_id, belbin_plan, model.BelbinQuestion, BelbinAnswer)
 
 
 def update_test_fields(db_test: model.Test, update_data: dict):
@@ -690,6 +1039,9 @@ def update_test_fields(db_test: model.Test, update_data: dict):
     old_end_date = db_test.end_date
     new_end_date = update_data.get("end_date")
 
+    if "image" in update_data or "image_url" in update_data:
+        db_test.image_hash = pop_image_hash(update_data)
+
     for field, value in update_data.items():
         if field in ["questions", "belbin_questions", "test_settings"]:
             continue
@@ -699,147 +1051,30 @@ def update_test_fields(db_test: model.Test, update_data: dict):
     if new_end_date and new_end_date != old_end_date and new_end_date > now:
         db_test.status = "draft"
 
-def update_regular_questions(db_test: model.Test, questions_data: list[dict]):
-    """Обновление обычных вопросов теста."""
-    existing_questions = {q.id: q for q in db_test.questions}
-    new_questions = []
-
-    for q_data in questions_data:
-        answers_data = q_data.pop("answers", [])
-        q_id = q_data.get("id")
-
-        if q_id and q_id in existing_questions:
-            update_existing_question(existing_questions[q_id], q_data, answers_data)
-        else:
-            new_questions.append(create_new_question(q_data, answers_data))
-
-    # Удаление отсутствующих вопросов
-    new_q_ids = {q.get("id") for q in questions_data if q.get("id")}
-    remove_missing_questions(db_test, new_q_ids)
-
-    # Добавление новых вопросов
-    db_test.questions.extend(new_questions)
-
-
-def update_existing_question(question: model.Question, q_data: dict, answers_data: list[dict]):
-    """Обновление существующего вопроса и его ответов."""
-    question.text = q_data["text"]
-    # обновляем другие поля при необходимости
-
-    existing_answers = {answer.id: answer for answer in question.answers}
-    incoming_ids = set()
-    
-    for a_data in answers_data:
-        a_id = a_data.get("id")
-        if a_id and a_id in existing_answers:
-            # Обновляем существующий ответ
-            ans = existing_answers[a_id]
-            ans.text = a_data["text"]
-            ans.image = a_data.get("image")  # если нужно
-            incoming_ids.add(a_id)
-        else:
-            # Добавляем новый ответ
-            a_data.pop("id", None)  # на всякий случай
-            new_answer = model.Answer(**a_data)
-            question.answers.append(new_answer)
-
-    # Удаляем ответы, которых нет в входных данных
-    question.answers[:] = [ans for ans in question.answers if ans.id is None or ans.id in incoming_ids]
-
-
-
-def create_new_question(q_data: dict, answers_data: list[dict]) -> model.Question:
-    """Создание нового вопроса."""
-    q_data.pop("id", None)
-    question = model.Question(**q_data)
-    for a_data in answers_data:
-        a_data.pop("id", None)
-        question.answers.append(model.Answer(**a_data))
-    return question
-
-
-def remove_missing_questions(db_test: model.Test, new_q_ids: set[int]):
-    """Удаление вопросов, которых нет в новых данных."""
-    for q in db_test.questions[:]:
-        if q.id not in new_q_ids:
-            db_test.questions.remove(q)
-
-
-def update_belbin_questions(db_test: model.Test, belbin_questions_data: list[dict]):
-    """Обновление вопросов Белбина."""
-    existing_bq = {bq.id: bq for bq in db_test.belbin_questions}
-    new_belbin_questions = []
-
-    for bq_data in belbin_questions_data:
-        answers_data = bq_data.pop("answers", [])
-        bq_id = bq_data.get("id")
-
-        if bq_id and bq_id in existing_bq:
-            update_existing_belbin_question(existing_bq[bq_id], bq_data, answers_data)
-        else:
-            new_belbin_questions.append(create_new_belbin_question(bq_data, answers_data))
-
-    # Удаление отсутствующих вопросов
-    incoming_bq_ids = {bq.get("id") for bq in belbin_questions_data if bq.get("id")}
-    remove_missing_belbin_questions(db_test, incoming_bq_ids)
-
-    # Добавление новых вопросов
-    db_test.belbin_questions.extend(new_belbin_questions)
-
-
-def update_existing_belbin_question(belbin_question: model.BelbinQuestion, bq_data: dict, answers_data: list[dict]):
-    """Обновление существующего вопроса Белбина."""
-    belbin_question.text = bq_data["text"]
-    belbin_question.block_number = bq_data["block_number"]
-    belbin_question.order = bq_data["order"]
-    
-    # Обновление ответов
-    belbin_question.answers.clear()
-    for ba_data in answers_data:
-        ba_data.pop("id", None)
-        belbin_question.answers.append(BelbinAnswer(**ba_data))
-
-
-def create_new_belbin_question(bq_data: dict, answers_data: list[dict]) -> model.BelbinQuestion:
-    """Создание нового вопроса Белбина."""
-    bq_data.pop("id", None)
-    belbin_question = model.BelbinQuestion(**bq_data)
-    for ba_data in answers_data:
-        ba_data.pop("id", None)
-        belbin_question.answers.append(BelbinAnswer(**ba_data))
-    return belbin_question
-
-
-def remove_missing_belbin_questions(db_test: model.Test, incoming_bq_ids: set[int]):
-    """Удаление вопросов Белбина, которых нет в новых данных."""
-    for bq in db_test.belbin_questions[:]:
-        if bq.id not in incoming_bq_ids:
-            db_test.belbin_questions.remove(bq)
-
-
 def get_assigned_tests_for_employee(db: Session, user_id: str) -> List[SafeTest]:
     """Получить список назначенных тестов для сотрудника с информацией о статусе и ответах."""
     now = datetime.now(timezone.utc)
     user = get_current_user(db, user_id)
 
     # Получаем все назначенные тесты
-    tests = get_assigned_tests(db, user_id)
-    
+    tests = [test for test in get_assigned_tests(db, user_id) if test.status != "draft"]
+    test_ids = [test.id for test in tests]
+
+    # Ответы и результаты по всем тестам загружаются разом
+    user_answers_data = load_user_answers_data(db, test_ids, [user.id])
+    belbin_answers_data = load_belbin_answers_data(db, test_ids, [user.id])
+    test_results = load_test_results(db, test_ids, [user.id])
+
     result_schemas = []
     for test in tests:
-        if test.status == "draft":
-            continue
-        
-        # Получаем данные о ответах пользователя
-        user_answers_data = get_user_answers_data(db, test.id, user.id)
-        belbin_answers_data = get_belbin_answers_data(db, test.id, user.id)
-        
+        key = (test.id, user.id)
+
         # Формируем вопросы с ответами
-        safe_questions = build_safe_questions(test.questions, user_answers_data)
-        safe_belbin_questions = build_safe_belbin_questions(test.belbin_questions, belbin_answers_data)
+        safe_questions = build_safe_questions(test.questions, user_answers_data.get(key, ({}, {})))
+        safe_belbin_questions = build_safe_belbin_questions(test.belbin_questions, belbin_answers_data.get(key, {}))
         
         # Определяем статус теста
-        status = determine_test_status(db, test, user.id, now)
+        status = resolve_test_status(test, test_results.get(key), now)
         
         # Собираем финальную схему
         result_schemas.append(create_safe_test_schema(test, status, safe_questions, safe_belbin_questions))
@@ -874,25 +1109,8 @@ def get_assigned_test_for_employee(db: Session, user_id: str, test_id: int):
     # Формируем и возвращаем схему
     return create_safe_test_schema(test, status, safe_questions, safe_belbin_questions)
 
-def get_user_test_results(db: Session, user_id: str) -> List[TestResult]:
-       return (
-        db.query(TestResult)
-        .join(TestResult.test)
-        .join(Test.assigned_to)
-        .filter(Employee.clerk_id == user_id)
-        .all()
-    )
-
-
-
 def get_assigned_tests(db: Session, user_id: str) -> List[model.Test]:
     """Получить список тестов, назначенных пользователю."""
-    user = get_current_user(db, user_id)
-    now = datetime.now(timezone.utc)
-
-    tests_results = get_user_test_results(db, user_id)
-    auto_complete_expired_tests(tests_results, db, now)
-
     tests = (
         db.query(model.Test)
         .join(model.Test.assigned_to)
@@ -902,9 +1120,7 @@ def get_assigned_tests(db: Session, user_id: str) -> List[model.Test]:
             selectinload(model.Test.belbin_questions)
                 .selectinload(model.BelbinQuestion.answers)
                 .selectinload(BelbinAnswer.role),
-            selectinload(model.Test.assigned_to),
             selectinload(model.Test.test_settings),
-            selectinload(model.Test.results)
         )
         .all()
     )
@@ -913,35 +1129,62 @@ def get_assigned_tests(db: Session, user_id: str) -> List[model.Test]:
     return tests
 
 
-def get_user_answers_data(db: Session, test_id: int, employee_id: int) -> Tuple[Dict, Dict, Dict]:
+def get_user_answers_data(db: Session, test_id: int, employee_id: int) -> Tuple[Dict, Dict]:
     """Получить данные о ответах пользователя на обычные вопросы."""
+    return load_user_answers_data(db, [test_id], [employee_id]).get((test_id, employee_id), ({}, defaultdict(set)))
+
+
+def load_user_answers_data(db: Session, test_ids: Iterable[int], employee_ids: Iterable[int]) -> Dict[Tuple[int, int], Tuple[Dict, Dict]]:
+    """Получить ответы на обычные вопросы для набора тестов и сотрудников двумя запросами."""
+    test_ids, employee_ids = list(test_ids), list(employee_ids)
+    if not test_ids or not employee_ids:
+        return {}
+
     # Получаем UserAnswer записи
     user_answers = db.query(UserAnswer).filter(
-        and_(
-            UserAnswer.test_id == test_id,
-            UserAnswer.employee_id == employee_id
-        )
-    ).all()
+        UserAnswer.test_id.in_(test_ids),
+        UserAnswer.employee_id.in_(employee_ids)
+    ).order_by(UserAnswer.id).all()
 
     # Сопоставляем question_id с UserAnswer
-    user_answers_by_qid = {ua.question_id: ua for ua in user_answers}
-    user_answer_ids = [ua.id for ua in user_answers]
+    answers_data = defaultdict(lambda: ({}, defaultdict(set)))
+    key_by_user_answer_id = {}
+    for ua in user_answers:
+        key = (ua.test_id, ua.employee_id)
+        answers_data[key][0][ua.question_id] = ua
+        key_by_user_answer_id[ua.id] = (key, ua.question_id)
+
+    if key_by_user_answer_id:
+        load_user_answer_items(db, test_ids, employee_ids, answers_data, key_by_user_answer_id)
+
+    # Ответы из attempt_store новее записанных в БД
+    for (test_id, employee_id), answers in attempt_store.pending(test_ids, employee_ids).items():
+        user_answers_by_qid, answer_ids_by_question = answers_data[(test_id, employee_id)]
+        for (kind, question_id), answer in answers.items():
+            if kind != REGULAR:
+                continue
+            user_answers_by_qid[question_id] = UserAnswer(
+                test_id=test_id, employee_id=employee_id, question_id=question_id, text_response=answer.text_response
+            )
+            answer_ids_by_question[question_id] = set(answer.answer_ids)
 
+    return answers_data
+
+
+def load_user_answer_items(db: Session, test_ids: List[int], employee_ids: List[int], answers_data: Dict, key_by_user_answer_id: Dict):
     # Получаем UserAnswerItem записи
-    user_answer_items = db.query(UserAnswerItem).filter(
-        UserAnswerItem.user_answer_id.in_(user_answer_ids)
+    user_answer_items = db.query(UserAnswerItem.user_answer_id, UserAnswerItem.answer_id).join(
+        UserAnswer, UserAnswer.id == UserAnswerItem.user_answer_id
+    ).filter(
+        UserAnswer.test_id.in_(test_ids),
+        UserAnswer.employee_id.in_(employee_ids)
     ).all()
 
     # Сопоставляем question_id с выбранными answer_id
-    question_id_by_user_answer_id = {ua.id: ua.question_id for ua in user_answers}
-    answer_ids_by_question = defaultdict(set)
-    
-    for item in user_answer_items:
-        qid = question_id_by_user_answer_id.get(item.user_answer_id)
-        if qid is not None:
-            answer_ids_by_question[qid].add(item.answer_id)
-
-    return user_answers_by_qid, answer_ids_by_question
+    for user_answer_id, answer_id in user_answer_items:
+        key, qid = key_by_user_answer_id.get(user_answer_id, (None, None))
+        if key is not None:
+            answers_data[key][1][qid].add(answer_id)
 
 
 def change_test_status(db: Session, test_id: int, test_status: schema.TestStatusUpdate, user_id: str):
@@ -962,15 +1205,14 @@ def change_test_status(db: Session, test_id: int, test_status: schema.TestStatus
     # Обработка изменения статуса
     new_status = test_status.status
 
+    open_attempts = 0
     if new_status == "draft":
-        # Завершение теста для всех пользователей
-        test_results = db.query(TestResult).filter(
+        # Попытки завершает фоновая задача (complete_open_attempts): после смены статуса
+        # новые ответы уже не принимаются
+        open_attempts = db.query(TestResult).filter(
             TestResult.test_id == test_id,
             TestResult.is_completed == False
-        ).all()
-
-        for result in test_results:
-            complete_test(db, user_id=result.employee.clerk_id, test_id=test_id)
+        ).count()
 
     elif new_status == "active":
         # Удаление всех результатов теста
@@ -982,7 +1224,7 @@ def change_test_status(db: Session, test_id: int, test_status: schema.TestStatus
     db.commit()
     db.refresh(db_test)
 
-    return {"id": db_test.id, "status": db_test.status}
+    return {"id": db_test.id, "status": db_test.status, "open_attempts": open_attempts}
 
 
 def delete_test(db: Session, test_id: int, user_id: str):
@@ -1008,6 +1250,8 @@ def delete_test(db: Session, test_id: int, user_id: str):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при удалении теста: {str(e)}"
         )
+    attempt_store.discard(test_id)
+    invalidate_answer_key(test_id)
     return {"detail": "Тест успешно удалён"}
 
 
@@ -1026,22 +1270,14 @@ def get_tests(db: Session, user_id: str):
     result_schemas = []
 
     for test in tests:
-        # ⏰ Проверка истечения времени
-        if test.status != "expired":
-            test_end_time = test.end_date
-            if not test_end_time and test.time_limit_minutes:
-                test_end_time = test.created_at + timedelta(minutes=test.time_limit_minutes)
-            
-            if test_end_time and now > test_end_time:
-                test.status = "expired"
-                db.add(test)  
-                db.commit()
-
         for bq in test.belbin_questions:
             for answer in bq.answers:
                 answer.role_name = answer.role.name if answer.role else None
         
         schema = TestSchema.model_validate(test, from_attributes=True)
+        # ⏰ Истёкший тест показываем истёкшим сразу; в БД статус записывает планировщик (mark_expired_tests)
+        if is_test_expired(test, now):
+            schema.status = "expired"
         result_schemas.append(schema)
 
     return result_schemas  
@@ -1098,41 +1334,39 @@ def get_completed_tests_for_employee(db: Session, user_id: str):
         .all()
     )
 
-def validate_test_availability(db, test, employee):
-    
-    now = datetime.now(timezone.utc)
-
+def check_test_availability(test, test_result, now: datetime):
+    """Проверить, что тест ещё можно проходить; test_result нужен только для тестов с лимитом времени."""
     # 1. Проверка глобального срока доступности
-    if test.end_date and now > test.end_date:
+    if test.end_date and now > as_utc(test.end_date):
         raise HTTPException(status_code=400, detail="Срок действия теста истёк")
 
     if test.status == "draft":
         raise HTTPException(status_code=400, detail="Тест приостановлен")
     # 2. Проверка индивидуального лимита времени
     if test.time_limit_minutes:
-        test_result = db.query(TestResult).filter_by(
-            test_id=test.id,
-            employee_id=employee.id
-        ).first()
-
         if not test_result:
             raise HTTPException(status_code=400, detail="Результат теста не найден. Тест ещё не был начат")
 
         if not test_result.started_at:
             raise HTTPException(status_code=400, detail="Тест не был начат должным образом")
-        
-        started_at = test_result.started_at
-        if started_at.tzinfo is None:
-            started_at = started_at.replace(tzinfo=timezone.utc)
 
-        individual_deadline = started_at + timedelta(minutes=test.time_limit_minutes)
+        individual_deadline = as_utc(test_result.started_at) + timedelta(minutes=test.time_limit_minutes)
         if now > individual_deadline:
             raise HTTPException(status_code=400, detail="Время на выполнение теста истекло")
 
 
+def validate_test_availability(db, test, employee):
+    test_result = None
+    if test.time_limit_minutes:
+        test_result = db.query(TestResult).filter_by(
+            test_id=test.id,
+            employee_id=employee.id
+        ).first()
+    check_test_availability(test, test_result, datetime.now(timezone.utc))
+
+
 def create_user_answer(db: Session, user_answer: UserAnswerCreate, user_id: str):
     employee = get_current_user(db, user_id)
-    print(user_answer)
     test = db.query(model.Test).filter(
         model.Test.id == user_answer.test_id,
         model.Test.is_active == True,
@@ -1141,138 +1375,263 @@ def create_user_answer(db: Session, user_answer: UserAnswerCreate, user_id: str)
         raise HTTPException(status_code=400, detail="Test not available")
 
     validate_test_availability(db, test, employee)
-    question = None
 
+    pending = validate_batch_answer(user_answer, get_answer_key(db, test.id))
     if user_answer.question_type == "belbin":
-        question = db.query(model.BelbinQuestion).filter(
-            model.BelbinQuestion.id == user_answer.question_id,
-            model.BelbinQuestion.test_id == user_answer.test_id
-        ).first()
-        if not question:
-            raise HTTPException(status_code=404, detail="Belbin question not found in this test")
-    elif user_answer.question_type in ("single_choice", "multiple_choice", "text_answer"):
-        question = db.query(model.Question).filter(
-            model.Question.id == user_answer.question_id,
-            model.Question.test_id == user_answer.test_id,
-            model.Question.question_type == user_answer.question_type
-        ).first()
-        if not question:
-            raise HTTPException(status_code=404, detail=f"Question of type '{user_answer.question_type}' not found in this test")
+        user_answer_ids = save_pending_answers(db, test.id, employee.id, {}, {user_answer.question_id: pending})
     else:
-        raise HTTPException(status_code=400, detail="Unknown question_type")
+        user_answer_ids = save_pending_answers(db, test.id, employee.id, {user_answer.question_id: pending}, {})
+    return saved_answer_response(user_answer, employee.id, user_answer_ids)
+
+
+def is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
 
-    # Валидация и сохранение ответа
-    if user_answer.question_type == "text_answer":
-    # Для текстового ответа не нужны answer_ids
-        db_answer = db.query(UserAnswer).filter_by(
-            employee_id=employee.id,
-            test_id=user_answer.test_id,
-            question_id=user_answer.question_id
-        ).first()
 
-        if db_answer:
-            db_answer.text_response = user_answer.text_response
+def validate_batch_answer(user_answer: UserAnswerCreate, answer_key: Dict) -> PendingAnswer:
+    """Проверка ответа по скомпилированному ключу ответов теста."""
+    if user_answer.question_type == "belbin":
+        answers = answer_key["belbin_questions"].get(user_answer.question_id)
+        if answers is None:
+            raise HTTPException(status_code=404, detail="Belbin question not found in this test")
+        if not user_answer.answer_ids and user_answer.text_response:
+            try:
+                pairs = [(answer_id, score) for answer_id, score in json.loads(user_answer.text_response)]
+            except Exception:
+                raise HTTPException(status_code=400, detail="Invalid text_response format")
+            # Пары [answer_id, score] из клиента: только целые числа, балл в допустимых пределах
+            for answer_id, score in pairs:
+                if not is_int(answer_id) or not is_int(score) or not 0 <= score <= BELBIN_MAX_SCORE:
+                    raise HTTPException(status_code=400, detail="Invalid text_response format")
         else:
-            db_answer = UserAnswer(
-                test_id=user_answer.test_id,
-                employee_id=employee.id,
-                question_id=user_answer.question_id,
-                text_response=user_answer.text_response
-            )
-            db.add(db_answer)
+            pairs = [(answer_id, answers[answer_id]["score"] if answer_id in answers else None) for answer_id in user_answer.answer_ids]
+        for answer_id, _ in pairs:
+            if answer_id not in answers:
+                raise HTTPException(status_code=400, detail=f"Invalid Belbin answer id {answer_id}")
+        return PendingAnswer(belbin_scores=tuple(pairs))
 
-        db.commit()
-        db.refresh(db_answer)
-        return db_answer
-    if user_answer.question_type in ("single_choice", "multiple_choice"):
-        valid_answer_ids = {a.id for a in question.answers}
-        for answer_id in user_answer.answer_ids:
-            if answer_id not in valid_answer_ids:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Answer ID {answer_id} doesn't belong to this question"
-                )
+    if user_answer.question_type not in ("single_choice", "multiple_choice", "text_answer"):
+        raise HTTPException(status_code=400, detail="Unknown question_type")
+    entry = answer_key["questions"].get(user_answer.question_id)
+    if not entry or entry["question_type"] != user_answer.question_type:
+        raise HTTPException(status_code=404, detail=f"Question of type '{user_answer.question_type}' not found in this test")
+    if user_answer.question_type == "text_answer":
+        # Для текстового ответа не нужны answer_ids
+        return PendingAnswer(text_response=user_answer.text_response)
 
-        db_answer = db.query(UserAnswer).filter_by(
-            employee_id=employee.id,
-            test_id=user_answer.test_id,
-            question_id=user_answer.question_id
-        ).first()
+    for answer_id in user_answer.answer_ids:
+        if answer_id not in entry["answer_ids"]:
+            raise HTTPException(status_code=400, detail=f"Answer ID {answer_id} doesn't belong to this question")
+    return PendingAnswer(text_response=user_answer.text_response, answer_ids=tuple(user_answer.answer_ids))
 
-        if db_answer:
-            db.query(UserAnswerItem).filter_by(user_answer_id=db_answer.id).delete()
-            db_answer.text_response = user_answer.text_response
-        else:
-            db_answer = UserAnswer(
-                test_id=user_answer.test_id,
-                employee_id=employee.id,
-                question_id=user_answer.question_id,
-                text_response=user_answer.text_response
-            )
-            db.add(db_answer)
-            db.commit()
-            db.refresh(db_answer)
 
-        for answer_id in user_answer.answer_ids:
-            db_item = UserAnswerItem(
-                user_answer_id=db_answer.id,
-                answer_id=answer_id
-            )
-            db.add(db_item)
+UPSERT_DIALECTS = ("postgresql", "sqlite")
 
-        db.commit()
-        return db_answer
 
-    elif user_answer.question_type == "belbin":
-        db.query(UserBelbinAnswer).filter_by(
-            employee_id=employee.id,
-            test_id=user_answer.test_id,
-            question_id=user_answer.question_id
-        ).delete()
+def check_upsert_support(bind) -> None:
+    """Ответы и назначения пишутся через INSERT ... ON CONFLICT; вызывается при старте приложения."""
+    if bind.dialect.name not in UPSERT_DIALECTS:
+        raise RuntimeError(
+            f"Database dialect {bind.dialect.name!r} is not supported: "
+            f"answers and assignments need INSERT ... ON CONFLICT ({', '.join(UPSERT_DIALECTS)})"
+        )
 
-        if not user_answer.answer_ids and user_answer.text_response:
-            try:
-                parsed_answers = json.loads(user_answer.text_response)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid text_response format")
 
-            for answer_id, score in parsed_answers:
-                belbin_answer = db.query(BelbinAnswer).filter(
-                    BelbinAnswer.id == answer_id,
-                    BelbinAnswer.question_id == question.id
-                ).first()
-                if not belbin_answer:
-                    raise HTTPException(status_code=400, detail=f"Invalid Belbin answer id {answer_id}")
-
-                db_belbin_answer = UserBelbinAnswer(
-                    test_id=user_answer.test_id,
-                    employee_id=employee.id,
-                    question_id=user_answer.question_id,
-                    answer_id=answer_id,
-                    score=score
-                )
-                db.add(db_belbin_answer)
-        else:
-            for answer_id in user_answer.answer_ids:
-                belbin_answer = db.query(BelbinAnswer).filter(
-                    BelbinAnswer.id == answer_id,
-                    BelbinAnswer.question_id == question.id
-                ).first()
-                if not belbin_answer:
-                    raise HTTPException(status_code=400, detail=f"Invalid Belbin answer id {answer_id}")
-
-                db_belbin_answer = UserBelbinAnswer(
-                    test_id=user_answer.test_id,
-                    employee_id=employee.id,
-                    question_id=user_answer.question_id,
-                    role_id=belbin_answer.role_id,
-                    score=belbin_answer.score
-                )
-                db.add(db_belbin_answer)
+def conflict_insert(db: Session, entity):
+    """insert() с поддержкой ON CONFLICT для PostgreSQL и SQLite."""
+    bind = db.get_bind()
+    check_upsert_support(bind)
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(entity)
+
+
+def upsert_statement(db: Session, entity, rows: List[dict], index_elements: List[str], update_fields: List[str]):
+    """Многострочный INSERT ... ON CONFLICT для PostgreSQL и SQLite."""
+    stmt = conflict_insert(db, entity).values(rows)
+    if not update_fields:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={field: getattr(stmt.excluded, field) for field in update_fields}
+    )
 
-        db.commit()
+
+def write_user_answers(db: Session, test_id: int, employee_id: int, regular: Dict[int, PendingAnswer], belbin: Dict[int, PendingAnswer]) -> Dict[int, int]:
+    """Записать ответы попытки на указанные вопросы идемпотентными upsert-ами (без коммита).
+
+    Возвращает id записей user_answers по question_id обычных вопросов.
+    """
+    user_answer_ids = {}
+    if regular:
+        user_answer_ids = dict(db.execute(upsert_statement(
+            db, UserAnswer,
+            [
+                {"test_id": test_id, "employee_id": employee_id, "question_id": question_id, "text_response": answer.text_response}
+                for question_id, answer in regular.items()
+            ],
+            ["employee_id", "test_id", "question_id"],
+            ["text_response"],
+        ).returning(UserAnswer.question_id, UserAnswer.id)).all())
+
+        # Удаляем только снятые варианты, оставшиеся выбранными не трогаем
+        db.execute(delete(UserAnswerItem).where(or_(*[
+            and_(UserAnswerItem.user_answer_id == user_answer_ids[question_id], UserAnswerItem.answer_id.not_in(answer.answer_ids))
+            for question_id, answer in regular.items()
+        ])))
+        items = [
+            {"user_answer_id": user_answer_ids[question_id], "answer_id": answer_id}
+            for question_id, answer in regular.items()
+            for answer_id in dict.fromkeys(answer.answer_ids)
+        ]
+        if items:
+            db.execute(upsert_statement(db, UserAnswerItem, items, ["user_answer_id", "answer_id"], []))
+
+    if belbin:
+        db.execute(delete(UserBelbinAnswer).where(
+            UserBelbinAnswer.employee_id == employee_id,
+            UserBelbinAnswer.test_id == test_id,
+            or_(*[
+                and_(UserBelbinAnswer.question_id == question_id, UserBelbinAnswer.answer_id.not_in([a for a, _ in answer.belbin_scores]))
+                for question_id, answer in belbin.items()
+            ])
+        ))
+        rows = [
+            {"test_id": test_id, "employee_id": employee_id, "question_id": question_id, "answer_id": answer_id, "score": score}
+            for question_id, answer in belbin.items()
+            for answer_id, score in dict(answer.belbin_scores).items()
+        ]
+        if rows:
+            db.execute(upsert_statement(db, UserBelbinAnswer, rows, ["employee_id", "test_id", "question_id", "answer_id"], ["score"]))
+    return user_answer_ids
+
+
+def save_pending_answers(db: Session, test_id: int, employee_id: int, regular: Dict[int, PendingAnswer], belbin: Dict[int, PendingAnswer]) -> Dict[int, int] | None:
+    """Отложить ответы в attempt_store или, если буфер выключен, сразу записать в БД.
+
+    Возвращает id записанных user_answers по question_id; None, если ответы отложены.
+    """
+    if attempt_store.enabled:
+        for question_id, answer in regular.items():
+            attempt_store.put(test_id, employee_id, (REGULAR, question_id), answer)
+        for question_id, answer in belbin.items():
+            attempt_store.put(test_id, employee_id, (BELBIN, question_id), answer)
+        return None
+    user_answer_ids = write_user_answers(db, test_id, employee_id, regular, belbin)
+    db.commit()
+    return user_answer_ids
+
+
+def saved_answer_response(user_answer: UserAnswerCreate, employee_id: int, user_answer_ids: Dict[int, int] | None):
+    """Ответ /test/save_answer/: сохранённая запись или статус для вопроса Белбина."""
+    if user_answer.question_type == "belbin":
         return {"status": "Belbin structured answer saved"}
+    if user_answer_ids is None:
+        return SavedUserAnswer(**user_answer.model_dump(), employee_id=employee_id, pending=True)
+    return SavedUserAnswer(**user_answer.model_dump(), employee_id=employee_id, id=user_answer_ids[user_answer.question_id])
+
+
+def flush_attempts(db: Session, keys: Iterable[Tuple[int, int]] | None = None) -> int:
+    """Записать накопленные в attempt_store ответы: все или только указанных попыток (test_id, employee_id)."""
+    taken = attempt_store.take(keys)
+    if not taken:
+        return 0
+
+    def write(attempts):
+        for (test_id, employee_id), answers in attempts.items():
+            write_user_answers(
+                db, test_id, employee_id,
+                {question_id: a for (kind, question_id), a in answers.items() if kind == REGULAR},
+                {question_id: a for (kind, question_id), a in answers.items() if kind == BELBIN},
+            )
+        db.commit()
 
+    # Пока запись не закоммичена, ответы остаются in-flight: их видят чтения, а завершение этих попыток ждёт
+    try:
+        write(taken)
+    except TRANSIENT_DB_ERRORS:
+        # БД недоступна — вернём всё и попробуем при следующем сбросе
+        db.rollback()
+        attempt_store.restore(taken)
+        raise
+    except Exception:
+        db.rollback()
+        # Какую-то попытку БД не принимает (удалён вопрос, некорректные данные) — пишем по одной,
+        # а незаписываемые убираем в карантин, чтобы они не блокировали остальные
+        items = list(taken.items())
+        for i, (key, answers) in enumerate(items):
+            try:
+                write({key: answers})
+            except TRANSIENT_DB_ERRORS:
+                db.rollback()
+                attempt_store.restore(dict(items[i:]))
+                raise
+            except Exception as e:
+                db.rollback()
+                logger.warning("Quarantined pending answers of attempt %s: %s", key, e)
+                attempt_store.quarantine(key, answers, str(e))
+                del taken[key]
+    finally:
+        # Записанное больше не in-flight; возвращённое и отложенное уже отпущено restore и quarantine
+        attempt_store.done(taken)
+
+    count = sum(len(answers) for answers in taken.values())
+    attempt_store.record_flush(count)
+    return count
+
+
+def flush_for_completion(db: Session, keys: Iterable[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+    """Записать ответы завершаемых попыток, повторив отложенные в карантин; вернуть попытки, ответы которых так и не записались."""
+    keys = list(keys)
+    attempt_store.requeue(keys)
+    flush_attempts(db, keys)
+    return set(attempt_store.quarantined(keys))
+
+
+def retry_quarantined_attempts(db: Session) -> dict:
+    """Повторить запись всех попыток из карантина."""
+    keys = attempt_store.requeue()
+    flush_attempts(db, keys)
+    return {"retried": len(keys), "quarantined": len(attempt_store.quarantined(keys))}
+
+
+def create_user_answers(db: Session, user_answers: List[UserAnswerCreate], user_id: str):
+    """Сохранить пачку ответов одного теста: одна проверка доступности, один ключ ответов, один коммит."""
+    if not user_answers:
+        return {"status": "Answers saved", "saved": 0}
+    test_id = check_answers_batch(user_answers)
+
+    employee = get_current_user(db, user_id)
+    test = db.query(model.Test).filter(model.Test.id == test_id, model.Test.is_active == True).first()
+    if not test:
+        raise HTTPException(status_code=400, detail="Test not available")
+    validate_test_availability(db, test, employee)
+
+    regular, belbin = validate_answers(user_answers, get_answer_key(db, test_id))
+    save_pending_answers(db, test_id, employee.id, regular, belbin)
+    return {"status": "Answers saved", "saved": len(regular) + len(belbin)}
+
+
+def check_answers_batch(user_answers: List[UserAnswerCreate]) -> int:
+    """test_id пачки ответов; все ответы должны относиться к одному тесту."""
+    test_id = user_answers[0].test_id
+    if any(a.test_id != test_id for a in user_answers):
+        raise HTTPException(status_code=400, detail="All answers must belong to one test")
+    return test_id
+
+
+def validate_answers(user_answers: List[UserAnswerCreate], answer_key: Dict) -> Tuple[Dict[int, PendingAnswer], Dict[int, PendingAnswer]]:
+    """Проверить ответы по ключу и разложить на обычные и Белбина; при повторе вопроса побеждает последний ответ."""
+    regular, belbin = {}, {}
+    for user_answer in user_answers:
+        pending = validate_batch_answer(user_answer, answer_key)
+        if user_answer.question_type == "belbin":
+            belbin[user_answer.question_id] = pending
+        else:
+            regular[user_answer.question_id] = pending
+    return regular, belbin
 
 
 def complete_test(db: Session, user_id: str, test_id: int):
@@ -1293,6 +1652,10 @@ def complete_test(db: Session, user_id: str, test_id: int):
     if not test:
         raise HTTPException(status_code=404, detail="Тест не найден")
 
+    # Баллы считаются по БД — сначала записываем отложенные ответы
+    if flush_for_completion(db, [(test_id, employee.id)]):
+        raise HTTPException(status_code=409, detail="Не удалось сохранить часть ответов, попробуйте завершить тест позже")
+
     # Если есть лимит времени, устанавливаем completed_at как started_at + time_limit
     if test.time_limit_minutes and test_result.started_at:
         test_result.completed_at = test_result.started_at + timedelta(minutes=test.time_limit_minutes)
@@ -1305,6 +1668,7 @@ def complete_test(db: Session, user_id: str, test_id: int):
     
     db.commit()
     db.refresh(test_result)
+    deadline_queue.discard(test_result.id)
 
     calculate_test_result(db, test_id, employee.id)
 
@@ -1360,11 +1724,13 @@ def start_test(db: Session, user_id: str, test_id: int):
                 test_id=test_id,
                 employee_id=employee.id,
                 is_completed=False,
-                started_at=now
+                started_at=now,
+                expires_at=compute_expires_at(test, now)
             )
             db.add(test_result)
             db.commit()
             db.refresh(test_result)
+            deadline_queue.push(test_result.id, test_result.expires_at)
             status = "in_progress"
 
     started_at = existing_result.started_at if existing_result else now
@@ -1385,38 +1751,31 @@ def start_test(db: Session, user_id: str, test_id: int):
     test_result.started_at = started_at
     return test_result
 def assign_test_to_employees(db: Session, assignment: TestAssignmentCreate):
-    existing_assignments = set()
-    
-    # Проверяем существующие назначения
-    for item in assignment.assignments:
-        exists = db.query(model.test_assignments).filter(
-            model.test_assignments.c.employee_id == item.employee_id,
-            model.test_assignments.c.test_id == item.test_id
-        ).first()
-        if exists:
-            existing_assignments.add((item.employee_id, item.test_id))
-    
-    # Формируем список только новых назначений
-    new_assignments = [
-        {"employee_id": item.employee_id, "test_id": item.test_id}
-        for item in assignment.assignments
-        if (item.employee_id, item.test_id) not in existing_assignments
-    ]
-    
-    # Если есть новые назначения - добавляем их
-    if new_assignments:
-        stmt = insert(model.test_assignments).values(new_assignments)
-        db.execute(stmt)
+    # Дубликаты внутри запроса схлопываем, уже существующие назначения пропускает ON CONFLICT
+    requested = list(dict.fromkeys((item.employee_id, item.test_id) for item in assignment.assignments))
+
+    added = set()
+    if requested:
+        stmt = upsert_statement(
+            db, model.test_assignments,
+            [{"employee_id": employee_id, "test_id": test_id} for employee_id, test_id in requested],
+            ["test_id", "employee_id"],
+            [],
+        ).returning(model.test_assignments.c.employee_id, model.test_assignments.c.test_id)
+        added = set(db.execute(stmt).tuples())
         db.commit()
-    
+
+    existing_assignments = [pair for pair in requested if pair not in added]
+    new_assignments = [pair for pair in requested if pair in added]
+
     # Формируем ответ
     response = {
         "added": len(new_assignments),
         "already_existed": len(existing_assignments),
         "details": {
             "added": [
-                {"employee_id": a["employee_id"], "test_id": a["test_id"]}
-                for a in new_assignments
+                {"employee_id": emp_id, "test_id": test_id}
+                for emp_id, test_id in new_assignments
             ],
             "already_existed": [
                 {"employee_id": emp_id, "test_id": test_id}
@@ -1424,61 +1783,117 @@ def assign_test_to_employees(db: Session, assignment: TestAssignmentCreate):
             ]
         }
     }
-    
+
     return response
 
 
-def get_test_results_with_employee(db: Session, test_id: int, user_id: int):
+def assign_test_by_filter(db: Session, test_id: int, assignment_filter: schema.TestAssignmentFilter, user_id: str):
+    """Назначить тест сотрудникам администратора по фильтру одним INSERT ... SELECT."""
+    admin = check_user_permissions(db, user_id, True)
+    test = db.query(model.Test.id).filter(model.Test.id == test_id, model.Test.created_by == admin.id).first()
+    if not test:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+
+    conditions = [Employee.created_by_id == admin.id]
+    if assignment_filter.position_ids:
+        conditions.append(Employee.position_id.in_(assignment_filter.position_ids))
+    if assignment_filter.employee_ids:
+        conditions.append(Employee.id.in_(assignment_filter.employee_ids))
+    if assignment_filter.hired_from:
+        conditions.append(Employee.hire_date >= assignment_filter.hired_from)
+    if assignment_filter.hired_to:
+        conditions.append(Employee.hire_date <= assignment_filter.hired_to)
+    if not assignment_filter.include_admins:
+        conditions.append(or_(Employee.is_admin == False, Employee.is_admin.is_(None)))
+
+    employees = select(literal(test_id), Employee.id).where(*conditions)
+    stmt = (
+        conflict_insert(db, model.test_assignments)
+        .from_select(["test_id", "employee_id"], employees)
+        .on_conflict_do_nothing(index_elements=["test_id", "employee_id"])
+        .returning(model.test_assignments.c.employee_id)
+    )
+    added = sorted(db.execute(stmt).scalars())
+    db.commit()
+
+    return {
+        "added": len(added),
+        "details": {"added": [{"employee_id": emp_id, "test_id": test_id} for emp_id in added]},
+    }
+
+
+def get_test_results_with_employee(
+    db: Session,
+    test_id: int,
+    user_id: int,
+    skip: int = 0,
+    limit: int | None = None,
+    position_id: int | None = None,
+    completed_from: datetime | None = None,
+    completed_to: datetime | None = None,
+):
     employee = get_current_user(db, user_id)
 
+    test = (
+        db.query(Test)
+        .options(
+            selectinload(Test.questions).selectinload(Question.answers),
+            selectinload(Test.belbin_questions).selectinload(BelbinQuestion.answers),
+        )
+        .filter(Test.id == test_id, Test.created_by == employee.id)
+        .first()
+    )
+    if not test:
+        return []
+
     stmt = (
         select(TestResult)
-        .join(TestResult.test)
+        .join(TestResult.employee)
         .options(
             joinedload(TestResult.employee)
                 .joinedload(Employee.position)
-                .joinedload(Position.belbin_requirements)
+                .selectinload(Position.belbin_requirements)
                 .joinedload(BelbinPositionRequirement.role),
 
-            joinedload(TestResult.belbin_results)
+            selectinload(TestResult.belbin_results)
                 .joinedload(BelbinTestResult.role),
-
-            joinedload(TestResult.test)
         )
         .where(
             TestResult.test_id == test_id,
-            Test.created_by == employee.id
+            TestResult.is_completed == True
         )
+        .order_by(TestResult.id)
+        .offset(skip)
     )
-
-
-    test_results = db.execute(stmt).unique().scalars().all()
-
-    # Завершаем просроченные тесты
-    auto_complete_expired_tests(test_results, db)
+    if position_id is not None:
+        stmt = stmt.where(Employee.position_id == position_id)
+    if completed_from is not None:
+        stmt = stmt.where(TestResult.completed_at >= completed_from)
+    if completed_to is not None:
+        stmt = stmt.where(TestResult.completed_at <= completed_to)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    test_results = db.execute(stmt).scalars().all()
+    employee_ids = [result.employee_id for result in test_results]
+
+    # Ответы всех сотрудников страницы загружаются разом
+    user_answers_data = load_user_answers_data(db, [test_id], employee_ids)
+    belbin_answers_data = load_belbin_answers_data(db, [test_id], employee_ids)
 
     now = datetime.now(timezone.utc)
     results = []
-    auto_complete_expired_tests(results, db)
 
     for result in test_results:
-        if not result.is_completed:
-            continue
-
-        test = result.test
-        employee_id = result.employee_id
-
-        # Ответы
-        user_answers_data = get_user_answers_data(db, test.id, employee_id)
-        belbin_answers_data = get_belbin_answers_data(db, test.id, employee_id)
+        key = (test_id, result.employee_id)
 
         # Вопросы с ответами
-        safe_questions = build_questions(test.questions, user_answers_data)
-        safe_belbin_questions = build_safe_belbin_questions(test.belbin_questions, belbin_answers_data)
+        safe_questions = build_questions(test.questions, user_answers_data.get(key, ({}, {})))
+        safe_belbin_questions = build_safe_belbin_questions(test.belbin_questions, belbin_answers_data.get(key, {}))
 
         # Статус
-        status = determine_test_status(db, test, employee_id, now)
-        result.time_limit_minutes = result.test.time_limit_minutes
+        status = resolve_test_status(test, result, now)
+        result.time_limit_minutes = test.time_limit_minutes
 
         # Сбор
         results.append({
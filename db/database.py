@@ -1,20 +1,167 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, Session
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+from fastapi import Depends, Request
+from jose import jwt, JWTError
 from dotenv import load_dotenv
 import os
+import threading
+import time
+
+from db.pool import pool_options, instrument_pool
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL))
+instrument_pool(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+def make_async_url(url: str | None) -> str | None:
+    """postgresql://... -> postgresql+asyncpg://..., sqlite://... -> sqlite+aiosqlite://..."""
+    if not url:
+        return url
+    scheme, rest = url.split("://", 1)
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+# Асинхронный движок включается отдельно и работает рядом с синхронным
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_async_url(SQLALCHEMY_DATABASE_URL)
+async_engine = None
+if USE_ASYNC_DB:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, is_async=True))
+    instrument_pool(async_engine.sync_engine.pool)
+
+
+def make_async_sessionmaker(bind):
+    # Объекты сериализуются после коммита — с expire_on_commit они бы догружались вне greenlet (MissingGreenlet)
+    return async_sessionmaker(bind, autoflush=False, expire_on_commit=False)
+
+
+AsyncSessionLocal = make_async_sessionmaker(async_engine) if async_engine else None
+
+# Реплика для чтения (необязательна)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or make_async_url(DATABASE_REPLICA_URL)
+# Сколько секунд после своей записи пользователь читает с основной БД
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+replica_engine = None
+ReadSessionLocal = None
+async_replica_engine = None
+AsyncReadSessionLocal = None
+if DATABASE_REPLICA_URL:
+    replica_engine = create_engine(DATABASE_REPLICA_URL, **pool_options(DATABASE_REPLICA_URL))
+    instrument_pool(replica_engine.pool)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if USE_ASYNC_DB:
+        async_replica_engine = create_async_engine(ASYNC_DATABASE_REPLICA_URL, **pool_options(ASYNC_DATABASE_REPLICA_URL, is_async=True))
+        instrument_pool(async_replica_engine.sync_engine.pool)
+        AsyncReadSessionLocal = make_async_sessionmaker(async_replica_engine)
+
+_sticky_until: dict[str, float] = {}
+_sticky_lock = threading.Lock()
+
+
+def request_user_key(request: Request) -> str | None:
+    """Пользователь запроса без проверки подписи — нужен только для выбора БД."""
+    authorization = request.headers.get("authorization", "")
+    if not authorization.startswith("Bearer "):
+        return None
+    try:
+        claims = jwt.get_unverified_claims(authorization.split(" ")[1])
+    except JWTError:
+        return None
+    return claims.get("id") or claims.get("sub")
+
+
+def mark_primary_sticky(user_key: str | None):
+    """После записи пользователь какое-то время читает с основной БД (read-your-writes)."""
+    if not user_key or replica_engine is None:
+        return
+    now = time.monotonic()
+    with _sticky_lock:
+        _sticky_until[user_key] = now + REPLICA_STICKY_SECONDS
+        if len(_sticky_until) > 10000:
+            for key in [k for k, until in _sticky_until.items() if until <= now]:
+                del _sticky_until[key]
+
+
+def is_primary_sticky(user_key: str | None) -> bool:
+    if not user_key:
+        return False
+    with _sticky_lock:
+        return _sticky_until.get(user_key, 0) > time.monotonic()
+
+
+def use_replica(request: Request) -> bool:
+    return ReadSessionLocal is not None and not is_primary_sticky(request_user_key(request))
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+class ThreadpoolSession:
+    """Синхронная сессия с тем же run_sync, что у AsyncSession, — код выполняется в пуле потоков."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+
+async def get_async_db():
+    """AsyncSession при USE_ASYNC_DB=true, иначе обёртка над обычной сессией."""
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield ThreadpoolSession(db)
+        finally:
+            await run_in_threadpool(db.close)
+        return
+    async with AsyncSessionLocal() as async_db:
+        yield async_db
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Сессия для read-only обработчиков: реплика, если пользователь недавно ничего не записывал."""
+    if not use_replica(request):
+        yield db
+        return
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+async def get_async_read_db(request: Request, db=Depends(get_async_db)):
+    """То же, что get_read_db, для асинхронных обработчиков."""
+    if not use_replica(request):
+        yield db
+        return
+    if AsyncReadSessionLocal is not None:
+        async with AsyncReadSessionLocal() as read_db:
+            yield read_db
+        return
+    read_db = ReadSessionLocal()
+    try:
+        yield ThreadpoolSession(read_db)
+    finally:
+        read_db.close()
@@ -0,0 +1,75 @@
+import heapq
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class DeadlineQueue:
+    """Min-куча дедлайнов незавершённых попыток (TestResult.expires_at).
+
+    Устаревшие записи (дедлайн изменился или попытка завершена) не удаляются
+    из кучи сразу, а пропускаются при извлечении.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        self._deadlines: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._on_earliest_changed: Callable[[], None] | None = None
+
+    def set_wakeup(self, callback: Callable[[], None] | None):
+        self._on_earliest_changed = callback
+
+    def push(self, result_id: int, expires_at: datetime | None):
+        if expires_at is None:
+            self.discard(result_id)
+            return
+        expires_at = as_utc(expires_at)
+        with self._lock:
+            self._deadlines[result_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, result_id))
+            is_earliest = self._heap[0] == (expires_at, result_id)
+        if is_earliest and self._on_earliest_changed:
+            self._on_earliest_changed()
+
+    def discard(self, result_id: int):
+        with self._lock:
+            self._deadlines.pop(result_id, None)
+
+    def _drop_stale(self):
+        while self._heap:
+            expires_at, result_id = self._heap[0]
+            if self._deadlines.get(result_id) == expires_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> datetime | None:
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """Извлечь id попыток, дедлайн которых наступил."""
+        now = as_utc(now)
+        due = []
+        with self._lock:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, result_id = heapq.heappop(self._heap)
+                del self._deadlines[result_id]
+                due.append(result_id)
+                self._drop_stale()
+        return due
+
+    def __len__(self):
+        with self._lock:
+            return len(self._deadlines)
+
+
+deadline_queue = DeadlineQueue()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+from db.database import SessionLocal
+from crud.test import complete_expired_tests, get_upcoming_deadlines, mark_expired_tests
+from deadline_queue import deadline_queue
+
+logger = logging.getLogger(__name__)
+
+# Как часто сверять кучу с БД (попытки, начатые другими процессами, и страховочный проход)
+EXPIRY_CHECK_INTERVAL_SECONDS = float(os.getenv("EXPIRY_CHECK_INTERVAL_SECONDS", "30"))
+EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "100"))
+# Выключить, если просрочку обрабатывает отдельный воркер (python expiry_scheduler.py)
+RUN_EXPIRY_SCHEDULER = os.getenv("RUN_EXPIRY_SCHEDULER", "true").lower() in ("1", "true", "yes")
+
+expiry_task: asyncio.Task | None = None
+
+
+def run_expiry_pass(result_ids: Iterable[int] | None = None) -> int:
+    """Завершить просроченные тесты: все или только переданные попытки."""
+    db = SessionLocal()
+    try:
+        return complete_expired_tests(db, batch_size=EXPIRY_BATCH_SIZE, result_ids=result_ids)
+    finally:
+        db.close()
+
+
+def resync_deadlines(horizon: timedelta) -> int:
+    """Завершить всё просроченное и загрузить в кучу дедлайны ближайшего окна."""
+    completed = run_expiry_pass()
+
+    db = SessionLocal()
+    try:
+        # Статус expired больше не пишется на чтении списка тестов (оно может идти с реплики)
+        mark_expired_tests(db)
+        upcoming = get_upcoming_deadlines(db, datetime.now(timezone.utc) + horizon)
+    finally:
+        db.close()
+
+    for result_id, expires_at in upcoming:
+        deadline_queue.push(result_id, expires_at)
+    return completed
+
+
+async def expiry_loop(interval: float = EXPIRY_CHECK_INTERVAL_SECONDS):
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    deadline_queue.set_wakeup(lambda: loop.call_soon_threadsafe(wakeup.set))
+    horizon = timedelta(seconds=interval * 2)
+    next_resync = loop.time()
+
+    try:
+        while True:
+            wakeup.clear()
+            try:
+                if loop.time() >= next_resync:
+                    completed = await asyncio.to_thread(resync_deadlines, horizon)
+                    next_resync = loop.time() + interval
+                else:
+                    due = deadline_queue.pop_due(datetime.now(timezone.utc))
+                    completed = await asyncio.to_thread(run_expiry_pass, due) if due else 0
+                if completed:
+                    logger.info("Auto-completed %s expired test results", completed)
+            except Exception:
+                logger.exception("Expired tests pass failed")
+
+            # Спим ровно до ближайшего дедлайна, но не дольше следующей сверки
+            timeout = next_resync - loop.time()
+            next_deadline = deadline_queue.next_deadline()
+            if next_deadline is not None:
+                timeout = min(timeout, (next_deadline - datetime.now(timezone.utc)).total_seconds())
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        deadline_queue.set_wakeup(None)
+
+
+def start_expiry_scheduler():
+    global expiry_task
+    if RUN_EXPIRY_SCHEDULER and expiry_task is None:
+        expiry_task = asyncio.create_task(expiry_loop())
+
+
+async def stop_expiry_scheduler():
+    global expiry_task
+    if expiry_task is None:
+        return
+    expiry_task.cancel()
+    try:
+        await expiry_task
+    except asyncio.CancelledError:
+        pass
+    expiry_task = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(expiry_loop())
@@ -3,7 +3,11 @@ from jose import jwt, JWTError
 from pydantic import BaseModel
 from typing import Optional
 import httpx
-from auth import jwks_cache, CLERK_ISSUER
+from sqlalchemy.orm import Session
+from db.database import get_db
+from models.employee import Employee
+from crud.principal import resolve_employee
+from auth import jwks_store, token_cache, CLERK_ISSUER
 
 class UserData(BaseModel):
     user_id: str
@@ -16,15 +20,26 @@ async def get_current_user(authorization: str = Header(...)) -> UserData:
     
     token = authorization.split(" ")[1]
     
+    # Токен уже проверяли — и ключ, которым он подписан, всё ещё действует
+    cached = token_cache.get(token)
+    if cached is not None and cached[0] in jwks_store.keys:
+        payload = cached[1]
+        return UserData(
+            user_id=payload.get("id"),
+            full_name=payload.get("name"),
+            email=payload.get("email")
+        )
+
     try:
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
-        keys = jwks_cache.get("keys")
 
-        if not keys:
+        if not jwks_store.keys:
+            await jwks_store.refresh(force=True)
+        if not jwks_store.keys:
             raise HTTPException(status_code=503, detail="JWKS not available")
 
-        key = next((k for k in keys if k["kid"] == kid), None)
+        key = await jwks_store.get_key(kid)
         if not key:
             raise HTTPException(status_code=401, detail="Public key not found.")
 
@@ -35,6 +50,7 @@ async def get_current_user(authorization: str = Header(...)) -> UserData:
             issuer=CLERK_ISSUER,
             options={"verify_aud": False},
         )
+        token_cache.put(token, kid, payload)
 
         return UserData(
             user_id=payload.get("id"),
@@ -43,4 +59,18 @@ async def get_current_user(authorization: str = Header(...)) -> UserData:
         )
 
     except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"Token validation error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail=f"Token validation error: {str(e)}")
+
+
+def get_current_employee(current_user: UserData = Depends(get_current_user), db: Session = Depends(get_db)) -> Employee:
+    """Сотрудник текущего пользователя; CRUD-функции в этом же запросе берут его из сессии."""
+    employee = resolve_employee(db, current_user.user_id)
+    if not employee:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return employee
+
+
+def get_current_admin(employee: Employee = Depends(get_current_employee)) -> Employee:
+    if not employee.is_admin:
+        raise HTTPException(status_code=404, detail="User has not permissions")
+    return employee
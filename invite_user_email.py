@@ -1,37 +1,37 @@
-import requests
-from auth import CLERK_API_KEY
+from auth import CLERK_API_URL, clerk_headers, clerk_session, get_clerk_client
 
 def invite_user_via_clerk(email: str, redirect_url: str):
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
     payload = {
         "email_address": email,
         "redirect_url": redirect_url,  # URL, куда пользователь попадет после клика
     }
 
-    response = requests.post(
-        "https://api.clerk.dev/v1/invitations",
-        headers=headers,
+    response = clerk_session.post(
+        f"{CLERK_API_URL}/invitations",
+        headers=clerk_headers(),
         json=payload
     )
     response.raise_for_status()
     return response.json()
 
 
-def cancel_invitation(invitation_id: str):
-    headers = {
-        "Authorization": f"Bearer {CLERK_API_KEY}",
-        "Content-Type": "application/json",
+async def invite_user_via_clerk_async(email: str, redirect_url: str):
+    payload = {
+        "email_address": email,
+        "redirect_url": redirect_url,  # URL, куда пользователь попадет после клика
     }
 
-    response = requests.delete(
-        f"https://api.clerk.dev/v1/invitations/{invitation_id}",
-        headers=headers,
+    response = await get_clerk_client().post("/invitations", json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+def cancel_invitation(invitation_id: str):
+    response = clerk_session.delete(
+        f"{CLERK_API_URL}/invitations/{invitation_id}",
+        headers=clerk_headers(),
     )
 
     response.raise_for_status()  # Если статус не 2xx, поднимет исключение
 
-    return response.json()
\ No newline at end of file
+    return response.json()
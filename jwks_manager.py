@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+JWKS_TTL_SECONDS = int(os.getenv("JWKS_TTL_SECONDS", "3600"))
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL_SECONDS", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300"))
+
+
+class JWKSManager:
+    """Ключи Clerk с обновлением по TTL и при появлении неизвестного kid."""
+
+    def __init__(self, url: str, ttl: int = JWKS_TTL_SECONDS, min_refresh_interval: int = JWKS_MIN_REFRESH_INTERVAL_SECONDS):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.keys: dict[str, dict] = {}
+        self.fetched_at = 0.0
+        self.last_attempt_at = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {"refreshes": 0, "refresh_errors": 0, "unknown_kid": 0}
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.fetched_at >= self.ttl
+
+    async def fetch(self) -> list[dict]:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()["keys"]
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            # Пока ждали блокировку, ключи мог обновить другой запрос
+            if not force and not self.is_stale():
+                return
+            # Не даём поддельным kid заставлять нас дёргать Clerk на каждый запрос
+            if self.last_attempt_at and time.monotonic() - self.last_attempt_at < self.min_refresh_interval:
+                return
+            self.last_attempt_at = time.monotonic()
+            try:
+                keys = await self.fetch()
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                self.stats["refresh_errors"] += 1
+                print(f"❌ JWKS refresh failed: {e}")
+                return
+            self.keys = {key["kid"]: key for key in keys}
+            self.fetched_at = time.monotonic()
+            self.stats["refreshes"] += 1
+
+    async def get_key(self, kid: str | None) -> dict | None:
+        if self.is_stale():
+            await self.refresh()
+        key = self.keys.get(kid)
+        if key is None and self.keys:
+            self.stats["unknown_kid"] += 1
+            await self.refresh(force=True)
+            key = self.keys.get(kid)
+        return key
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "keys": len(self.keys),
+            "age_seconds": round(time.monotonic() - self.fetched_at, 1) if self.fetched_at else None,
+        }
+
+
+class TokenCache:
+    """LRU проверенных токенов: ключ — sha256 токена, запись живёт не дольше exp."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, max_ttl: int = TOKEN_CACHE_MAX_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._items: OrderedDict[str, tuple[float, str | None, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str, now: float | None = None) -> tuple[str | None, dict] | None:
+        """(kid, claims) или None, если токена нет или он истёк."""
+        now = time.time() if now is None else now
+        key = self.token_key(token)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1], item[2]
+
+    def put(self, token: str, kid: str | None, claims: dict, now: float | None = None):
+        now = time.time() if now is None else now
+        expires_at = now + self.max_ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+        if expires_at <= now:
+            return
+        key = self.token_key(token)
+        with self._lock:
+            self._items[key] = (expires_at, kid, claims)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
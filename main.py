@@ -1,26 +1,38 @@
 from fastapi import FastAPI, Request, Body
 from fastapi.params import Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi import status
 from pydantic import BaseModel
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Header, BackgroundTasks
 from sqlalchemy.orm import Session
-from typing import List, Union
+from typing import List, Union, Optional, Literal
+from datetime import datetime
 import uvicorn
 import requests
 import logging
 from schemas import test as test_schemas
 import models, schemas, crud
-from db.database import engine, get_db
+from db.database import engine, async_engine, replica_engine, SessionLocal, get_db, get_async_db, get_read_db, get_async_read_db, request_user_key, mark_primary_sticky
+from db.pool import get_pool_metrics
+from sqlalchemy.ext.asyncio import AsyncSession
 from initial_data import init_belbin_roles, init_belbin_questions, init_position_requirements
-from get_current_user import get_current_user, UserData
+from get_current_user import get_current_user, get_current_employee, get_current_admin, UserData
 import os
 app = FastAPI()
 from sqlalchemy.orm import DeclarativeBase
 import httpx
-from auth import jwks_cache, JWKS_URL, create_clerk_user, delete_clerk_user, update_clerk_user, CLERK_ISSUER
-from invite_user_email import invite_user_via_clerk
+from auth import jwks_store, token_cache, create_clerk_user, delete_clerk_user, update_clerk_user, CLERK_ISSUER, CLERK_MAX_CONCURRENCY, create_clerk_user_async, delete_clerk_user_async, clerk_error_message, close_clerk_client
+from invite_user_email import invite_user_via_clerk, invite_user_via_clerk_async
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from expiry_scheduler import start_expiry_scheduler, stop_expiry_scheduler
+from attempt_flusher import start_attempt_flusher, stop_attempt_flusher
+from attempt_store import attempt_store
+from crud.answer_key import answer_key_cache, preload_answer_keys
+from crud.test import check_upsert_support
+from background_jobs import job_registry, run_complete_open_attempts
+from media_store import media_store, is_valid_hash, guess_content_type, media_headers
 
 logger = logging.getLogger(__name__)
 
@@ -44,11 +56,55 @@ allow_headers=["*"] ,
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    # Пока идёт запись и сразу после неё чтения пользователя идут в основную БД
+    is_write = request.method not in ("GET", "HEAD", "OPTIONS")
+    if is_write:
+        mark_primary_sticky(request_user_key(request))
+    response = await call_next(request)
+    if is_write:
+        mark_primary_sticky(request_user_key(request))
+    return response
+
+@app.on_event("startup")
+def check_database():
+    # Неподдерживаемая БД должна останавливать старт, а не ронять каждое сохранение ответа
+    check_upsert_support(engine)
+
 @app.on_event("startup")
 async def load_jwks():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(JWKS_URL)
-        jwks_cache["keys"] = response.json()["keys"]
+    await jwks_store.refresh(force=True)
+
+def warm_answer_keys() -> int:
+    db = SessionLocal()
+    try:
+        return preload_answer_keys(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def preload_answer_key_cache():
+    # Ключи активных тестов нужны сразу — без них первые ответы пойдут в БД за ключом
+    try:
+        count = await asyncio.to_thread(warm_answer_keys)
+        logger.info("Preloaded answer keys for %s active tests", count)
+    except Exception:
+        logger.exception("Answer key preload failed")
+
+@app.on_event("startup")
+async def start_background_jobs():
+    start_expiry_scheduler()
+    start_attempt_flusher()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await stop_expiry_scheduler()
+    await stop_attempt_flusher()
+    await close_clerk_client()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 # Модель для данных из Web App
 class QuizResult(BaseModel):
@@ -101,7 +157,7 @@ def delete_position(position_id: int, current_user: UserData = Depends(get_curre
 
 
 @app.get("/positions/", response_model=List[schemas.Position], status_code=status.HTTP_200_OK)
-def get_positions(db: Session = Depends(get_db),  current_user: UserData = Depends(get_current_user)):
+def get_positions(db: Session = Depends(get_read_db),  current_user: UserData = Depends(get_current_user)):
     return crud.get_positions(db, current_user.user_id)
 
 @app.post("/employees/local/", status_code=status.HTTP_201_CREATED)
@@ -120,39 +176,26 @@ def create_employee_local(
         employee_id=None  # или какое-то другое значение, если не нужно
     )
 
-#Add delete old accounts
-@app.post("/employees/clerk/", status_code=status.HTTP_201_CREATED)
-def create_employees_clerk_batch(
-    employees: List[schemas.EmployeeCreateWithAccount] = Body(..., embed=True),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    results = []
-    errors = []
-    clerk_user_created = False
-
-    for idx, employee in enumerate(employees):
-        try:
-            employee_create_data = employee.model_dump(
-                exclude={"type", "username", "password"}
-            )
-            employee_create = schemas.EmployeeCreate(**employee_create_data)
-
-            if employee.type == "link":
-                if not employee.email:
-                    raise HTTPException(status_code=422, detail="Email обязателен для регистрации по ссылке")
-                response = invite_user_via_clerk(employee.email, f"{CLERK_ISSUER}/sign-up")
-                employee_id = response["id"]
-
-            elif employee.type in ("email_password", "username_password"):
-                if employee.type == "email_password" and not employee.email:
-                    raise HTTPException(status_code=422, detail="Email обязателен для регистрации по email + пароль")
-                if employee.type == "username_password" and not employee.username:
-                    raise HTTPException(status_code=422, detail="Логин обязателен для регистрации по логину + пароль")
-                if not employee.password:
-                    raise HTTPException(status_code=422, detail="Пароль обязателен для регистрации")
-
-                clerk_user = create_clerk_user(
+async def create_clerk_account(idx: int, employee: schemas.EmployeeCreateWithAccount, semaphore: asyncio.Semaphore):
+    """Создать аккаунт (или приглашение) в Clerk для одного сотрудника из пачки."""
+    try:
+        if employee.type == "link":
+            if not employee.email:
+                raise HTTPException(status_code=422, detail="Email обязателен для регистрации по ссылке")
+            async with semaphore:
+                response = await invite_user_via_clerk_async(employee.email, f"{CLERK_ISSUER}/sign-up")
+            return {"index": idx, "employee": employee, "clerk_id": response["id"]}
+
+        elif employee.type in ("email_password", "username_password"):
+            if employee.type == "email_password" and not employee.email:
+                raise HTTPException(status_code=422, detail="Email обязателен для регистрации по email + пароль")
+            if employee.type == "username_password" and not employee.username:
+                raise HTTPException(status_code=422, detail="Логин обязателен для регистрации по логину + пароль")
+            if not employee.password:
+                raise HTTPException(status_code=422, detail="Пароль обязателен для регистрации")
+
+            async with semaphore:
+                clerk_user = await create_clerk_user_async(
                     email=employee.email if employee.email != "" else None,
                     username=employee.username if employee.type == "username_password" else None,
                     password=employee.password,
@@ -160,17 +203,39 @@ def create_employees_clerk_batch(
                     last_name=employee.last_name,
                     is_admin=employee.is_admin
                 )
-                clerk_user_created = True
+            return {"index": idx, "employee": employee, "clerk_id": clerk_user["id"]}
+
+        else:
+            raise HTTPException(status_code=400, detail="Неподдерживаемый тип создания аккаунта")
+
+    except httpx.HTTPStatusError as e:
+        print("❌ Clerk HTTP error:", e.response.text)
+        return {"index": idx, "error": clerk_error_message(e.response)}
+    except HTTPException as he:
+        return {"index": idx, "error": he.detail}
+    except Exception as ex:
+        print(f"❌ Unknown error on employee index {idx}: {ex}")
+        return {"index": idx, "error": str(ex)}
+
 
-                employee_id = clerk_user["id"]
+def save_clerk_employees(db: Session, accounts: list, user_id: str):
+    """Сохранить в БД сотрудников, для которых аккаунт в Clerk создан."""
+    results = []
+    errors = []
+    failed_clerk_ids = []
 
-            else:
-                raise HTTPException(status_code=400, detail="Неподдерживаемый тип создания аккаунта")
-            employee_create.clerk_id = employee_id
+    for account in accounts:
+        idx, employee, clerk_id = account["index"], account["employee"], account["clerk_id"]
+        try:
+            employee_create_data = employee.model_dump(
+                exclude={"type", "username", "password"}
+            )
+            employee_create = schemas.EmployeeCreate(**employee_create_data)
+            employee_create.clerk_id = clerk_id
             created_employee = crud.update_employee(
                 db=db,
                 employee_update=employee_create,
-                user_id=current_user.user_id,
+                user_id=user_id,
                 photo=None,
                 employee_id = employee.id
             )
@@ -192,43 +257,48 @@ def create_employees_clerk_batch(
                 "positionTitle": position_title,
             })
 
-        except requests.HTTPError as e:
-            try:
-                response_data = e.response.json()
-            except Exception:
-                response_data = {}
-
-            print("❌ Clerk HTTP error:", response_data)
-            errors_list = response_data.get("errors", [])
-            error_msg = "Неизвестная ошибка от Clerk"
-
-            if errors_list:
-                for err_detail in errors_list:
-                    if err_detail.get("code") == "form_identifier_exists":
-                        error_msg = "Пользователь с таким email уже зарегистрирован"
-                    elif err_detail.get("code") == "duplicate_record":
-                        error_msg = "Приглашение уже отправлено"
-                    else:
-                        error_msg = err_detail.get("long_message") or err_detail.get("message") or error_msg
-            else:
-                error_msg = response_data.get("message") or error_msg
-
-            errors.append({"index": idx, "error": error_msg})
-
-        except HTTPException as he:
-            if clerk_user_created and employee_id:
-                delete_clerk_user(employee_id)
-            errors.append({"index": idx, "error": he.detail})
-
         except Exception as ex:
             import traceback
             print(f"❌ Unknown error on employee index {idx}: {ex}")
             traceback.print_exc()
-            if clerk_user_created and employee_id:
-                delete_clerk_user(employee_id)
+            db.rollback()
+            failed_clerk_ids.append(clerk_id)
+            errors.append({"index": idx, "error": ex.detail if isinstance(ex, HTTPException) else str(ex)})
+
+    return results, errors, failed_clerk_ids
 
-            errors.append({"index": idx, "error": str(ex)})
 
+#Add delete old accounts
+@app.post("/employees/clerk/", status_code=status.HTTP_201_CREATED)
+async def create_employees_clerk_batch(
+    employees: List[schemas.EmployeeCreateWithAccount] = Body(..., embed=True),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    # Запросы к Clerk идут параллельно, но не больше CLERK_MAX_CONCURRENCY одновременно
+    semaphore = asyncio.Semaphore(CLERK_MAX_CONCURRENCY)
+    accounts = await asyncio.gather(*(
+        create_clerk_account(idx, employee, semaphore) for idx, employee in enumerate(employees)
+    ))
+
+    errors = [account for account in accounts if "error" in account]
+    created = [account for account in accounts if "error" not in account]
+
+    # Сессия БД синхронная — сохраняем последовательно в пуле потоков
+    results, db_errors, failed_clerk_ids = await run_in_threadpool(save_clerk_employees, db, created, current_user.user_id)
+    errors.extend(db_errors)
+
+    # Откатываем аккаунты Clerk, для которых не удалось сохранить сотрудника
+    async def rollback_clerk_account(clerk_id: str):
+        async with semaphore:
+            try:
+                await delete_clerk_user_async(clerk_id)
+            except Exception as ex:
+                print(f"❌ Failed to roll back Clerk account {clerk_id}: {ex}")
+
+    await asyncio.gather(*(rollback_clerk_account(clerk_id) for clerk_id in failed_clerk_ids))
+
+    errors.sort(key=lambda error: error["index"])
     return {"results": results, "errors": errors}
 
 
@@ -336,8 +406,8 @@ async def clerk_user_created(request: Request, employee: schemas.EmployeeMinimal
 
 
 @app.get("/me/profile/",  status_code=status.HTTP_200_OK)
-def get_profile(db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    return schemas.Employee.model_validate(crud.get_current_user(db, current_user.user_id))
+def get_profile(employee: models.Employee = Depends(get_current_employee)):
+    return schemas.Employee.model_validate(employee)
 
 @app.delete("/me/profile/", status_code=status.HTTP_200_OK)
 def delete_profile(db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
@@ -411,6 +481,36 @@ def delete_employee(
     return response
       
 
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Сравнить ETag с тегами из If-None-Match (слабое сравнение, поддерживается *)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+@app.get("/employees/{employee_id}/photo")
+def get_employee_photo(
+    employee_id: int,
+    size: Literal["full", "thumbnail"] = "full",
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    photo_hash = crud.get_employee_photo_hash(db, employee_id, current_user.user_id)
+    etag = f'"{photo_hash}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = crud.get_employee_photo(db, employee_id, size)
+    media_type = guess_content_type(data[:16])
+    headers.update(media_headers(media_type))
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
 @app.put("/employees/{employee_id}/", response_model=schemas.Employee)
 def update_employee(
     employee_id: int,
@@ -426,7 +526,7 @@ def update_employee(
 
 
 @app.get("/employees/", response_model=List[Union[schemas.Employee, schemas.EmployeeMinimal]], status_code=status.HTTP_200_OK)
-def get_employees(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
+def get_employees(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db), current_user: UserData = Depends(get_current_user)):
     return crud.get_employees(db, current_user.user_id)
 
 
@@ -445,22 +545,34 @@ def delete_test(test_id: int, db: Session = Depends(get_db), current_user: UserD
     return crud.delete_test(db=db, test_id=test_id, user_id=current_user.user_id)
 
 @app.get("/tests/{test_id}", response_model=test_schemas.Test, status_code=status.HTTP_200_OK)
-def get_test(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    db_test = crud.get_test(db, test_id=test_id)
+def get_test(
+    test_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    db_test = crud.get_test(db, test_id=test_id, user_id=current_user.user_id)
     if db_test is None:
         raise HTTPException(status_code=404, detail="Test not found")
+
+    etag = crud.get_test_etag(db_test)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return db_test
 
 @app.get("/tests/", status_code=status.HTTP_200_OK)
-def get_tests(db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
+def get_tests(db: Session = Depends(get_read_db), current_user: UserData = Depends(get_current_user)):
     return crud.get_tests(db, current_user.user_id)
 
 @app.get("/tests/assign/", status_code=status.HTTP_200_OK)
-def get_assigned_tests_for_employee( db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    return crud.get_assigned_tests_for_employee(db, current_user.user_id)
+async def get_assigned_tests_for_employee(db: AsyncSession = Depends(get_async_read_db), current_user: UserData = Depends(get_current_user)):
+    return await crud.get_assigned_tests_for_employee_async(db, current_user.user_id)
 
 @app.get("/tests/assign/{test_id}", status_code=status.HTTP_200_OK)
-def get_assigned_test_for_employee(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
+def get_assigned_test_for_employee(test_id: int, db: Session = Depends(get_read_db), current_user: UserData = Depends(get_current_user)):
     return crud.get_assigned_test_for_employee(db, current_user.user_id, test_id)
 
 @app.post("/tests/assign/", status_code=201)
@@ -470,6 +582,15 @@ def assign_tests(
 ):
     return crud.assign_test_to_employees(db, assignment_data)
 
+@app.post("/tests/{test_id}/assign/", status_code=201)
+def assign_test_by_filter(
+    test_id: int,
+    assignment_filter: test_schemas.TestAssignmentFilter,
+    db: Session = Depends(get_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    return crud.assign_test_by_filter(db, test_id, assignment_filter, current_user.user_id)
+
 @app.post("/tests/unassign/", status_code=200)
 def unassign_tests(
     assignment_data: test_schemas.TestAssignmentCreate,
@@ -483,8 +604,24 @@ def update_test(test_id:int, test: test_schemas.TestCreate, db: Session = Depend
     return crud.update_test(db, test_id, test, current_user.user_id)
 
 @app.get("/tests/{test_id}/result", status_code=status.HTTP_200_OK)
-def get_tests_results(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    return crud.get_test_results_with_employee(db, test_id, current_user.user_id)
+def get_tests_results(
+    test_id: int,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    position_id: Optional[int] = None,
+    completed_from: Optional[datetime] = None,
+    completed_to: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    return crud.get_test_results_with_employee(
+        db, test_id, current_user.user_id,
+        skip=skip,
+        limit=limit,
+        position_id=position_id,
+        completed_from=completed_from,
+        completed_to=completed_to,
+    )
 
 
 @app.get("/positions/{position_id}/tests/", response_model=List[test_schemas.Test], status_code=status.HTTP_200_OK)
@@ -498,35 +635,29 @@ def create_belbin_test(test: schemas.BelbinTestCreate, db: Session = Depends(get
 
 
 
-@app.post("/belbin-tests/{test_id}/evaluate", response_model=schemas.BelbinTestEvaluation)
+@app.post("/belbin-tests/{test_id}/evaluate", response_model=List[schemas.BelbinEmployeeEvaluation])
 def evaluate_belbin_test(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    evaluation = crud.evaluate_test(db=db, test_id=test_id)
-    if not evaluation:
-        raise HTTPException(status_code=404, detail="Test not found")
+    return crud.evaluate_test(db, test_id, current_user.user_id)
 
-    # Получаем дополнительную информацию для отчета
-    test = db.query(models.BelbinTest).filter(models.BelbinTest.id == test_id).first()
-    employee = db.query(models.Employee).filter(models.Employee.id == test.employee_id).first()
-    position = db.query(models.Position).filter(models.Position.id == employee.position_id).first()
 
-    results = []
-    for result in evaluation["results"]:
-        role = db.query(models.BelbinRole).filter(models.BelbinRole.id == result.role_id).first()
-        results.append(schemas.BelbinTestResult(
-            role_id=role.id,
-            role_name=role.name,
-            total_score=result.total_score,
-            is_required=result.is_required,
-            meets_requirement=result.meets_requirement
-        ))
-
-    return schemas.BelbinTestEvaluation(
-        test_id=test_id,
-        employee_name=f"{employee.last_name} {employee.first_name}",
-        position_name=position.title,
-        overall_result=evaluation["overall_result"],
-        results=results
-    )
+@app.get("/belbin/fit-report", response_model=schemas.BelbinFitReport)
+def get_belbin_fit_report(
+    test_id: Optional[int] = None,
+    position_id: Optional[int] = None,
+    top: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    return crud.get_fit_report(db, current_user.user_id, test_id=test_id, position_id=position_id, top=top)
+
+
+@app.post("/belbin/teams", response_model=schemas.TeamSuggestions)
+def build_belbin_teams(
+    request: schemas.TeamBuildRequest,
+    db: Session = Depends(get_read_db),
+    current_user: UserData = Depends(get_current_user)
+):
+    return crud.build_teams(db, request, current_user.user_id)
 
 
 @app.get("/belbin-tests/{test_id}/results", response_model=List[schemas.BelbinTestResult])
@@ -553,6 +684,88 @@ def ping():
     return {"status": "ok"}
 
 
+def parse_range_header(range_header: str, size: int):
+    """Разобрать заголовок Range (поддерживается один диапазон)."""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    if not start:
+        if not end.isdigit() or int(end) == 0:
+            return None
+        return max(size - int(end), 0), size - 1
+    if not start.isdigit() or (end and not end.isdigit()):
+        return None
+    start, end = int(start), int(end) if end else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@app.get("/metrics/db")
+def get_db_metrics(admin: models.Employee = Depends(get_current_admin)):
+    return {
+        "sync": get_pool_metrics(engine),
+        "async": get_pool_metrics(async_engine.sync_engine) if async_engine is not None else None,
+        "replica": get_pool_metrics(replica_engine) if replica_engine is not None else None,
+        "attempts": attempt_store.metrics(),
+        "answer_keys": answer_key_cache.metrics(),
+    }
+
+
+@app.get("/attempts/quarantine")
+def get_quarantined_attempts(admin: models.Employee = Depends(get_current_admin)):
+    return [
+        {"test_id": test_id, "employee_id": employee_id, "answers": len(answers), "error": error}
+        for (test_id, employee_id), (answers, error) in attempt_store.quarantined().items()
+    ]
+
+
+@app.post("/attempts/quarantine/retry")
+def retry_quarantined_attempts(db: Session = Depends(get_db), admin: models.Employee = Depends(get_current_admin)):
+    return crud.retry_quarantined_attempts(db)
+
+
+@app.get("/metrics/auth")
+def get_auth_metrics(admin: models.Employee = Depends(get_current_admin)):
+    return {"jwks": jwks_store.metrics(), "token_cache": token_cache.metrics()}
+
+
+@app.get("/media/{blob_hash}")
+def get_media(blob_hash: str, range_header: Optional[str] = Header(None, alias="Range"), if_none_match: Optional[str] = Header(None)):
+    if not is_valid_hash(blob_hash):
+        raise HTTPException(status_code=404, detail="Media not found")
+    size = media_store.size(blob_hash)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    etag = f'"{blob_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Содержимое адресуется хэшем и никогда не меняется
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    head = next(media_store.iter_range(blob_hash, 0, min(size, 16) - 1), b"") if size else b""
+    media_type = guess_content_type(head)
+    headers.update(media_headers(media_type))
+
+    if range_header:
+        byte_range = parse_range_header(range_header, size)
+        if byte_range is None:
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(media_store.iter_range(blob_hash, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(media_store.iter_range(blob_hash, 0, size - 1), media_type=media_type, headers=headers)
+
+
 @app.put("/belbin-roles/", response_model=schemas.BelbinRole)
 def update_belbin_role(role: schemas.BelbinRole, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
     return crud.update_belbin_role(db, role, current_user.user_id)
@@ -595,22 +808,41 @@ def delete_belbin_requiriment(requiriment_id:  int,  db: Session = Depends(get_d
     return crud.delete_belbin_requiriment(db, requiriment_id, current_user.user_id)
 
 @app.patch("/tests/{test_id}/status/")
-def change_test_status(test_id: int, test_status: schemas.TestStatusUpdate, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    return crud.change_test_status(db, test_id, test_status, current_user.user_id)
+def change_test_status(test_id: int, test_status: schemas.TestStatusUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
+    result = crud.change_test_status(db, test_id, test_status, current_user.user_id)
+    if result and result["open_attempts"]:
+        # Завершение и подсчёт баллов идут после ответа, прогресс — GET /jobs/{job_id}
+        job = job_registry.create("complete_open_attempts", test_id=test_id)
+        background_tasks.add_task(run_complete_open_attempts, job["id"], test_id)
+        result["job"] = job
+    return result
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, admin: models.Employee = Depends(get_current_admin)):
+    job = job_registry.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
 
 @app.post("/test/complete/{test_id}")
-def complete_test(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    test_result = crud.complete_test(db, current_user.user_id, test_id)
+async def complete_test(test_id: int, db: AsyncSession = Depends(get_async_db), current_user: UserData = Depends(get_current_user)):
+    test_result = await crud.complete_test_async(db, current_user.user_id, test_id)
     return {"message": "Test completed", "test_result": test_result}    
 
 @app.post("/test/start/{test_id}")
-def start_test(test_id: int, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    test_start = crud.start_test(db, current_user.user_id, test_id)
+async def start_test(test_id: int, db: AsyncSession = Depends(get_async_db), current_user: UserData = Depends(get_current_user)):
+    test_start = await crud.start_test_async(db, current_user.user_id, test_id)
     return test_start
 
-@app.post("/test/save_answer/")
-def save_test_answer( answer: schemas.UserAnswerCreate, db: Session = Depends(get_db), current_user: UserData = Depends(get_current_user)):
-    return crud.create_user_answer(db, answer, current_user.user_id)
+@app.post("/test/save_answer/", response_model=Union[schemas.SavedUserAnswer, schemas.AnswerSaveStatus])
+async def save_test_answer(answer: schemas.UserAnswerCreate, db: AsyncSession = Depends(get_async_db), current_user: UserData = Depends(get_current_user)):
+    return await crud.create_user_answer_async(db, answer, current_user.user_id)
+
+
+@app.post("/test/save_answers/")
+async def save_test_answers(answers: List[schemas.UserAnswerCreate], db: AsyncSession = Depends(get_async_db), current_user: UserData = Depends(get_current_user)):
+    return await crud.create_user_answers_async(db, answers, current_user.user_id)
 
 
 if __name__ == "__main__":
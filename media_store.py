@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import io
+import os
+import re
+import tempfile
+from typing import Iterator
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "local")  # local / s3
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8000")
+MEDIA_S3_BUCKET = os.getenv("MEDIA_S3_BUCKET")
+MEDIA_S3_ENDPOINT_URL = os.getenv("MEDIA_S3_ENDPOINT_URL")  # MinIO и другие S3-совместимые хранилища
+MEDIA_S3_PREFIX = os.getenv("MEDIA_S3_PREFIX", "media/")
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (int(os.getenv("THUMBNAIL_SIZE", "128")), int(os.getenv("THUMBNAIL_SIZE", "128")))
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+MEDIA_URL_RE = re.compile(r"/media/([0-9a-f]{64})$")
+# Растровые форматы отдаются inline; всё остальное (SVG, неизвестное) — только как вложение
+INLINE_CONTENT_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+
+def is_valid_hash(blob_hash: str) -> bool:
+    return bool(HASH_RE.match(blob_hash))
+
+
+class LocalBlobStore:
+    """Хранилище файлов на диске: <root>/<первые два символа хэша>/<хэш>."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_hash: str) -> str:
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def put(self, data: bytes) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        return blob_hash
+
+    def size(self, blob_hash: str) -> int | None:
+        try:
+            return os.path.getsize(self._path(blob_hash))
+        except OSError:
+            return None
+
+    def read(self, blob_hash: str) -> bytes:
+        with open(self._path(blob_hash), "rb") as f:
+            return f.read()
+
+    def iter_range(self, blob_hash: str, start: int, end: int) -> Iterator[bytes]:
+        """Отдавать байты [start, end] кусками."""
+        with open(self._path(blob_hash), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3BlobStore:
+    """Хранилище в S3-совместимом бакете (нужен boto3)."""
+
+    def __init__(self, bucket: str, endpoint_url: str | None = None, prefix: str = "media/"):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as exc:
+            raise RuntimeError("Для MEDIA_STORAGE=s3 нужен пакет boto3") from exc
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client_error = ClientError
+
+    def _key(self, blob_hash: str) -> str:
+        return f"{self.prefix}{blob_hash}"
+
+    def put(self, data: bytes) -> str:
+        blob_hash = hashlib.sha256(data).hexdigest()
+        if self.size(blob_hash) is None:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(blob_hash), Body=data)
+        return blob_hash
+
+    def size(self, blob_hash: str) -> int | None:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(blob_hash))
+        except self.client_error:
+            return None
+        return head["ContentLength"]
+
+    def iter_range(self, blob_hash: str, start: int, end: int) -> Iterator[bytes]:
+        response = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._key(blob_hash),
+            Range=f"bytes={start}-{end}",
+        )
+        yield from response["Body"].iter_chunks(CHUNK_SIZE)
+
+    def read(self, blob_hash: str) -> bytes:
+        return b"".join(self.iter_range(blob_hash, 0, self.size(blob_hash) - 1))
+
+
+def is_durable_media_storage() -> bool:
+    """S3 или локальный каталог по абсолютному пути (смонтированный том), а не каталог внутри контейнера."""
+    return MEDIA_STORAGE == "s3" or os.path.isabs(MEDIA_ROOT)
+
+
+def create_media_store():
+    if MEDIA_STORAGE == "s3":
+        return S3BlobStore(MEDIA_S3_BUCKET, MEDIA_S3_ENDPOINT_URL, MEDIA_S3_PREFIX)
+    return LocalBlobStore(MEDIA_ROOT)
+
+
+media_store = create_media_store()
+
+
+def decode_image(data: bytes) -> bytes:
+    """Картинки с фронта приходят data URL-ом — храним сами байты изображения."""
+    if data.startswith(b"data:") and b";base64," in data[:200]:
+        return base64.b64decode(data.split(b",", 1)[1])
+    return data
+
+
+def guess_content_type(head: bytes) -> str:
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.lstrip().startswith((b"<svg", b"<?xml")):
+        return "image/svg+xml"
+    return "application/octet-stream"
+
+
+def media_headers(content_type: str) -> dict:
+    """Заголовки, не дающие загруженному файлу (SVG со скриптом и т.п.) исполниться в origin API."""
+    headers = {"X-Content-Type-Options": "nosniff", "Content-Security-Policy": "default-src 'none'"}
+    if content_type not in INLINE_CONTENT_TYPES:
+        headers["Content-Disposition"] = "attachment"
+    return headers
+
+
+def media_url(blob_hash: str | None) -> str | None:
+    if not blob_hash:
+        return None
+    return f"{MEDIA_BASE_URL}/media/{blob_hash}"
+
+
+def hash_from_url(url: str | None) -> str | None:
+    if not url:
+        return None
+    match = MEDIA_URL_RE.search(url)
+    return match.group(1) if match else None
+
+
+def resolve_image_hash(image: bytes | None, image_url: str | None = None) -> str | None:
+    """Сохранить новую картинку или оставить уже загруженную (по её URL)."""
+    if image:
+        return media_store.put(decode_image(image))
+    blob_hash = hash_from_url(image_url)
+    if blob_hash is not None and media_store.size(blob_hash) is None:
+        raise HTTPException(status_code=400, detail="Изображение не найдено в хранилище")
+    return blob_hash
+
+
+def make_thumbnail(data: bytes, size: tuple[int, int] = THUMBNAIL_SIZE) -> bytes | None:
+    """Уменьшенная JPEG-копия картинки; None, если это не изображение."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(size)
+            output = io.BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=85)
+            return output.getvalue()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
@@ -24,6 +24,7 @@ class BelbinQuestion(Base):
     block_number = Column(Integer)
     order = Column(Integer, nullable=False)
     test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"))  
+    content_hash = Column(String(64), nullable=True)  # sha256 вопроса и набора ответов, см. content_hash.py
 
     test = relationship("Test", back_populates="belbin_questions")  
     answers = relationship("BelbinAnswer", back_populates="question")
@@ -52,7 +53,7 @@ class BelbinTestResult(Base):
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("test_results.id", ondelete="CASCADE")) 
     role_id = Column(Integer, ForeignKey("belbin_roles.id", ondelete="CASCADE"))
-    total_score = Column(Float)
+    total_score = Column(Float)  # сумма баллов роли по всем блокам теста (0–10 за блок), без нормировки
     # is_required = Column(Boolean)
     # meets_requirement = Column(Boolean)
 
@@ -66,7 +67,7 @@ class BelbinPositionRequirement(Base):
     id = Column(Integer, primary_key=True, index=True)
     position_id = Column(Integer, ForeignKey("positions.id", ondelete="CASCADE"))
     role_id = Column(Integer, ForeignKey("belbin_roles.id", ondelete="CASCADE"))
-    min_score = Column(Integer)
+    min_score = Column(Integer)  # порог в тех же сырых баллах, что BelbinTestResult.total_score, а не в процентах
     is_key = Column(Boolean)  # Является ли роль ключевой для должности
 
     position = relationship("Position", back_populates="belbin_requirements")
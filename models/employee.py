@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, UniqueConstraint
 from sqlalchemy.sql.sqltypes import LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 
 from db.database import Base
 from models.test import test_assignments
+from media_store import MEDIA_BASE_URL
+
+
+def employee_photo_url(employee_id: int, photo_hash: str | None, size: str = "full") -> str | None:
+    if not photo_hash:
+        return None
+    # Версия в URL меняется вместе с фото, поэтому ответ можно долго кэшировать
+    return f"{MEDIA_BASE_URL}/employees/{employee_id}/photo?size={size}&v={photo_hash[:12]}"
 
 class Employee(Base):
     __tablename__ = "employees"
@@ -17,7 +25,9 @@ class Employee(Base):
     email = Column(String, nullable=True, unique=True)
     position_id = Column(Integer, ForeignKey("positions.id"), nullable=True)
     hire_date = Column(Date, nullable=True)
-    photo = Column(LargeBinary, nullable=True)  # Для хранения бинарных данных фото
+    photo = deferred(Column(LargeBinary, nullable=True))  # Для хранения бинарных данных фото
+    photo_thumbnail = deferred(Column(LargeBinary, nullable=True))
+    photo_hash = Column(String(64), nullable=True)  # sha256 фото, используется как ETag
     photo_url = Column(String, nullable=True)   # Альтернативно: URL к фото
 
     is_admin = Column(Boolean, default=False)
@@ -45,8 +55,19 @@ class Employee(Base):
         back_populates="assigned_to"
     )
 
+    @property
+    def photo_full_url(self):
+        return employee_photo_url(self.id, self.photo_hash)
+
+    @property
+    def photo_thumbnail_url(self):
+        return employee_photo_url(self.id, self.photo_hash, "thumbnail")
+
 class UserAnswer(Base):
     __tablename__ = "user_answers"
+    __table_args__ = (
+        UniqueConstraint("employee_id", "test_id", "question_id", name="uq_user_answers_employee_test_question"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -64,6 +85,9 @@ class UserAnswer(Base):
 
 class UserBelbinAnswer(Base):
     __tablename__ = "user_belbin_answers"
+    __table_args__ = (
+        UniqueConstraint("employee_id", "test_id", "question_id", "answer_id", name="uq_user_belbin_answers_employee_test_question_answer"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False)
@@ -80,7 +104,10 @@ class UserBelbinAnswer(Base):
 
 class UserAnswerItem(Base):
     __tablename__ = "user_answer_items"
-    
+    __table_args__ = (
+        UniqueConstraint("user_answer_id", "answer_id", name="uq_user_answer_items_user_answer_answer"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     user_answer_id = Column(Integer, ForeignKey("user_answers.id", ondelete="CASCADE"))
     answer_id = Column(Integer, ForeignKey("answers.id", ondelete="CASCADE"))
@@ -3,6 +3,7 @@ from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from db.database import Base
 from models.belbin import BelbinQuestion
+from media_store import media_url
 import pytest
 
 test_assignments = Table(
@@ -32,7 +33,7 @@ class Test(Base):
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     time_limit_minutes = Column(Integer, nullable=True)
 
-    image = Column(LargeBinary, nullable=True)  # 🔥 Хранение изображения
+    image_hash = Column(String(64), nullable=True)  # 🔥 Картинка в хранилище media_store
     status = Column(String, default="draft")
     test_settings_id = Column(Integer, ForeignKey("test_settings.id", ondelete="CASCADE")) 
     created_by = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"))
@@ -46,6 +47,10 @@ class Test(Base):
     created_by_user = relationship("Employee", back_populates="created_tests", foreign_keys=[created_by])
     test_settings = relationship("TestSettings", back_populates="tests", cascade="all, delete")
 
+    @property
+    def image_url(self):
+        return media_url(self.image_hash)
+
 
 
 class Question(Base):
@@ -55,13 +60,18 @@ class Question(Base):
     text = Column(String, index=True, nullable=False)
     test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"))
     question_type = Column(String, default="single_choice")  # single_choice/multiple_choice/text_answer
-    image = Column(LargeBinary, nullable=True)  
+    image_hash = Column(String(64), nullable=True)
     order = Column(Integer, nullable=False)
     points = Column(Integer, default=1, nullable=False)  
+    content_hash = Column(String(64), nullable=True)  # sha256 вопроса и набора ответов, см. content_hash.py
 
     test = relationship("Test", back_populates="questions")
     answers = relationship("Answer", back_populates="question", cascade="all, delete")
 
+    @property
+    def image_url(self):
+        return media_url(self.image_hash)
+
 
 class Answer(Base):
     __tablename__ = "answers"
@@ -70,10 +80,14 @@ class Answer(Base):
     text = Column(String)
     is_correct = Column(Boolean, default=False)
     question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"))
-    image = Column(LargeBinary, nullable=True)  # 🔥
+    image_hash = Column(String(64), nullable=True)  # 🔥
 
     question = relationship("Question", back_populates="answers")
 
+    @property
+    def image_url(self):
+        return media_url(self.image_hash)
+
 
 class TestResult(Base):
     __tablename__ = "test_results"
@@ -86,6 +100,7 @@ class TestResult(Base):
     is_completed = Column(Boolean, default=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     started_at = Column(DateTime, default=datetime.now(timezone.utc))  # Дата начала теста
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Дедлайн незавершённой попытки
 
     score = Column(Integer, nullable=True)
     max_score = Column(Integer, nullable=True)
@@ -1,5 +1,5 @@
-from .belbin import BelbinAnswer, BelbinAnswerCreate, BelbinPositionRequirement, BelbinPositionRequirementCreate, BelbinQuestion, BelbinQuestionCreate, BelbinRole, BelbinRoleCreate, BelbinTest, BelbinTestCreate, BelbinTestResult, BelbinTestEvaluation, PositionSchema
+from .belbin import BelbinAnswer, BelbinAnswerCreate, BelbinPositionRequirement, BelbinPositionRequirementCreate, BelbinQuestion, BelbinQuestionCreate, BelbinRole, BelbinRoleCreate, BelbinTest, BelbinTestCreate, BelbinTestResult, BelbinTestEvaluation, BelbinEmployeeEvaluation, BelbinFitReport, TeamBuildRequest, TeamSuggestions, PositionSchema
 from .employee import Employee, EmployeeCreate, EmployeeCreateMinimal, EmployeeMinimal, EmployeeCreateWithAccount
 from .positions import Position, PositionCreate
-from .test import Test, TestCreate, Answer, AnswerCreate, QuestionCreate, Question, TestStatusUpdate, UserAnswer, UserAnswerCreate, TestWithAnswersSchema, TestAssignmentCreate, TestAssignmentBase, SafeTest, TestResultSchema
+from .test import Test, TestCreate, Answer, AnswerCreate, QuestionCreate, Question, TestStatusUpdate, UserAnswer, UserAnswerCreate, SavedUserAnswer, AnswerSaveStatus, TestWithAnswersSchema, TestAssignmentCreate, TestAssignmentBase, SafeTest, TestResultSchema
 from .clerk import ClerkMetadata, ClerkRole, ClerkPublicMetadata, ClerkUserCreate
\ No newline at end of file
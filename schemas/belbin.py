@@ -1,7 +1,11 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Annotated, List, Optional, Literal
 from datetime import datetime
 
+# Баллы роли Белбина — сырая сумма 0–10 за каждый блок теста (при 7 блоках максимум 70), не процент.
+# В этих единицах и профиль сотрудника (total_score), и пороги должностей (min_score)
+RoleScore = Annotated[int, Field(description="Сырые баллы роли: сумма 0–10 за каждый блок теста, не процент")]
+
 
 class BelbinRoleBase(BaseModel):
     name: str
@@ -25,7 +29,7 @@ class BelbinAnswerBase(BaseModel):
 
 
 class BelbinAnswerCreate(BelbinAnswerBase):
-    pass
+    id: Optional[int] = None  # при обновлении теста — существующий ответ
 
 class BelbinAnswer(BelbinAnswerBase):
     id: int
@@ -42,6 +46,7 @@ class BelbinQuestionBase(BaseModel):
 
 
 class BelbinQuestionCreate(BelbinQuestionBase):
+    id: Optional[int] = None  # при обновлении теста — существующий вопрос
     answers: List[BelbinAnswerCreate]
 
 
@@ -76,13 +81,87 @@ class BelbinTest(BelbinTestBase):
 class BelbinTestResult(BaseModel):
     id: int
     role_id: int
-    total_score: int
+    total_score: RoleScore
     role: Optional[BelbinRole] = None
 
     class Config:
         orm_mode = True
         from_attributes=True
 
+class BelbinRoleFit(BaseModel):
+    role_id: int
+    role_name: str
+    score: float  # сырые баллы, как total_score
+    min_score: RoleScore
+    is_key: bool
+    meets_requirement: bool
+
+
+class BelbinPositionFit(BaseModel):
+    position_id: int
+    position_name: str
+    fit: float  # 0–100
+    key_coverage: float  # доля выполненных ключевых ролей
+    overall_result: Literal["high", "medium", "low"]
+
+
+class BelbinEmployeeEvaluation(BelbinPositionFit):
+    employee_id: int
+    employee_name: str
+    test_result_id: int
+    roles: List[BelbinRoleFit]
+
+
+class BelbinEmployeeFit(BaseModel):
+    employee_id: int
+    employee_name: str
+    current_position_id: Optional[int] = None
+    test_result_id: int
+    positions: List[BelbinPositionFit]
+
+
+class BelbinFitReport(BaseModel):
+    roles: List[BelbinRole]
+    employees: List[BelbinEmployeeFit]
+
+
+class TeamRoleTarget(BaseModel):
+    role_id: int
+    min_score: float = 0  # с какого балла (сырые баллы роли) сотрудник закрывает роль
+    count: int = Field(1, ge=1)  # сколько участников нужно на роль
+
+
+class TeamBuildRequest(BaseModel):
+    team_size: int = Field(..., ge=1, le=50)
+    roles: List[TeamRoleTarget] = []
+    position_id: Optional[int] = None  # роли и пороги из требований должности, если roles не заданы
+    employee_ids: Optional[List[int]] = None  # ограничить пул сотрудниками
+    position_ids: Optional[List[int]] = None  # ограничить пул должностями
+    test_id: Optional[int] = None
+    top_k: int = Field(5, ge=1, le=50)
+
+
+class TeamMember(BaseModel):
+    employee_id: int
+    employee_name: str
+    position_id: Optional[int] = None
+    role_ids: List[int]  # роли, которые сотрудник закрывает в команде
+
+
+class TeamCandidate(BaseModel):
+    members: List[TeamMember]
+    covered_role_ids: List[int]
+    missing_role_ids: List[int]
+    coverage: float  # доля закрытых мест по ролям
+    strength: float  # сумма лучших баллов команды по целевым ролям
+
+
+class TeamSuggestions(BaseModel):
+    pool_size: int
+    roles: List[BelbinRole]
+    teams: List[TeamCandidate]
+
+
 class BelbinTestEvaluation(BaseModel):
     test_id: int
     employee_name: str
@@ -99,7 +178,7 @@ class BelbinRequirementItemBase(BaseModel):
     role_id: int
     role_name: str
     role_description: str
-    min_score: int
+    min_score: RoleScore
     is_key: bool
     position_id: int
 
@@ -108,7 +187,7 @@ class BelbinRequirementItem(BaseModel):
     role_id: int
     role_name: str
     role_description: str
-    min_score: int
+    min_score: RoleScore
     is_key: bool
     position_id: int
 
@@ -134,7 +213,7 @@ class BelbinPositionRequirement(BaseModel):
 
 class BelbinRequirementSchema(BaseModel):
     role: BelbinRole
-    min_score: int
+    min_score: RoleScore
     is_key: bool
 
     class Config:
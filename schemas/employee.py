@@ -1,9 +1,8 @@
-from pydantic import BaseModel, Field, EmailStr, constr, field_serializer
+from pydantic import BaseModel, Field, EmailStr, constr
 from typing import Optional, List
 from datetime import date
 from enum import Enum
 from fastapi import  UploadFile, File, Form
-import base64
 
 from schemas.positions import Position
 from schemas.belbin import PositionSchema
@@ -44,15 +43,11 @@ class EmployeeCreate(EmployeeBase):
 class Employee(EmployeeBase):
     id: int
     photo_url: Optional[str] = None
-    photo: Optional[bytes] = None  # Храним как bytes
+    # Само фото отдаётся через /employees/{id}/photo
+    photo_full_url: Optional[str] = None
+    photo_thumbnail_url: Optional[str] = None
     position: Optional[PositionSchema] = None
 
-    @field_serializer('photo')
-    def serialize_photo(self, photo: Optional[bytes], _info):
-        if photo is None:
-            return None
-        return base64.b64encode(photo).decode('utf-8')
-
     class Config:
         from_attributes = True  
         arbitrary_types_allowed = True
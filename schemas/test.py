@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional, Literal
-from datetime import datetime
+from datetime import datetime, date
 
 from schemas.employee import Employee
 from schemas.belbin import BelbinQuestionCreate, BelbinQuestion, BelbinTestResult
@@ -17,11 +17,12 @@ class TestStatusUpdate(BaseModel):
 class AnswerBase(BaseModel):
     text: str
     is_correct: bool = False
-    image: Optional[bytes] = None  # 🔥
+    image_url: Optional[str] = None  # 🔥 /media/{hash}
 
 
 class AnswerCreate(AnswerBase):
-    pass
+    id: Optional[int] = None  # при обновлении теста — существующий ответ
+    image: Optional[bytes] = None  # новая картинка; чтобы оставить старую, передаётся image_url
 
 
 class Answer(AnswerBase):
@@ -35,12 +36,14 @@ class Answer(AnswerBase):
 class QuestionBase(BaseModel):
     text: str
     question_type: str = "single_choice"  # single_choice/multiple_choice/text_answer
-    image: Optional[bytes] = None  # 🔥
+    image_url: Optional[str] = None  # 🔥 /media/{hash}
     order: int
     points: int
     question_type: Literal["single_choice", "multiple_choice", "text_answer"] = "single_choice"
 
 class QuestionCreate(QuestionBase):
+    id: Optional[int] = None  # при обновлении теста — существующий вопрос
+    image: Optional[bytes] = None
     answers: List[AnswerCreate] = []
 
 
@@ -73,11 +76,12 @@ class TestBase(BaseModel):
     description: Optional[str] = None
     is_active: bool = True 
     end_date: datetime
-    image: Optional[bytes] = None  # 🔥
+    image_url: Optional[str] = None  # 🔥 /media/{hash}
     time_limit_minutes: Optional[int] = None
     status: str
 
 class TestCreate(TestBase):
+    image: Optional[bytes] = None
     questions: List[QuestionCreate] = []
     belbin_questions: List[BelbinQuestionCreate] = []
     test_settings: TestSettingsCreate
@@ -119,6 +123,19 @@ class UserAnswer(UserAnswerBase):
     class Config:
         orm_mode = True
 
+class SavedUserAnswer(UserAnswerBase):
+    """Ответ /test/save_answer/ на обычный вопрос.
+
+    Без буфера attempt_store это записанная строка user_answers; с буфером
+    ответ ещё не в БД: pending=True и id=None.
+    """
+    id: Optional[int] = None
+    employee_id: int
+    pending: bool = False
+
+class AnswerSaveStatus(BaseModel):
+    status: str
+
 class TestAssignmentItem(BaseModel):
     employee_id: int
     test_id: int
@@ -129,6 +146,14 @@ class TestAssignmentBase(BaseModel):
 class TestAssignmentCreate(TestAssignmentBase):
     pass
 
+class TestAssignmentFilter(BaseModel):
+    # Пустой фильтр — все сотрудники администратора
+    position_ids: List[int] = []
+    employee_ids: List[int] = []
+    hired_from: Optional[date] = None
+    hired_to: Optional[date] = None
+    include_admins: bool = False
+
 class UserAnswerSchema(BaseModel):
     id: int
     question_id: int
@@ -142,7 +167,7 @@ class SafeAnswer(BaseModel):
     id: Optional[int]
     question_id: int
     text: str
-    image: Optional[bytes] = None
+    image_url: Optional[str] = None
     is_user_answer: bool = False  # ✅ Добавлено
 
 class SafeQuestion(BaseModel):
@@ -151,7 +176,7 @@ class SafeQuestion(BaseModel):
     question_type: Literal["single_choice", "multiple_choice", "text_answer"]
     order: int
     answers: List[SafeAnswer]  # Используем SafeAnswer вместо Answer
-    image: Optional[bytes] = None  # 🔥
+    image_url: Optional[str] = None  # 🔥
     test_id: int
     class Config:
         from_attributes = True
@@ -2,9 +2,10 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from db.database import Base, get_db
+from db.database import Base, get_db, get_async_db, ThreadpoolSession
 from main import app
 from models import employee, positions
+from crud.answer_key import answer_key_cache
 import os
 
 # Используем тестовую БД из переменных окружения
@@ -20,6 +21,13 @@ def tables(engine):
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clear_answer_key_cache():
+    # Тестовая БД откатывается после каждого теста, и id тестов переиспользуются
+    answer_key_cache.clear()
+    yield
+
+
 @pytest.fixture
 def db_session(engine, tables):
     connection = engine.connect()
@@ -41,5 +49,7 @@ def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = lambda: ThreadpoolSession(db_session)
     yield TestClient(app)
-    del app.dependency_overrides[get_db]
\ No newline at end of file
+    del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_async_db]
\ No newline at end of file
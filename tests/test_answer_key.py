@@ -0,0 +1,34 @@
+from sqlalchemy import event
+from crud.answer_key import answer_key_cache, get_answer_key, preload_answer_keys
+from crud.test import calculate_test_score, update_test
+from schemas import test as test_schemas
+from tests.test_scoring import create_scored_test
+from tests.test_update_test import create_filled_test, payload_from_test
+
+
+def test_preloaded_key_serves_scoring_without_key_queries(db_session):
+    test, employee = create_scored_test(db_session, 2)
+    test.status = "active"
+    db_session.commit()
+    assert preload_answer_keys(db_session) == 1
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    assert calculate_test_score(db_session, test.id, employee.id) == 8
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+    assert not [s for s in statements if "FROM questions" in s]
+    assert answer_key_cache.metrics()["hits"] == 1
+
+
+def test_update_test_invalidates_key(db_session):
+    db_test = create_filled_test(db_session, questions_count=2)
+    key = get_answer_key(db_session, db_test.id)
+    assert answer_key_cache.get(db_test.id) is key
+    payload = payload_from_test(db_test)
+    payload["questions"][0]["answers"][1]["is_correct"] = True
+    update_test(db_session, db_test.id, test_schemas.TestCreate(**payload), "user_editor")
+    assert answer_key_cache.get(db_test.id) is None
+    question = sorted(db_test.questions, key=lambda q: q.order)[0]
+    assert get_answer_key(db_session, db_test.id)["questions"][question.id]["correct_ids"] == {a.id for a in question.answers}
@@ -0,0 +1,55 @@
+from sqlalchemy import event
+from models import Employee, Test, test_assignments
+from models.positions import Position
+from schemas.test import TestAssignmentCreate, TestAssignmentFilter
+from crud.test import assign_test_to_employees, assign_test_by_filter
+
+
+def create_department(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_assigner", is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+    sales, support = Position(title="Продажи"), Position(title="Поддержка")
+    db_session.add_all([sales, support])
+    db_session.flush()
+    employees = [
+        Employee(first_name=f"Сотрудник {i}", created_by_id=admin.id, position_id=(sales if i % 2 else support).id)
+        for i in range(10)
+    ]
+    test = Test(title="Тест", created_by=admin.id)
+    db_session.add_all(employees + [test])
+    db_session.commit()
+    return admin, sales, employees, test
+
+
+def assigned_ids(db_session, test_id):
+    return {row.employee_id for row in db_session.execute(test_assignments.select().where(test_assignments.c.test_id == test_id))}
+
+
+def test_assign_is_single_statement_and_skips_existing(db_session):
+    _, _, employees, test = create_department(db_session)
+    assign_test_to_employees(db_session, TestAssignmentCreate(assignments=[{"employee_id": employees[0].id, "test_id": test.id}]))
+
+    assignment = TestAssignmentCreate(assignments=[{"employee_id": e.id, "test_id": test.id} for e in employees])
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    response = assign_test_to_employees(db_session, assignment)
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+
+    assert len(statements) == 1
+    assert response["added"] == 9 and response["already_existed"] == 1
+    assert assigned_ids(db_session, test.id) == {e.id for e in employees}
+
+
+def test_assign_by_position(db_session):
+    admin, sales, employees, test = create_department(db_session)
+
+    response = assign_test_by_filter(db_session, test.id, TestAssignmentFilter(position_ids=[sales.id]), "user_assigner")
+    sales_ids = {e.id for e in employees if e.position_id == sales.id}
+    assert response["added"] == 5
+    assert assigned_ids(db_session, test.id) == sales_ids
+
+    # Повторный вызов ничего не добавляет, админ в выборку не попадает
+    assert assign_test_by_filter(db_session, test.id, TestAssignmentFilter(), "user_assigner")["added"] == 5
+    assert admin.id not in assigned_ids(db_session, test.id)
@@ -0,0 +1,61 @@
+import asyncio
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine
+import crud.test
+from db.database import Base, make_async_url, make_async_sessionmaker, ThreadpoolSession
+from models import Employee, BelbinRole, Question, Answer, UserAnswer
+from schemas.test import UserAnswerCreate
+from crud.test import get_current_user, create_test
+from crud.async_test import create_user_answer_async, create_user_answers_async
+from tests.test_create_test import build_test_payload
+
+
+def test_make_async_url():
+    assert make_async_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+    assert make_async_url("postgresql+psycopg2://u@db/app") == "postgresql+asyncpg://u@db/app"
+    assert make_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+
+def test_threadpool_session_runs_sync_crud(db_session):
+    db_session.add(Employee(first_name="Анна", last_name="Смирнова", clerk_id="user_async"))
+    db_session.commit()
+
+    employee = asyncio.run(ThreadpoolSession(db_session).run_sync(get_current_user, "user_async"))
+    assert employee.last_name == "Смирнова"
+
+
+def test_async_session_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(crud.test.attempt_store, "enabled", False)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with make_async_sessionmaker(engine)() as session:
+                admin = Employee(first_name="Анна", last_name="Смирнова", clerk_id="user_async", is_admin=True)
+                role = BelbinRole(name="Мыслитель")
+                session.add_all([admin, role])
+                await session.commit()
+                # После коммита атрибуты доступны без ленивой загрузки
+                assert admin.last_name == "Смирнова"
+
+                db_test = await session.run_sync(create_test, build_test_payload(role.id, 3), "user_async")
+                db_test.status, db_test.end_date = "active", None
+                await session.commit()
+                question = (await session.execute(select(Question).where(Question.test_id == db_test.id))).scalars().first()
+                answer = (await session.execute(select(Answer).where(Answer.question_id == question.id))).scalars().first()
+
+                result = await create_user_answers_async(session, [UserAnswerCreate(
+                    test_id=db_test.id, question_id=question.id, question_type="single_choice", answer_ids=[answer.id]
+                )], "user_async")
+                assert result == {"status": "Answers saved", "saved": 1}
+                saved = await create_user_answer_async(session, UserAnswerCreate(
+                    test_id=db_test.id, question_id=question.id, question_type="single_choice", answer_ids=[answer.id]
+                ), "user_async")
+                assert saved.id == (await session.execute(select(UserAnswer.id))).scalar_one()
+                return (await session.execute(select(func.count()).select_from(UserAnswer))).scalar()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,168 @@
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+import crud.test
+from attempt_store import AttemptStore
+from models import UserAnswer, UserAnswerItem, TestResult
+from schemas.test import UserAnswerCreate
+from crud.test import create_user_answer, complete_test, get_user_answers_data, get_belbin_answers_data
+from tests.test_save_answers import create_open_test
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = AttemptStore(enabled=True)
+    monkeypatch.setattr(crud.test, "attempt_store", store)
+    return store
+
+
+def test_answer_changes_are_buffered_until_complete(db_session, store):
+    employee, db_test = create_open_test(db_session)
+    db_session.add(TestResult(test_id=db_test.id, employee_id=employee.id, is_completed=False))
+    db_session.commit()
+    question = db_test.questions[0]
+    belbin_question = db_test.belbin_questions[0]
+
+    writes = []
+    listener = lambda conn, cursor, statement, *args: writes.append(statement) if not statement.startswith("SELECT") else None
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    for i in range(20):
+        create_user_answer(db_session, UserAnswerCreate(
+            test_id=db_test.id, question_id=question.id, question_type="single_choice",
+            answer_ids=[question.answers[i % 2].id]
+        ), "user_batch")
+    create_user_answer(db_session, UserAnswerCreate(
+        test_id=db_test.id, question_id=belbin_question.id, question_type="belbin",
+        text_response=f"[[{belbin_question.answers[0].id}, 5]]"
+    ), "user_batch")
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+    assert writes == []
+
+    # Чтение видит последние ответы, хотя в БД их ещё нет
+    _, answer_ids_by_question = get_user_answers_data(db_session, db_test.id, employee.id)
+    assert answer_ids_by_question[question.id] == {question.answers[1].id}
+    assert get_belbin_answers_data(db_session, db_test.id, employee.id) == {belbin_question.answers[0].id: 5}
+
+    complete_test(db_session, "user_batch", db_test.id)
+
+    assert len(store) == 0
+    assert db_session.query(UserAnswer).filter_by(employee_id=employee.id).count() == 1
+    assert [i.answer_id for i in db_session.query(UserAnswerItem)] == [question.answers[1].id]
+    assert store.metrics()["updates"] == 21 and store.metrics()["flushed"] == 2
+
+
+def test_failed_flush_keeps_newer_answers():
+    store = AttemptStore(enabled=True)
+    store.put(1, 2, ("regular", 10), crud.test.PendingAnswer(answer_ids=(1,)))
+    taken = store.take()
+    store.put(1, 2, ("regular", 10), crud.test.PendingAnswer(answer_ids=(2,)))
+    store.restore(taken)
+    assert store.pending([1], [2])[(1, 2)][("regular", 10)].answer_ids == (2,)
+
+
+def test_unwritable_attempt_is_quarantined(db_session, store):
+    employee, db_test = create_open_test(db_session)
+    test_id, employee_id = db_test.id, employee.id
+    question, belbin_question = db_test.questions[0], db_test.belbin_questions[0]
+    first_id, second_id = question.answers[0].id, question.answers[1].id
+    store.put(test_id, employee_id, ("regular", question.id), crud.test.PendingAnswer(answer_ids=(first_id,)))
+    # Попытка, которую БД не примет: балл — не число
+    store.put(test_id, employee_id + 1, ("belbin", belbin_question.id),
+              crud.test.PendingAnswer(belbin_scores=((belbin_question.answers[0].id, {"a": 1}),)))
+
+    # Откат после ошибки не должен снести данные теста
+    session = type(db_session)(bind=db_session.bind, join_transaction_mode="create_savepoint")
+    assert crud.test.flush_attempts(session) == 1
+    assert len(store) == 0
+    assert list(store.quarantined()) == [(test_id, employee_id + 1)]
+    assert session.query(UserAnswer).filter_by(employee_id=employee_id).count() == 1
+
+    # Следующие сбросы больше не упираются в сломанную попытку
+    store.put(test_id, employee_id, ("regular", question.id), crud.test.PendingAnswer(answer_ids=(second_id,)))
+    assert crud.test.flush_attempts(session) == 1
+    session.close()
+
+
+def test_complete_waits_for_flush_in_progress(db_session, store, monkeypatch):
+    employee, db_test = create_open_test(db_session)
+    db_session.add(TestResult(test_id=db_test.id, employee_id=employee.id, is_completed=False))
+    db_session.commit()
+    test_id, employee_id = db_test.id, employee.id
+    question = db_test.questions[0]
+    store.put(test_id, employee_id, ("regular", question.id), crud.test.PendingAnswer(answer_ids=(question.answers[0].id,)))
+
+    # Фоновый сброс забрал ответ и застрял перед записью
+    flush_started, completion_waiting = threading.Event(), threading.Event()
+    write_user_answers = crud.test.write_user_answers
+
+    def slow_write(*args):
+        flush_started.set()
+        assert completion_waiting.wait(5)
+        time.sleep(0.1)
+        write_user_answers(*args)
+
+    take = store.take
+
+    def take_and_signal(keys=None):
+        if keys is not None:
+            completion_waiting.set()
+        return take(keys)
+
+    monkeypatch.setattr(crud.test, "write_user_answers", slow_write)
+    monkeypatch.setattr(store, "take", take_and_signal)
+    flush_session = type(db_session)(bind=db_session.bind, join_transaction_mode="create_savepoint")
+    flusher = threading.Thread(target=crud.test.flush_attempts, args=(flush_session,))
+    flusher.start()
+    assert flush_started.wait(5)
+
+    # Пока ответ пишется, чтение его видит
+    _, answer_ids_by_question = get_user_answers_data(db_session, test_id, employee_id)
+    assert answer_ids_by_question[question.id] == {question.answers[0].id}
+
+    complete_test(db_session, "user_batch", test_id)
+    flusher.join(5)
+    flush_session.close()
+
+    result = db_session.query(TestResult).filter_by(test_id=test_id, employee_id=employee_id).one()
+    assert result.is_completed and result.score == 1
+    assert store.metrics()["in_flight"] == 0
+
+
+def test_quarantined_answers_block_completion_until_retried(db_session, store, monkeypatch):
+    employee, db_test = create_open_test(db_session)
+    db_session.add(TestResult(test_id=db_test.id, employee_id=employee.id, is_completed=False))
+    db_session.commit()
+    test_id, employee_id = db_test.id, employee.id
+    question = db_test.questions[0]
+    store.put(test_id, employee_id, ("regular", question.id), crud.test.PendingAnswer(answer_ids=(question.answers[0].id,)))
+
+    broken = True
+    write_user_answers = crud.test.write_user_answers
+
+    def flaky_write(*args):
+        if broken:
+            raise ValueError("row rejected")
+        return write_user_answers(*args)
+
+    monkeypatch.setattr(crud.test, "write_user_answers", flaky_write)
+    session = type(db_session)(bind=db_session.bind, join_transaction_mode="create_savepoint")
+    assert crud.test.flush_attempts(session) == 0
+    assert list(store.quarantined()) == [(test_id, employee_id)]
+    # Ответы из карантина по-прежнему видны сотруднику
+    _, answer_ids_by_question = get_user_answers_data(session, test_id, employee_id)
+    assert answer_ids_by_question[question.id] == {question.answers[0].id}
+
+    # Завершение повторяет запись и не считает баллы без этих ответов
+    with pytest.raises(HTTPException) as exc:
+        complete_test(session, "user_batch", test_id)
+    assert exc.value.status_code == 409
+    assert crud.test.complete_test_results(session, session.query(TestResult).filter_by(test_id=test_id)) == 0
+
+    broken = False
+    assert crud.test.retry_quarantined_attempts(session) == {"retried": 1, "quarantined": 0}
+    complete_test(session, "user_batch", test_id)
+    result = session.query(TestResult).filter_by(test_id=test_id, employee_id=employee_id).one()
+    assert result.is_completed and result.score == 1
+    session.close()
@@ -0,0 +1,76 @@
+import numpy as np
+from models import Employee, BelbinRole, Test, TestResult, BelbinTestResult, BelbinPositionRequirement
+from models.positions import Position
+from crud.belbin_fit import compute_fit, get_fit_report, evaluate_test
+from crud.test import calculate_belbin_results
+from tests.test_belbin_results import create_belbin_attempts
+
+
+def test_compute_fit_for_all_pairs():
+    scores = np.array([[10, 8, 0], [2, 9, 5]], dtype=float)
+    min_scores = np.array([[5, 8, 0], [0, 0, 10]], dtype=float)
+    required = np.array([[True, True, False], [False, False, True]])
+    key = np.array([[True, True, False], [False, False, False]])
+
+    fit = compute_fit(scores, min_scores, required, key)
+
+    assert fit["fit"].tolist() == [[100.0, 0.0], [(0.4 + 1) / 2 * 100, 50.0]]
+    assert fit["key_coverage"].tolist() == [[1.0, 1.0], [0.5, 1.0]]
+    # У второй должности нет ключевых ролей — оценка по fit
+    assert fit["verdict"].tolist() == [["high", "low"], ["medium", "medium"]]
+
+
+def test_fit_report_and_evaluation(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_fit", is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+    plant, finisher = BelbinRole(name="Генератор"), BelbinRole(name="Завершитель")
+    manager, analyst = Position(title="Руководитель", created_by_id=admin.id), Position(title="Аналитик", created_by_id=admin.id)
+    db_session.add_all([plant, finisher, manager, analyst])
+    db_session.flush()
+    db_session.add_all([
+        BelbinPositionRequirement(position_id=manager.id, role_id=plant.id, min_score=10, is_key=True),
+        BelbinPositionRequirement(position_id=analyst.id, role_id=finisher.id, min_score=5, is_key=True),
+    ])
+    employee = Employee(first_name="Пётр", last_name="Сидоров", created_by_id=admin.id, position_id=manager.id)
+    test = Test(title="Белбин", created_by=admin.id)
+    db_session.add_all([employee, test])
+    db_session.flush()
+    result = TestResult(test_id=test.id, employee_id=employee.id, is_completed=True)
+    db_session.add(result)
+    db_session.flush()
+    db_session.add_all([
+        BelbinTestResult(test_id=result.id, role_id=plant.id, total_score=4),
+        BelbinTestResult(test_id=result.id, role_id=finisher.id, total_score=6),
+    ])
+    db_session.commit()
+
+    report = get_fit_report(db_session, "user_fit")
+    positions = report["employees"][0]["positions"]
+    assert [(p["position_name"], p["fit"], p["overall_result"]) for p in positions] == [("Аналитик", 100.0, "high"), ("Руководитель", 40.0, "low")]
+
+    [evaluation] = evaluate_test(db_session, test.id, "user_fit")
+    assert evaluation["position_name"] == "Руководитель"
+    assert evaluation["roles"] == [{
+        "role_id": plant.id, "role_name": "Генератор", "score": 4.0, "min_score": 10, "is_key": True, "meets_requirement": False
+    }]
+
+
+def test_min_score_is_in_raw_role_points(db_session):
+    # Баллы за блоки 1 и 3 по первой роли: профиль — 4 сырых балла (в процентах от 70 было бы ~5.7)
+    db_test, roles, employees = create_belbin_attempts(db_session, 2)
+    calculate_belbin_results(db_session, db_test.id)
+    admin_id = employees[0].created_by_id
+    exact, above = Position(title="Порог 4", created_by_id=admin_id), Position(title="Порог 5", created_by_id=admin_id)
+    db_session.add_all([exact, above])
+    db_session.flush()
+    db_session.add_all([
+        BelbinPositionRequirement(position_id=exact.id, role_id=roles[0].id, min_score=4, is_key=True),
+        BelbinPositionRequirement(position_id=above.id, role_id=roles[0].id, min_score=5, is_key=True),
+    ])
+    employees[0].position_id, employees[1].position_id = exact.id, above.id
+    db_session.commit()
+
+    evaluations = {e["position_name"]: e["roles"][0] for e in evaluate_test(db_session, db_test.id, "user_belbin")}
+    assert evaluations["Порог 4"]["score"] == 4.0 and evaluations["Порог 4"]["meets_requirement"]
+    assert not evaluations["Порог 5"]["meets_requirement"]
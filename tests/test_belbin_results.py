@@ -0,0 +1,46 @@
+from models import Employee, BelbinRole, TestResult, UserBelbinAnswer, BelbinTestResult
+from crud.test import create_test, calculate_belbin_results
+from tests.test_create_test import build_test_payload
+from tests.test_scoring import count_queries
+
+
+def create_belbin_attempts(db_session, employees_count: int):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_belbin", is_admin=True)
+    roles = [BelbinRole(name="Генератор идей"), BelbinRole(name="Доводчик")]
+    db_session.add_all([admin] + roles)
+    db_session.commit()
+    db_test = create_test(db_session, build_test_payload(roles[0].id, 3), "user_belbin")
+    # Второй вопрос относится к другой роли
+    db_test.belbin_questions[1].answers[0].role_id = roles[1].id
+
+    employees = [Employee(first_name=f"Сотрудник {i}", created_by_id=admin.id) for i in range(employees_count)]
+    db_session.add_all(employees)
+    db_session.flush()
+    for employee in employees:
+        db_session.add(TestResult(test_id=db_test.id, employee_id=employee.id, is_completed=True))
+        for i, question in enumerate(db_test.belbin_questions):
+            db_session.add(UserBelbinAnswer(
+                test_id=db_test.id, employee_id=employee.id, question_id=question.id,
+                answer_id=question.answers[0].id, score=i + 1
+            ))
+    db_session.commit()
+    return db_test, roles, employees
+
+
+def test_belbin_results_for_all_attempts_in_one_batch(db_session):
+    db_test, roles, employees = create_belbin_attempts(db_session, 5)
+
+    test_id = db_test.id
+    queries = count_queries(db_session, lambda: calculate_belbin_results(db_session, test_id))
+    db_session.commit()
+
+    # Результаты попыток, GROUP BY по ролям, DELETE и INSERT — независимо от числа попыток
+    assert queries == 4
+    results = db_session.query(BelbinTestResult).all()
+    assert len(results) == 10
+    assert {(r.role_id, r.total_score) for r in results} == {(roles[0].id, 4), (roles[1].id, 2)}
+
+    # Пересчёт заменяет строки, а не добавляет
+    calculate_belbin_results(db_session, db_test.id, [employees[0].id])
+    db_session.commit()
+    assert db_session.query(BelbinTestResult).count() == 10
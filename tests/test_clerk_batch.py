@@ -0,0 +1,77 @@
+import asyncio
+import json
+import httpx
+import pytest
+import auth
+import main
+from main import app
+from get_current_user import get_current_user, UserData
+from models import Employee
+
+
+class ClerkStub:
+    """Локальная замена Clerk API: считает параллельные запросы и удаления."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.deleted = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "DELETE":
+            self.deleted.append(request.url.path.rsplit("/", 1)[-1])
+            return httpx.Response(200, json={"deleted": True})
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.in_flight -= 1
+        username = json.loads(request.content)["username"]
+        if username == "taken":
+            return httpx.Response(422, json={"errors": [{"code": "form_identifier_exists"}]})
+        return httpx.Response(200, json={"id": f"user_{username}"})
+
+
+@pytest.fixture
+def clerk(client, monkeypatch):
+    stub = ClerkStub()
+    monkeypatch.setattr(auth, "clerk_client", httpx.AsyncClient(transport=httpx.MockTransport(stub), base_url="http://clerk.test"))
+    monkeypatch.setattr(main, "CLERK_MAX_CONCURRENCY", 2)
+    app.dependency_overrides[get_current_user] = lambda: UserData(user_id="user_batch_admin")
+    yield stub
+    del app.dependency_overrides[get_current_user]
+
+
+def account(employee_id, username, **fields):
+    return {"id": employee_id, "first_name": "Иван", "last_name": "Иванов", "type": "username_password",
+            "username": username, "password": "secret", **fields}
+
+
+def test_batch_creates_accounts_concurrently_and_rolls_back_failures(client, clerk, db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_batch_admin", is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+    first, second = Employee(created_by_id=admin.id), Employee(created_by_id=admin.id)
+    db_session.add_all([first, second])
+    db_session.commit()
+    # Ошибка сохранения откатывает сессию — id запоминаем заранее
+    first_id, second_id = first.id, second.id
+
+    response = client.post("/employees/clerk/", json={"employees": [
+        account(first_id, "ivanov"),
+        account(second_id, "taken"),
+        account(second_id, None, type="email_password"),
+        account(999999, "ghost"),
+    ]})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert [result["id"] for result in body["results"]] == [first_id]
+    assert [error["index"] for error in body["errors"]] == [1, 2, 3]
+    assert body["errors"][0]["error"] == "Пользователь с таким email уже зарегистрирован"
+    # Три запроса к Clerk шли параллельно, но не больше CLERK_MAX_CONCURRENCY
+    assert clerk.max_in_flight == 2
+    # Аккаунт сотрудника, которого не удалось сохранить, удалён из Clerk
+    assert clerk.deleted == ["user_ghost"]
@@ -0,0 +1,68 @@
+import pytest
+import crud.test
+from models import Employee, TestResult
+from background_jobs import JobRegistry
+from crud.scoring import score_attempts
+from crud.test import complete_open_attempts
+from tests.test_scoring import create_scored_test
+
+
+def test_complete_open_attempts_scores_in_batches(db_session):
+    test, employee = create_scored_test(db_session, 2)
+    db_session.query(TestResult).filter_by(test_id=test.id).update({"is_completed": False})
+    db_session.commit()
+
+    progress = []
+    assert complete_open_attempts(db_session, test.id, batch_size=10, progress=lambda done, total: progress.append((done, total))) == 1
+    result = db_session.query(TestResult).filter_by(test_id=test.id).one()
+    assert result.is_completed and result.completed_at is not None
+    assert (result.score, result.max_score) == (8, 12)
+    assert progress == [(0, 1), (1, 1)]
+
+    # Повторный запуск ничего не трогает
+    assert complete_open_attempts(db_session, test.id) == 0
+
+
+def test_job_registry_tracks_progress():
+    registry = JobRegistry(history_size=2)
+    job = registry.create("complete_open_attempts", test_id=1)
+    registry.update(job["id"], status="running", done=5, total=10)
+    assert registry.get(job["id"])["done"] == 5
+    registry.create("complete_open_attempts", test_id=2)
+    registry.create("complete_open_attempts", test_id=3)
+    assert registry.get(job["id"]) is None
+
+
+def test_failed_batch_stays_open_for_retry(db_session, monkeypatch):
+    test, employee = create_scored_test(db_session, 1)
+    other = Employee(first_name="Пётр", last_name="Петров")
+    db_session.add(other)
+    db_session.flush()
+    db_session.add(TestResult(test_id=test.id, employee_id=other.id, is_completed=False))
+    db_session.query(TestResult).filter_by(test_id=test.id).update({"is_completed": False})
+    db_session.commit()
+    test_id, employee_id, other_id = test.id, employee.id, other.id
+
+    calls = []
+
+    def flaky_score_attempts(db, test_id, employee_ids):
+        calls.append(employee_ids)
+        if len(calls) == 2:
+            raise RuntimeError("scoring failed")
+        return score_attempts(db, test_id, employee_ids)
+
+    monkeypatch.setattr(crud.test, "score_attempts", flaky_score_attempts)
+    # Откат после ошибки не должен снести данные теста
+    session = type(db_session)(bind=db_session.bind, join_transaction_mode="create_savepoint")
+    with pytest.raises(RuntimeError):
+        complete_open_attempts(session, test_id, batch_size=1)
+
+    results = {r.employee_id: r for r in session.query(TestResult).filter_by(test_id=test_id)}
+    assert results[employee_id].is_completed and results[employee_id].score is not None
+    # Попытка из упавшей пачки не осталась завершённой без баллов
+    assert not results[other_id].is_completed
+
+    assert complete_open_attempts(session, test_id) == 1
+    session.refresh(results[other_id])
+    assert results[other_id].is_completed and results[other_id].score == 0
+    session.close()
@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import event
+from models import Employee, BelbinRole
+from schemas import test as test_schemas
+from crud.test import create_test
+
+
+def build_test_payload(role_id: int, questions_count: int) -> test_schemas.TestCreate:
+    return test_schemas.TestCreate(
+        title="Большой тест",
+        status="draft",
+        end_date=datetime(2030, 1, 1),
+        test_settings={"min_questions": 1, "belbin_block": 1, "belbin_questions_in_block": 1, "has_time_limit": False},
+        questions=[
+            {
+                "text": f"Вопрос {i}",
+                "order": i,
+                "points": 1,
+                "answers": [{"text": "да", "is_correct": True}, {"text": "нет"}],
+            }
+            for i in range(questions_count)
+        ],
+        belbin_questions=[
+            {"text": f"Белбин {i}", "block_number": 1, "order": i, "answers": [{"text": "ответ", "role_id": role_id}]}
+            for i in range(questions_count)
+        ],
+    )
+
+
+def test_create_test_inserts_graph_in_one_transaction(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_creator", is_admin=True)
+    role = BelbinRole(name="Координатор")
+    db_session.add_all([admin, role])
+    db_session.commit()
+
+    commits = []
+    event.listen(db_session, "after_commit", lambda session: commits.append(session))
+    for questions_count in (3, 40):
+        payload = build_test_payload(role.id, questions_count)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db_session.bind, "before_cursor_execute", listener)
+        db_test = create_test(db_session, payload, "user_creator")
+        event.remove(db_session.bind, "before_cursor_execute", listener)
+
+        # Ответы вставляются пакетно, независимо от числа вопросов
+        assert len([s for s in statements if s.startswith("INSERT INTO answers")]) == 1
+        assert len([s for s in statements if s.startswith("INSERT INTO belbin_answers")]) == 1
+
+        assert [q.text for q in sorted(db_test.questions, key=lambda q: q.order)] == [f"Вопрос {i}" for i in range(questions_count)]
+        assert all(len(q.answers) == 2 and q.answers[0].is_correct for q in db_test.questions)
+        assert len(db_test.belbin_questions) == questions_count
+
+    # Каждый тест создаётся одной транзакцией
+    assert len(commits) == 2
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+from deadline_queue import DeadlineQueue
+
+
+def test_pop_due_returns_expired_in_deadline_order():
+    queue = DeadlineQueue()
+    now = datetime.now(timezone.utc)
+    queue.push(1, now + timedelta(minutes=5))
+    queue.push(2, now - timedelta(minutes=1))
+    queue.push(3, now - timedelta(minutes=2))
+
+    assert queue.pop_due(now) == [3, 2]
+    assert queue.next_deadline() == now + timedelta(minutes=5)
+    assert len(queue) == 1
+
+
+def test_rescheduled_and_discarded_deadlines_are_skipped():
+    queue = DeadlineQueue()
+    now = datetime.now(timezone.utc)
+    queue.push(1, now - timedelta(minutes=1))
+    queue.push(1, now + timedelta(minutes=10))
+    queue.push(2, now - timedelta(minutes=1))
+    queue.discard(2)
+
+    assert queue.pop_due(now) == []
+    assert queue.next_deadline() == now + timedelta(minutes=10)
+
+
+def test_wakeup_called_when_earliest_deadline_changes():
+    queue = DeadlineQueue()
+    calls = []
+    queue.set_wakeup(lambda: calls.append(True))
+    now = datetime.now(timezone.utc)
+
+    queue.push(1, now + timedelta(minutes=5))
+    queue.push(2, now + timedelta(minutes=10))
+    queue.push(3, now + timedelta(minutes=1))
+
+    assert len(calls) == 2
@@ -0,0 +1,37 @@
+import hashlib
+import pytest
+from fastapi import HTTPException
+import main
+import media_store
+from media_store import LocalBlobStore, resolve_image_hash, media_url
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(media_store, "media_store", store)
+    monkeypatch.setattr(main, "media_store", store)
+    return store
+
+
+def test_svg_is_served_as_attachment(client, store):
+    response = client.get(f"/media/{store.put(SVG)}")
+    assert response.headers["content-disposition"] == "attachment"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-security-policy"] == "default-src 'none'"
+
+    response = client.get(f"/media/{store.put(PNG)}")
+    assert response.headers["content-type"] == "image/png"
+    assert "content-disposition" not in response.headers
+
+
+def test_image_url_must_point_to_stored_blob(store):
+    blob_hash = store.put(PNG)
+    assert resolve_image_hash(None, media_url(blob_hash)) == blob_hash
+
+    with pytest.raises(HTTPException) as exc:
+        resolve_image_hash(None, media_url(hashlib.sha256(b"missing").hexdigest()))
+    assert exc.value.status_code == 400
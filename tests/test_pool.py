@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from db.pool import TimedQueuePool, instrument_pool, get_pool_metrics
+
+
+def test_pool_metrics_track_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    instrument_pool(engine.pool)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        busy = get_pool_metrics(engine)
+        assert busy["checked_out"] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    metrics = get_pool_metrics(engine)
+    assert metrics["checked_out"] == 0
+    assert metrics["checkouts"] == 1 and metrics["checkins"] == 1
+    assert metrics["timeouts"] == 1
+    assert metrics["wait_seconds_max"] >= 0.05
+
+    # После dispose пул пересоздаётся, а счётчики сохраняются
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert get_pool_metrics(engine)["checkouts"] == 2
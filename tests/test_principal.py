@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from models import Employee
+from crud import principal
+from crud.test import check_user_permissions, get_current_user
+
+
+@contextmanager
+def count_queries(db_session):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", listener)
+
+
+def test_employee_resolved_once_per_session(db_session):
+    db_session.add(Employee(first_name="Админ", last_name="Админов", clerk_id="user_admin", is_admin=True))
+    db_session.commit()
+
+    with count_queries(db_session) as statements:
+        admin = check_user_permissions(db_session, "user_admin", True)
+        assert get_current_user(db_session, "user_admin") is admin
+        assert check_user_permissions(db_session, "user_admin", True) is admin
+    assert len(statements) == 1
+
+
+def test_cross_request_cache_and_invalidation(db_session, monkeypatch):
+    monkeypatch.setattr(principal, "PRINCIPAL_CACHE_TTL_SECONDS", 60)
+    principal.clear_principal_cache()
+    db_session.add(Employee(first_name="Пётр", last_name="Петров", clerk_id="user_cached", is_admin=False))
+    db_session.commit()
+
+    principal.resolve_employee(db_session, "user_cached")
+    # Новый запрос — новая сессия на том же соединении
+    other_session = type(db_session)(bind=db_session.bind)
+    with count_queries(other_session) as statements:
+        employee = principal.resolve_employee(other_session, "user_cached")
+        assert employee.last_name == "Петров"
+        assert statements == []
+
+        principal.invalidate_principal(None, "user_cached")
+        principal.resolve_employee(type(db_session)(bind=db_session.bind), "user_cached")
+    assert len(statements) == 1
+    principal.clear_principal_cache()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+from sqlalchemy import event
+from starlette.requests import Request
+from sqlalchemy.orm import sessionmaker
+import db.database as database
+from models import Employee, Test, TestSettings
+from crud.test import get_tests, mark_expired_tests
+
+
+def make_request(user_id: str | None = None) -> Request:
+    headers = []
+    if user_id:
+        token = jwt.encode({"id": user_id}, "secret", algorithm="HS256")
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_read_db_sticks_to_primary_after_write(engine, db_session, monkeypatch):
+    monkeypatch.setattr(database, "replica_engine", engine)
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(database, "_sticky_until", {})
+
+    request = make_request("user_reader")
+    assert database.request_user_key(request) == "user_reader"
+
+    reads = database.get_read_db(request, db_session)
+    assert next(reads) is not db_session
+    reads.close()
+
+    database.mark_primary_sticky("user_reader")
+    assert next(database.get_read_db(request, db_session)) is db_session
+    # Чужие записи на маршрутизацию не влияют
+    assert next(database.get_read_db(make_request("user_other"), db_session)) is not db_session
+
+
+def test_read_db_without_replica_uses_primary(db_session):
+    assert database.ReadSessionLocal is None
+    assert next(database.get_read_db(make_request("user_reader"), db_session)) is db_session
+
+
+def test_get_tests_reports_expiry_without_writing(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_lister", is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+    test = Test(title="Старый", created_by=admin.id, status="active", end_date=datetime.now(timezone.utc) - timedelta(days=1),
+                test_settings=TestSettings(min_questions=1, belbin_block=0, belbin_questions_in_block=0, has_time_limit=False))
+    db_session.add(test)
+    db_session.commit()
+    test_id = test.id
+
+    writes = []
+    listener = lambda conn, cursor, statement, *args: writes.append(statement) if not statement.startswith("SELECT") else None
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    try:
+        [listed] = get_tests(db_session, "user_lister")
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", listener)
+    assert listed.status == "expired"
+    assert writes == []
+
+    # Статус в БД записывает планировщик
+    assert mark_expired_tests(db_session) == 1
+    assert db_session.get(Test, test_id).status == "expired"
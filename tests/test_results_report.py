@@ -0,0 +1,51 @@
+from sqlalchemy import event
+from models import Employee, Test, Question, Answer, TestResult, UserAnswer, UserAnswerItem
+from models.positions import Position
+from crud.test import get_current_user, get_test_results_with_employee
+
+
+def create_report_test(db_session, admin, position, attempts_count: int):
+    test = Test(title="Отчёт", created_by=admin.id)
+    db_session.add(test)
+    db_session.flush()
+    question = Question(text="single", question_type="single_choice", test_id=test.id, order=0, points=1)
+    question.answers = [Answer(text="a", is_correct=True), Answer(text="b", is_correct=False)]
+    db_session.add(question)
+    db_session.flush()
+
+    for i in range(attempts_count):
+        employee = Employee(first_name=f"Сотрудник {i}", created_by_id=admin.id, position_id=position.id)
+        db_session.add(employee)
+        db_session.flush()
+        user_answer = UserAnswer(test_id=test.id, employee_id=employee.id, question_id=question.id)
+        db_session.add_all([user_answer, TestResult(test_id=test.id, employee_id=employee.id, is_completed=True)])
+        db_session.flush()
+        db_session.add(UserAnswerItem(user_answer_id=user_answer.id, answer_id=question.answers[0].id))
+    db_session.commit()
+    return test.id
+
+
+def test_results_report_query_count_is_constant(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_report", is_admin=True)
+    position = Position(title="Аналитик")
+    db_session.add_all([admin, position])
+    db_session.flush()
+    small_test_id = create_report_test(db_session, admin, position, 1)
+    large_test_id = create_report_test(db_session, admin, position, 15)
+    get_current_user(db_session, "user_report")
+
+    def count_queries(test_id):
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db_session.bind, "before_cursor_execute", listener)
+        try:
+            results = get_test_results_with_employee(db_session, test_id, "user_report")
+        finally:
+            event.remove(db_session.bind, "before_cursor_execute", listener)
+        return len(results), len(statements)
+
+    small_count, small_statements = count_queries(small_test_id)
+    large_count, large_statements = count_queries(large_test_id)
+
+    assert (small_count, large_count) == (1, 15)
+    assert small_statements == large_statements
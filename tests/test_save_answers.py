@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from models import Employee, BelbinRole, UserAnswer, UserAnswerItem, UserBelbinAnswer
+from schemas.test import UserAnswerCreate
+from crud.test import create_test, create_user_answers, write_user_answers, check_upsert_support
+from attempt_store import attempt_store, PendingAnswer
+from main import app
+from get_current_user import get_current_user, UserData
+from tests.test_create_test import build_test_payload
+
+
+def create_open_test(db_session):
+    employee = Employee(first_name="Иван", last_name="Петров", clerk_id="user_batch", is_admin=True)
+    role = BelbinRole(name="Мыслитель")
+    db_session.add_all([employee, role])
+    db_session.commit()
+    db_test = create_test(db_session, build_test_payload(role.id, 10), "user_batch")
+    db_test.status = "active"
+    db_test.end_date = None
+    db_session.commit()
+    return employee, db_test
+
+
+def page_of_answers(db_test, correct=True):
+    answers = [
+        UserAnswerCreate(test_id=db_test.id, question_id=q.id, question_type="single_choice",
+                         answer_ids=[q.answers[0 if correct else 1].id])
+        for q in db_test.questions
+    ]
+    answers += [
+        UserAnswerCreate(test_id=db_test.id, question_id=bq.id, question_type="belbin",
+                         text_response=f"[[{bq.answers[0].id}, 7]]")
+        for bq in db_test.belbin_questions
+    ]
+    return answers
+
+
+def test_save_answers_in_one_commit(db_session, monkeypatch):
+    monkeypatch.setattr(attempt_store, "enabled", False)
+    employee, db_test = create_open_test(db_session)
+    commits = []
+    event.listen(db_session, "after_commit", lambda session: commits.append(session))
+
+    assert create_user_answers(db_session, page_of_answers(db_test), "user_batch")["saved"] == 20
+    assert len(commits) == 1
+
+    # Повторное автосохранение заменяет ответы, а не дублирует их
+    create_user_answers(db_session, page_of_answers(db_test, correct=False), "user_batch")
+    assert db_session.query(UserAnswer).filter_by(employee_id=employee.id).count() == 10
+    wrong_ids = {q.answers[1].id for q in db_test.questions}
+    assert {i.answer_id for i in db_session.query(UserAnswerItem)} == wrong_ids
+    assert [a.score for a in db_session.query(UserBelbinAnswer).filter_by(employee_id=employee.id)] == [7] * 10
+
+
+def test_write_user_answers_is_idempotent_upsert(db_session):
+    employee, db_test = create_open_test(db_session)
+    question, belbin_question = db_test.questions[0], db_test.belbin_questions[0]
+    regular = {question.id: PendingAnswer(answer_ids=(question.answers[0].id, question.answers[1].id))}
+    belbin = {belbin_question.id: PendingAnswer(belbin_scores=((belbin_question.answers[0].id, 4),))}
+
+    write_user_answers(db_session, db_test.id, employee.id, regular, belbin)
+    item_ids = {i.answer_id: i.id for i in db_session.query(UserAnswerItem)}
+
+    # Повторное сохранение того же состояния не плодит строк и не пересоздаёт выбранные варианты
+    write_user_answers(db_session, db_test.id, employee.id, regular, belbin)
+    regular = {question.id: PendingAnswer(answer_ids=(question.answers[1].id,))}
+    write_user_answers(db_session, db_test.id, employee.id, regular, belbin)
+    db_session.commit()
+
+    assert db_session.query(UserAnswer).filter_by(employee_id=employee.id).count() == 1
+    assert {i.answer_id: i.id for i in db_session.query(UserAnswerItem)} == {question.answers[1].id: item_ids[question.answers[1].id]}
+    assert db_session.query(UserBelbinAnswer).filter_by(employee_id=employee.id).count() == 1
+
+
+def test_belbin_pairs_are_type_checked(db_session):
+    _, db_test = create_open_test(db_session)
+    answer_id = db_test.belbin_questions[0].answers[0].id
+    for text_response in (f'[[{answer_id}, {{"a": 1}}]]', f'[[[{answer_id}], 1]]', f'[[{answer_id}, 11]]', f'[[{answer_id}, true]]'):
+        answer = UserAnswerCreate(test_id=db_test.id, question_id=db_test.belbin_questions[0].id,
+                                  question_type="belbin", text_response=text_response)
+        with pytest.raises(HTTPException) as exc:
+            create_user_answers(db_session, [answer], "user_batch")
+        assert exc.value.status_code == 400
+
+
+def test_save_answer_returns_saved_record(client, db_session, monkeypatch):
+    _, db_test = create_open_test(db_session)
+    question = db_test.questions[0]
+    payload = {"test_id": db_test.id, "question_id": question.id, "question_type": "single_choice",
+               "answer_ids": [question.answers[0].id]}
+    app.dependency_overrides[get_current_user] = lambda: UserData(user_id="user_batch")
+    try:
+        monkeypatch.setattr(attempt_store, "enabled", False)
+        saved = client.post("/test/save_answer/", json=payload).json()
+        assert saved["id"] == db_session.query(UserAnswer).one().id
+        assert saved["pending"] is False and saved["answer_ids"] == payload["answer_ids"]
+
+        # С буфером записи в БД ещё нет — это видно по ответу
+        monkeypatch.setattr(attempt_store, "enabled", True)
+        monkeypatch.setattr(attempt_store, "_attempts", {})
+        buffered = client.post("/test/save_answer/", json=payload).json()
+        assert buffered["id"] is None and buffered["pending"] is True
+    finally:
+        del app.dependency_overrides[get_current_user]
+
+
+def test_unsupported_dialect_fails_at_startup(db_session):
+    check_upsert_support(db_session.get_bind())
+    with pytest.raises(RuntimeError, match="'mssql' is not supported"):
+        check_upsert_support(SimpleNamespace(dialect=SimpleNamespace(name="mssql")))
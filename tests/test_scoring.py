@@ -0,0 +1,76 @@
+from sqlalchemy import event
+from models import Employee, Test, Question, Answer, TestResult, UserAnswer, UserAnswerItem
+from crud.test import calculate_test_score
+
+
+def create_scored_test(db_session, questions_count: int):
+    employee = Employee(first_name="Иван", last_name="Иванов")
+    db_session.add(employee)
+    db_session.flush()
+
+    test = Test(title="Тест", created_by=employee.id)
+    db_session.add(test)
+    db_session.flush()
+
+    for i in range(questions_count):
+        single = Question(text=f"single {i}", question_type="single_choice", test_id=test.id, order=i, points=1)
+        single.answers = [Answer(text="a", is_correct=True), Answer(text="b", is_correct=False)]
+        multiple = Question(text=f"multiple {i}", question_type="multiple_choice", test_id=test.id, order=i, points=2)
+        multiple.answers = [Answer(text="a", is_correct=True), Answer(text="b", is_correct=True), Answer(text="c")]
+        text = Question(text=f"text {i}", question_type="text_answer", test_id=test.id, order=i, points=3)
+        text.answers = [Answer(text="Ответ", is_correct=True)]
+        db_session.add_all([single, multiple, text])
+        db_session.flush()
+
+        ua_single = UserAnswer(test_id=test.id, employee_id=employee.id, question_id=single.id)
+        ua_multiple = UserAnswer(test_id=test.id, employee_id=employee.id, question_id=multiple.id)
+        ua_text = UserAnswer(test_id=test.id, employee_id=employee.id, question_id=text.id, text_response=" ответ ")
+        db_session.add_all([ua_single, ua_multiple, ua_text])
+        db_session.flush()
+
+        # Правильный single_choice, неполный multiple_choice, правильный text_answer
+        db_session.add_all([
+            UserAnswerItem(user_answer_id=ua_single.id, answer_id=single.answers[0].id),
+            UserAnswerItem(user_answer_id=ua_multiple.id, answer_id=multiple.answers[0].id),
+        ])
+
+    db_session.add(TestResult(test_id=test.id, employee_id=employee.id, is_completed=True))
+    db_session.commit()
+    return test, employee
+
+
+def count_queries(db_session, func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+def test_calculate_test_score(db_session):
+    test, employee = create_scored_test(db_session, 2)
+
+    score = calculate_test_score(db_session, test.id, employee.id)
+
+    result = db_session.query(TestResult).filter_by(test_id=test.id, employee_id=employee.id).first()
+    assert score == 8
+    assert result.score == 8
+    assert result.max_score == 12
+    assert round(result.percent, 2) == 66.67
+
+
+def test_calculate_test_score_query_count_is_constant(db_session):
+    small_test, small_employee = create_scored_test(db_session, 1)
+    large_test, large_employee = create_scored_test(db_session, 20)
+
+    small = count_queries(db_session, lambda: calculate_test_score(db_session, small_test.id, small_employee.id))
+    large = count_queries(db_session, lambda: calculate_test_score(db_session, large_test.id, large_employee.id))
+
+    assert small == large
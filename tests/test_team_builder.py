@@ -0,0 +1,52 @@
+import numpy as np
+from models import Employee, BelbinRole, Test, TestResult, BelbinTestResult, BelbinPositionRequirement
+from models.positions import Position
+from schemas.belbin import TeamBuildRequest
+from crud.team_builder import suggest_teams, build_teams
+
+
+def test_suggest_teams_covers_rare_role():
+    # Сильные универсалы без роли 2 и один слабый сотрудник, который её закрывает
+    scores = np.array([[20, 20, 0], [19, 19, 0], [18, 18, 0], [1, 1, 12]], dtype=float)
+    min_scores = np.array([10, 10, 10], dtype=float)
+    counts = np.array([1, 1, 1])
+
+    teams = suggest_teams(scores, min_scores, counts, team_size=2, top_k=2)
+
+    assert teams[0][0] == [0, 3]
+    assert all(3 in team for team, _ in teams)
+
+
+def test_build_teams_from_position_requirements(db_session):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_team", is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+    plant, finisher = BelbinRole(name="Генератор"), BelbinRole(name="Завершитель")
+    lead = Position(title="Тимлид", created_by_id=admin.id)
+    test = Test(title="Белбин", created_by=admin.id)
+    db_session.add_all([plant, finisher, lead, test])
+    db_session.flush()
+    db_session.add_all([
+        BelbinPositionRequirement(position_id=lead.id, role_id=plant.id, min_score=10, is_key=True),
+        BelbinPositionRequirement(position_id=lead.id, role_id=finisher.id, min_score=10, is_key=True),
+    ])
+    employees = [Employee(first_name=name, last_name="Иванов", created_by_id=admin.id) for name in ("Анна", "Борис", "Вера")]
+    db_session.add_all(employees)
+    db_session.flush()
+    for employee, (plant_score, finisher_score) in zip(employees, [(15, 2), (14, 3), (1, 11)]):
+        result = TestResult(test_id=test.id, employee_id=employee.id, is_completed=True)
+        db_session.add(result)
+        db_session.flush()
+        db_session.add_all([
+            BelbinTestResult(test_id=result.id, role_id=plant.id, total_score=plant_score),
+            BelbinTestResult(test_id=result.id, role_id=finisher.id, total_score=finisher_score),
+        ])
+    db_session.commit()
+
+    suggestions = build_teams(db_session, TeamBuildRequest(team_size=2, position_id=lead.id, top_k=1), "user_team")
+
+    assert suggestions["pool_size"] == 3
+    [team] = suggestions["teams"]
+    assert [m["employee_id"] for m in team["members"]] == [employees[0].id, employees[2].id]
+    assert team["missing_role_ids"] == [] and team["coverage"] == 1.0
+    assert team["strength"] == 26.0
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import get_current_user as current_user_module
+from jwks_manager import JWKSManager, TokenCache
+
+
+def test_token_cache_respects_exp_and_size():
+    cache = TokenCache(maxsize=2, max_ttl=300)
+    now = time.time()
+    cache.put("a", "kid1", {"id": "a", "exp": now + 10}, now=now)
+    cache.put("b", "kid1", {"id": "b", "exp": now + 1000}, now=now)
+
+    assert cache.get("a", now=now) == ("kid1", {"id": "a", "exp": now + 10})
+    assert cache.get("a", now=now + 11) is None
+    # exp дальше max_ttl — запись всё равно живёт не дольше max_ttl
+    assert cache.get("b", now=now + 301) is None
+
+    cache.put("c", None, {"id": "c"}, now=now)
+    cache.put("d", None, {"id": "d"}, now=now)
+    cache.put("e", None, {"id": "e"}, now=now)
+    assert cache.get("c", now=now) is None
+    assert cache.metrics()["evictions"] == 1
+
+
+def test_unknown_kid_triggers_refresh():
+    manager = JWKSManager("http://jwks", ttl=3600, min_refresh_interval=0)
+    responses = [[{"kid": "old"}], [{"kid": "old"}, {"kid": "new"}]]
+
+    async def fetch():
+        return responses.pop(0)
+
+    manager.fetch = fetch
+
+    async def run():
+        await manager.refresh(force=True)
+        return await manager.get_key("new")
+
+    assert asyncio.run(run()) == {"kid": "new"}
+    assert manager.stats == {"refreshes": 2, "refresh_errors": 0, "unknown_kid": 1}
+
+
+def test_get_current_user_skips_verification_for_cached_token(monkeypatch):
+    manager = JWKSManager("http://jwks")
+    manager.keys = {"kid1": {"kid": "kid1"}}
+    manager.fetched_at = time.monotonic()
+    cache = TokenCache()
+    monkeypatch.setattr(current_user_module, "jwks_store", manager)
+    monkeypatch.setattr(current_user_module, "token_cache", cache)
+
+    calls = []
+
+    def fake_decode(token, key, **kwargs):
+        calls.append(token)
+        return {"id": "user_1", "exp": time.time() + 60}
+
+    monkeypatch.setattr(current_user_module.jwt, "get_unverified_header", lambda token: {"kid": "kid1"})
+    monkeypatch.setattr(current_user_module.jwt, "decode", fake_decode)
+
+    for _ in range(3):
+        user = asyncio.run(current_user_module.get_current_user("Bearer token"))
+        assert user.user_id == "user_1"
+
+    assert calls == ["token"]
+    assert cache.metrics()["hits"] == 2
+
+    # Ключ отозван — токен снова проходит полную проверку
+    manager.keys = {"kid2": {"kid": "kid2"}}
+    monkeypatch.setattr(current_user_module.jwt, "get_unverified_header", lambda token: {"kid": "kid2"})
+    asyncio.run(current_user_module.get_current_user("Bearer token"))
+    assert len(calls) == 2
@@ -0,0 +1,135 @@
+from sqlalchemy import event
+from models import Employee, BelbinRole, TestResult
+from schemas import test as test_schemas
+from crud.test import create_test, update_test, get_test_etag
+from content_hash import QUESTION_HASH_FIELDS, ANSWER_HASH_FIELDS, question_content_hash
+from tests.test_create_test import build_test_payload
+
+
+def payload_from_test(db_test) -> dict:
+    return {
+        "title": db_test.title,
+        "status": db_test.status,
+        "end_date": db_test.end_date,
+        "test_settings": {"min_questions": 1, "belbin_block": 1, "belbin_questions_in_block": 1, "has_time_limit": False},
+        "questions": [
+            {
+                "id": q.id,
+                "text": q.text,
+                "order": q.order,
+                "points": q.points,
+                "answers": [{"id": a.id, "text": a.text, "is_correct": a.is_correct} for a in q.answers],
+            }
+            for q in sorted(db_test.questions, key=lambda q: q.order)
+        ],
+        "belbin_questions": [
+            {
+                "id": bq.id,
+                "text": bq.text,
+                "block_number": bq.block_number,
+                "order": bq.order,
+                "answers": [{"id": a.id, "text": a.text, "role_id": a.role_id} for a in bq.answers],
+            }
+            for bq in sorted(db_test.belbin_questions, key=lambda bq: bq.order)
+        ],
+    }
+
+
+def create_filled_test(db_session, questions_count=30):
+    admin = Employee(first_name="Админ", last_name="Админов", clerk_id="user_editor", is_admin=True)
+    role = BelbinRole(name="Исполнитель")
+    db_session.add_all([admin, role])
+    db_session.commit()
+    db_test = create_test(db_session, build_test_payload(role.id, questions_count), "user_editor")
+    db_session.add(TestResult(test_id=db_test.id, employee_id=admin.id, is_completed=True, score=10))
+    db_session.commit()
+    return db_test
+
+
+def run_update(db_session, db_test, payload):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    update_test(db_session, db_test.id, test_schemas.TestCreate(**payload), "user_editor")
+    event.remove(db_session.bind, "before_cursor_execute", listener)
+    # (операция, таблица) для каждой записи в БД
+    return [
+        (words[0], words[1] if words[0] == "UPDATE" else words[2])
+        for words in (s.split() for s in statements)
+        if words[0] in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+QUESTION_TABLES = {"questions", "answers", "belbin_questions", "belbin_answers"}
+
+
+def test_typo_fix_updates_single_row_and_keeps_results(db_session):
+    db_test = create_filled_test(db_session)
+    payload = payload_from_test(db_test)
+    payload["questions"][5]["text"] = "Исправленный вопрос"
+
+    writes = run_update(db_session, db_test, payload)
+
+    assert [w for w in writes if w[1] in QUESTION_TABLES] == [("UPDATE", "questions")]
+    assert db_session.query(TestResult).filter_by(test_id=db_test.id).count() == 1
+    assert sorted(db_test.questions, key=lambda q: q.order)[5].text == "Исправленный вопрос"
+
+
+def test_payload_without_ids_matches_existing_rows(db_session):
+    db_test = create_filled_test(db_session, questions_count=5)
+    payload = payload_from_test(db_test)
+    for question in payload["questions"] + payload["belbin_questions"]:
+        question.pop("id")
+        for answer in question["answers"]:
+            answer.pop("id")
+
+    writes = run_update(db_session, db_test, payload)
+
+    assert not [w for w in writes if w[1] in QUESTION_TABLES]
+    assert db_session.query(TestResult).filter_by(test_id=db_test.id).count() == 1
+
+
+def test_answer_key_change_resets_results(db_session):
+    db_test = create_filled_test(db_session, questions_count=5)
+    payload = payload_from_test(db_test)
+    payload["questions"][0]["answers"][1]["is_correct"] = True
+    payload["questions"][1]["answers"].append({"text": "может быть"})
+    del payload["questions"][2]
+
+    run_update(db_session, db_test, payload)
+
+    assert db_session.query(TestResult).filter_by(test_id=db_test.id).count() == 0
+    questions = sorted(db_test.questions, key=lambda q: q.order)
+    assert len(questions) == 4
+    assert [a.is_correct for a in questions[0].answers] == [True, True]
+    assert [a.text for a in questions[1].answers] == ["да", "нет", "может быть"]
+
+
+def test_content_hash_maintained_and_unchanged_save_is_noop(db_session):
+    db_test = create_filled_test(db_session, questions_count=5)
+    etag = get_test_etag(db_test)
+    payload = payload_from_test(db_test)
+    payload["questions"][0]["answers"][0]["text"] = "конечно"
+
+    run_update(db_session, db_test, payload)
+    question = sorted(db_test.questions, key=lambda q: q.order)[0]
+    values = {f: getattr(question, f) for f in QUESTION_HASH_FIELDS}
+    answers = [{f: getattr(a, f) for f in ANSWER_HASH_FIELDS} for a in question.answers]
+    assert question.content_hash == question_content_hash(values, answers)
+    assert get_test_etag(db_test) != etag
+
+    # Повторное сохранение без изменений не трогает вопросы
+    writes = run_update(db_session, db_test, payload_from_test(db_test))
+    assert not [w for w in writes if w[1] in QUESTION_TABLES]
+
+
+def test_etag_matches_exact_tags_only():
+    from main import etag_matches
+
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"old", "abc"', '"abc"')
+    assert etag_matches(" * ", '"abc"')
+    # Подстрока или часть тега — не совпадение
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches('"xx-"abc"-yy"', '"abc"')
+    assert not etag_matches(None, '"abc"')